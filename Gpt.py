@@ -1,12 +1,19 @@
 import datetime
+import json
 import pandas as pd
 import subprocess
 import os
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Border, Side, Alignment
 from openpyxl.utils.dataframe import dataframe_to_rows
 
 COST_PER_GB = 0.21601728
+# Volume usage: one instant query against this Prometheus if set, else each node's kubelet stats summary
+PROMETHEUS_URL = os.environ.get("PROMETHEUS_URL")
+KUBELET_STATS_WORKERS = 16
 
 def run_command(command):
     process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True)
@@ -15,18 +22,97 @@ def run_command(command):
         raise Exception(error)
     return output.decode('utf-8').strip()
 
+def kubectl_json(*args):
+    # One kubectl process per call, no shell; warnings on stderr are not errors.
+    result = subprocess.run(["kubectl", *args, "-o", "json"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(result.stderr.strip())
+    return json.loads(result.stdout)
+
+def kubectl_raw(path):
+    result = subprocess.run(["kubectl", "get", "--raw", path], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(result.stderr.strip())
+    return result.stdout
+
+def get_node_volume_usage(node):
+    # {(namespace, pvc): used GB} of the volumes mounted on one node (kubelet /stats/summary)
+    try:
+        summary = json.loads(kubectl_raw(f"/api/v1/nodes/{node}/proxy/stats/summary"))
+    except Exception as e:
+        print(f"Could not read volume stats of node {node}: {e}")
+        return {}
+    usage = {}
+    for pod in summary.get("pods") or []:
+        for volume in pod.get("volume") or []:
+            pvc_ref = volume.get("pvcRef")
+            if pvc_ref and volume.get("usedBytes") is not None:
+                usage[(pvc_ref["namespace"], pvc_ref["name"])] = volume["usedBytes"] / 1024 ** 3
+    return usage
+
+def get_volume_usage_from_kubelets(nodes):
+    # One stats summary per node, fetched concurrently
+    usage = {}
+    with ThreadPoolExecutor(max_workers=KUBELET_STATS_WORKERS) as executor:
+        for node_usage in executor.map(get_node_volume_usage, sorted(nodes)):
+            usage.update(node_usage)
+    return usage
+
+def get_volume_usage_from_prometheus(prometheus_url):
+    # {(namespace, pvc): used GB} from a single instant query of kubelet_volume_stats_used_bytes
+    query = urllib.parse.urlencode({"query": "max by (namespace, persistentvolumeclaim) (kubelet_volume_stats_used_bytes)"})
+    with urllib.request.urlopen(f"{prometheus_url.rstrip('/')}/api/v1/query?{query}", timeout=60) as response:
+        result = json.load(response)["data"]["result"]
+    return {
+        (series["metric"]["namespace"], series["metric"]["persistentvolumeclaim"]): float(series["value"][1]) / 1024 ** 3
+        for series in result
+        if "namespace" in series["metric"] and "persistentvolumeclaim" in series["metric"]
+    }
+
+def get_volume_usage(nodes):
+    if PROMETHEUS_URL:
+        try:
+            return get_volume_usage_from_prometheus(PROMETHEUS_URL)
+        except Exception as e:
+            print(f"Prometheus query failed ({e}); falling back to kubelet stats")
+    return get_volume_usage_from_kubelets(nodes)
+
 def get_namespaces(namespace_file):
     with open(namespace_file, 'r') as file:
         namespaces = file.read().splitlines()
     return namespaces
 
-def get_pvc_list(namespace):
+def get_namespace_objects(namespace):
+    # PVCs and pods of a namespace in a single call: [pvc, ...], [pod, ...]
     try:
-        pvc_list = run_command(f"kubectl get pvc -n {namespace} --no-headers | awk '{{print $1}}'").split()
+        items = kubectl_json("get", "pvc,pods", "-n", namespace).get("items", [])
     except Exception as e:
-        print(f"No resources found in {namespace} namespace.")
-        pvc_list = []
-    return pvc_list
+        print(f"Could not list PVCs and pods in {namespace}: {e}")
+        items = []
+    pvcs = [item for item in items if item["kind"] == "PersistentVolumeClaim"]
+    pods = [item for item in items if item["kind"] == "Pod"]
+    return pvcs, pods
+
+def get_pvs():
+    # All PersistentVolumes by name (one call for the whole run)
+    try:
+        return {pv["metadata"]["name"]: pv for pv in kubectl_json("get", "pv").get("items", [])}
+    except Exception as e:
+        print(f"Could not list PersistentVolumes: {e}")
+        return {}
+
+def get_pvc_users(pods):
+    # claim name -> pods mounting it, from pod specs (what `kubectl describe pvc` shows as "Used By")
+    users = {}
+    for pod in pods:
+        pod_name = pod["metadata"]["name"]
+        for volume in pod.get("spec", {}).get("volumes") or []:
+            if volume.get("persistentVolumeClaim"):
+                users.setdefault(volume["persistentVolumeClaim"]["claimName"], []).append(pod_name)
+            elif "ephemeral" in volume:
+                # Generic ephemeral volumes get a PVC named <pod>-<volume>
+                users.setdefault(f"{pod_name}-{volume['name']}", []).append(pod_name)
+    return users
 
 def convert_to_gb(capacity_str):
     if "Gi" in capacity_str:
@@ -36,34 +122,54 @@ def convert_to_gb(capacity_str):
     else:
         return 0
 
-def get_pvc_capacity(namespace):
-    try:
-        pvc_capacity = run_command(f"kubectl get pvc -n {namespace} --no-headers | grep -E 'Bound' | awk '{{print $4}}'").split()
-        pvc_capacity_gb = [convert_to_gb(capacity) for capacity in pvc_capacity]
-    except Exception as e:
-        print(f"No resources found in {namespace} namespace.")
-        pvc_capacity_gb = []
-    return pvc_capacity_gb
+def get_pvc_capacity(pvc):
+    # Provisioned size of a bound claim, else its request
+    capacity = (pvc.get("status", {}).get("capacity") or {}).get("storage")
+    capacity = capacity or ((pvc.get("spec", {}).get("resources") or {}).get("requests") or {}).get("storage")
+    return convert_to_gb(capacity or "")
 
-def calculate_pvc_cost(pvc_capacity_gb):
-    return [capacity * COST_PER_GB for capacity in pvc_capacity_gb]
+def calculate_pvc_cost(capacity_gb):
+    return capacity_gb * COST_PER_GB
 
-def get_unattached_pvcs(namespace, pvc_list, pvc_capacity_gb, cluster_name):
+def get_unattached_pvcs(namespace, pvcs, pvc_users, pvs, volume_usage, cluster_name):
     unattached_pvcs = []
-    pvc_costs = calculate_pvc_cost(pvc_capacity_gb)
-    for i, pvc in enumerate(pvc_list):
-        pvc_status = run_command(f"kubectl describe pvc {pvc} -n {namespace} | grep -E 'Used By: <none>'") or None
-        if pvc_status:
-            pod_name, controller_type, controller_name = get_pod_and_deployment_name(namespace, pvc)
-            pv_name = get_pv_name(namespace, pvc)
-            pv_capacity = get_pv_capacity(pv_name)
-            pv_used_capacity = get_pv_used_capacity(namespace, pvc)
-            pv_disk_type = get_pv_disk_type(pv_name)
-            unattached_pvcs.append((cluster_name, namespace, pvc, pvc_capacity_gb[i], pod_name, controller_type, controller_name, pv_name, pv_capacity, pv_used_capacity, pv_disk_type, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pvc_costs[i]))
+    for pvc in pvcs:
+        pvc_name = pvc["metadata"]["name"]
+        if pvc_users.get(pvc_name):
+            continue
+        capacity_gb = get_pvc_capacity(pvc)
+        pod_name, controller_type, controller_name = get_pod_and_deployment_name(namespace, pvc_name, pvc)
+        pv_name = pvc.get("spec", {}).get("volumeName") or ""
+        pv = pvs.get(pv_name, {})
+        pv_capacity = convert_to_gb((pv.get("spec", {}).get("capacity") or {}).get("storage") or "")
+        # Only mounted volumes report usage, so this is "Not mounted" unless a pod still mounts the claim
+        used_gb = volume_usage.get((namespace, pvc_name))
+        pv_used_capacity = "Not mounted" if used_gb is None else round(used_gb, 2)
+        pv_disk_type = pv.get("spec", {}).get("storageClassName") or pvc.get("spec", {}).get("storageClassName") or ""
+        unattached_pvcs.append((cluster_name, namespace, pvc_name, capacity_gb, pod_name, controller_type, controller_name, pv_name, pv_capacity, pv_used_capacity, pv_disk_type, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), calculate_pvc_cost(capacity_gb)))
     return unattached_pvcs
 
-def get_pod_and_deployment_name(namespace, pvc_name):
+def get_pvc_usage(namespace, pvcs, pvc_users, volume_usage, cluster_name):
+    # Used capacity of every claim in the namespace, in use or not; only mounted volumes report usage
+    pvc_usage = []
+    for pvc in pvcs:
+        pvc_name = pvc["metadata"]["name"]
+        capacity_gb = get_pvc_capacity(pvc)
+        used_gb = volume_usage.get((namespace, pvc_name))
+        if used_gb is None:
+            used_gb, used_percent = "Not mounted", ""
+        else:
+            used_gb, used_percent = round(used_gb, 2), round(100 * used_gb / capacity_gb, 1) if capacity_gb else ""
+        storage_class = pvc.get("spec", {}).get("storageClassName") or ""
+        pvc_usage.append((cluster_name, namespace, pvc_name, ", ".join(pvc_users.get(pvc_name, [])), capacity_gb, used_gb, used_percent, storage_class))
+    return pvc_usage
+
+def get_pod_and_deployment_name(namespace, pvc_name, pvc=None):
     try:
+        # StatefulSets with a PVC retention policy set themselves as owner of their claims
+        for owner in (pvc or {}).get("metadata", {}).get("ownerReferences") or []:
+            if owner["kind"] == "StatefulSet":
+                return pvc_name.split('-', 1)[-1], "StatefulSet", owner["name"]
         parts = pvc_name.split('-', 1)
         if len(parts) > 1:
             prefix, rest = parts
@@ -81,34 +187,6 @@ def get_pod_and_deployment_name(namespace, pvc_name):
     except Exception as e:
         return "Error retrieving pod/deployment name", "Error", str(e)
 
-def get_pv_name(namespace, pvc_name):
-    try:
-        pv_name = run_command(f"kubectl get pvc {pvc_name} -n {namespace} -o jsonpath='{{.spec.volumeName}}'")
-        return pv_name
-    except Exception as e:
-        return "Error retrieving PV name"
-
-def get_pv_capacity(pv_name):
-    try:
-        pv_capacity = run_command(f"kubectl get pv {pv_name} -o jsonpath='{{.spec.capacity.storage}}'")
-        return convert_to_gb(pv_capacity)
-    except Exception as e:
-        return "Error retrieving PV capacity"
-
-def get_pv_used_capacity(namespace, pvc_name):
-    try:
-        used_capacity = run_command(f"kubectl exec -n {namespace} {pvc_name} -- df -h | grep {pvc_name} | awk '{{print $3}}'")
-        return convert_to_gb(used_capacity)
-    except Exception as e:
-        return "Error retrieving PV used capacity"
-
-def get_pv_disk_type(pv_name):
-    try:
-        disk_type = run_command(f"kubectl get pv {pv_name} -o jsonpath='{{.spec.storageClassName}}'")
-        return disk_type
-    except Exception as e:
-        return "Error retrieving PV disk type"
-
 def apply_excel_formatting(file_name, df):
     wb = Workbook()
     ws = wb.active
@@ -138,13 +216,30 @@ def main(namespace_file, platform_file, ingestion_file, support_file):
     ingestion_apps = load_team_data(ingestion_file)
     support_apps = load_team_data(support_file)
 
+    # One kubectl call per namespace (PVCs + pods), one for all PVs and one usage pass
+    # (per node running a pod that mounts a claim, or a single Prometheus query), joined in memory
     all_unattached_pvcs = []
+    all_pvc_usage = []
     cluster_name = run_command("kubectl config current-context").replace('-admin', '')
-    for namespace in namespaces:
-        pvc_list = get_pvc_list(namespace)
-        pvc_capacity_gb = get_pvc_capacity(namespace)
-        unattached_pvcs = get_unattached_pvcs(namespace, pvc_list, pvc_capacity_gb, cluster_name)
-        all_unattached_pvcs.extend(unattached_pvcs)
+    pvs = get_pvs()
+    namespace_objects = {namespace: get_namespace_objects(namespace) for namespace in namespaces}
+    pvc_users = {namespace: get_pvc_users(pods) for namespace, (_, pods) in namespace_objects.items()}
+    nodes = {
+        pod.get("spec", {}).get("nodeName")
+        for namespace, (_, pods) in namespace_objects.items()
+        for pod in pods
+        if any(pod["metadata"]["name"] in users for users in pvc_users[namespace].values())
+    } - {None}
+    volume_usage = get_volume_usage(nodes) if nodes else {}
+    for namespace, (pvcs, pods) in namespace_objects.items():
+        all_unattached_pvcs.extend(get_unattached_pvcs(namespace, pvcs, pvc_users[namespace], pvs, volume_usage, cluster_name))
+        all_pvc_usage.extend(get_pvc_usage(namespace, pvcs, pvc_users[namespace], volume_usage, cluster_name))
+
+    if all_pvc_usage:
+        usage_df = pd.DataFrame(all_pvc_usage, columns=["Cluster Name", "Namespace", "PVC Name", "Used By", "Capacity GB", "Used GB", "Used %", "Storage Class"])
+        usage_file_name = f"pvc_usage_report-{datetime.datetime.now().strftime('%d-%m-%Y')}.xlsx"
+        usage_df.to_excel(usage_file_name, index=False)
+        print(f"PVC usage report created at: {os.path.abspath(usage_file_name)}")
 
     if all_unattached_pvcs:
         df = pd.DataFrame(all_unattached_pvcs, columns=["Cluster Name", "Namespace", "Unattached PVC Name", "Capacity GB", "Unattached Pod Name", "Controller Type", "Controller Name", "PV Name", "PV Capacity GB", "PV Used Capacity GB", "PV Disk Type", "Date", "Cost ($)"])
@@ -1,26 +1,14 @@
+import argparse
 import logging
-from kubernetes import client, config
 import pandas as pd
 import os
+from k8s_state import StateStore, findings_from_report, save_deltas_to_excel
+from k8s_rbac import build_rbac_index
+from k8s_refs import CONFIGMAPS, SECRETS, build_reference_graph
+from k8s_utils import KubeContext, iter_list
 
-# Configure logging
-logging.basicConfig(
-    filename="k8s_unused_resources.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
-
-# Load Kubernetes config
-config.load_kube_config()
-
-# Initialize API clients
-v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
-batch_v1 = client.BatchV1Api()
-rbac_v1 = client.RbacAuthorizationV1Api()
-networking_v1 = client.NetworkingV1Api()
-autoscaling_v1 = client.AutoscalingV1Api()
-custom_objects_api = client.CustomObjectsApi()
+# Kubernetes clients, built on first use (every finder also accepts its own KubeContext)
+KUBE = KubeContext()
 
 # Read namespaces from text file
 def get_namespaces():
@@ -32,44 +20,47 @@ def get_namespaces():
     logging.warning("No namespaces.txt found. Scanning all namespaces.")
     return None  # Scan all namespaces if no file
 
-NAMESPACES = get_namespaces()
+def resolve_namespaces(kube, namespaces):
+    return namespaces or [ns.metadata.name for ns in iter_list(kube.core_v1.list_namespace)]
 
 # Function to find unused Persistent Volumes
-def find_unused_pvs():
-    return [pv.metadata.name for pv in v1.list_persistent_volume().items if pv.status.phase == "Available"]
+def find_unused_pvs(kube=KUBE):
+    return [pv.metadata.name for pv in iter_list(kube.core_v1.list_persistent_volume) if pv.status.phase == "Available"]
 
-# Function to find unused ConfigMaps & Secrets
-def find_unused_configmaps_and_secrets():
-    used_configmaps, used_secrets = set(), set()
-    for ns in NAMESPACES or [ns.metadata.name for ns in v1.list_namespace().items]:
-        pods = v1.list_namespaced_pod(ns).items
-        for pod in pods:
-            if pod.spec.volumes:
-                for volume in pod.spec.volumes:
-                    if volume.config_map:
-                        used_configmaps.add(volume.config_map.name)
-                    if volume.secret:
-                        used_secrets.add(volume.secret.secret_name)
-    all_configmaps = {cm.metadata.name for cm in v1.list_config_map_for_all_namespaces().items}
-    all_secrets = {sec.metadata.name for sec in v1.list_secret_for_all_namespaces().items}
-    return list(all_configmaps - used_configmaps), list(all_secrets - used_secrets)
+# Function to find unused ConfigMaps & Secrets (namespace/name; see k8s_refs.py for what counts as a reference)
+def find_unused_configmaps_and_secrets(kube=KUBE, namespaces=None, references=None):
+    v1 = kube.core_v1
+    namespaces = resolve_namespaces(kube, namespaces)
+    references = references or build_reference_graph(kube, namespaces)
+    unused_configmaps, unused_secrets = [], []
+    for ns in namespaces:
+        configmaps = [cm.metadata.name for cm in iter_list(v1.list_namespaced_config_map, ns)]
+        secrets = [sec.metadata.name for sec in iter_list(v1.list_namespaced_secret, ns)]
+        unused_configmaps.extend(f"{ns}/{name}" for name in references.unused(CONFIGMAPS, ns, configmaps))
+        unused_secrets.extend(f"{ns}/{name}" for name in references.unused(SECRETS, ns, secrets))
+    return unused_configmaps, unused_secrets
 
-# Function to find unused Jobs & CronJobs
-def find_unused_jobs():
+# Function to find unused Jobs & CronJobs (namespace/name)
+def find_unused_jobs(kube=KUBE, namespaces=None):
+    batch_v1 = kube.batch_v1
     unused_jobs, unused_cronjobs = [], []
-    for ns in NAMESPACES or [ns.metadata.name for ns in v1.list_namespace().items]:
-        unused_jobs.extend([j.metadata.name for j in batch_v1.list_namespaced_job(ns).items if j.status.succeeded or j.status.failed])
-        unused_cronjobs.extend([cj.metadata.name for cj in batch_v1.list_namespaced_cron_job(ns).items if not cj.spec.suspend])
+    for ns in resolve_namespaces(kube, namespaces):
+        unused_jobs.extend(f"{ns}/{j.metadata.name}" for j in iter_list(batch_v1.list_namespaced_job, ns) if j.status.succeeded or j.status.failed)
+        unused_cronjobs.extend(f"{ns}/{cj.metadata.name}" for cj in iter_list(batch_v1.list_namespaced_cron_job, ns) if not cj.spec.suspend)
     return unused_jobs, unused_cronjobs
 
-# Function to find unused RBAC resources (Roles, RoleBindings, ClusterRoles)
-def find_unused_rbac():
-    unused_roles, unused_rolebindings = [], []
-    for ns in NAMESPACES or [ns.metadata.name for ns in v1.list_namespace().items]:
-        unused_roles.extend([r.metadata.name for r in rbac_v1.list_namespaced_role(ns).items])
-        unused_rolebindings.extend([rb.metadata.name for rb in rbac_v1.list_namespaced_role_binding(ns).items])
-    unused_clusterroles = [cr.metadata.name for cr in rbac_v1.list_cluster_role().items]
-    return unused_roles, unused_rolebindings, unused_clusterroles
+# Function to find unused RBAC resources: unbound Roles/ClusterRoles, bindings that grant
+# nothing and ServiceAccounts no running pod uses (namespaced items as namespace/name; see k8s_rbac.py)
+def find_unused_rbac(kube=KUBE, namespaces=None, rbac=None):
+    namespaces = resolve_namespaces(kube, namespaces)
+    rbac = rbac or build_rbac_index(kube)
+    return (
+        rbac.unused_roles(namespaces),
+        rbac.unused_role_bindings(namespaces),
+        rbac.unused_cluster_roles(),
+        rbac.unused_cluster_role_bindings(),
+        rbac.unused_service_accounts(namespaces),
+    )
 
 # Function to save results to an Excel file
 def save_results_to_excel(unused_resources):
@@ -81,22 +72,45 @@ def save_results_to_excel(unused_resources):
     logging.info("Results saved to 'unused_k8s_resources.xlsx'")
 
 # Main function to scan for unused resources
-def scan_unused_resources():
+def scan_unused_resources(kube=KUBE, namespaces=None, state_db=None, cluster=None, unused_days=30):
     logging.info("Scanning Kubernetes cluster for unused resources...")
+    namespaces = resolve_namespaces(kube, namespaces or get_namespaces())
+    configmaps, secrets = find_unused_configmaps_and_secrets(kube, namespaces)
+    jobs, cronjobs = find_unused_jobs(kube, namespaces)
+    roles, rolebindings, clusterroles, clusterrolebindings, serviceaccounts = find_unused_rbac(kube, namespaces)
 
     unused_resources = {
-        "PersistentVolumes": find_unused_pvs(),
-        "ConfigMaps": find_unused_configmaps_and_secrets()[0],
-        "Secrets": find_unused_configmaps_and_secrets()[1],
-        "Jobs": find_unused_jobs()[0],
-        "CronJobs": find_unused_jobs()[1],
-        "Roles": find_unused_rbac()[0],
-        "RoleBindings": find_unused_rbac()[1],
-        "ClusterRoles": find_unused_rbac()[2],
+        "PersistentVolumes": find_unused_pvs(kube),
+        "ConfigMaps": configmaps,
+        "Secrets": secrets,
+        "Jobs": jobs,
+        "CronJobs": cronjobs,
+        "Roles": roles,
+        "RoleBindings": rolebindings,
+        "ClusterRoles": clusterroles,
+        "ClusterRoleBindings": clusterrolebindings,
+        "ServiceAccounts": serviceaccounts,
     }
 
     save_results_to_excel(unused_resources)
+    if state_db:
+        # Names only (no UIDs); every kind above was checked in `namespaces`, so those can resolve.
+        with StateStore(state_db) as store:
+            cluster = cluster or kube.context_name
+            store.record_run(cluster, findings_from_report(unused_resources), unused_resources, namespaces)
+            save_deltas_to_excel(store, cluster, unused_days)
 
 # Run the script
 if __name__ == "__main__":
-    scan_unused_resources()
+    # Configure logging (the CLI only; importing this module writes no log file)
+    logging.basicConfig(
+        filename="k8s_unused_resources.log",
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    parser = argparse.ArgumentParser(description="Find unused Kubernetes resources.")
+    parser.add_argument("--state-db", metavar="FILE", help="SQLite state store for run-over-run deltas (k8s_state.py)")
+    parser.add_argument("--cluster", help="Cluster name in the state store (default: kubeconfig context name)")
+    parser.add_argument("--unused-days", type=int, default=30, help="State store: threshold of the 'Unused > N Days' view")
+    args = parser.parse_args()
+    scan_unused_resources(state_db=args.state_db, cluster=args.cluster, unused_days=args.unused_days)
@@ -1,52 +1,68 @@
+import argparse
+import asyncio
+import json
 import logging
+import queue
+import signal
+import time
+from collections import namedtuple
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from kubernetes import client, config, dynamic
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from kubernetes import watch
 from kubernetes.client import ApiClient
+from kubernetes.client.rest import ApiException
+from kubernetes.utils import parse_quantity
+from k8s_async import AsyncKubeClient, DEFAULT_BURST, DEFAULT_MAX_CONCURRENCY, DEFAULT_QPS
+from k8s_capture import CaptureWriter, read_capture
+from k8s_metrics import FINDER_DURATION, FINDER_FINDINGS, OBJECTS_LISTED, REGISTRY
+from k8s_cleanup import CleanupTarget, run_cleanup
+from k8s_state import StateStore, findings_from_report, save_deltas_to_excel
+from k8s_refs import CONFIGMAPS, PERSISTENTVOLUMECLAIMS, SECRETS, SERVICEACCOUNTS, ReferenceGraph
+from k8s_records import compile_item_projection, compile_list_projection, raw_list_function
+from k8s_utils import (
+    METADATA_ACCEPT, KubeContext, PartialObjectMetadata, deserialize_model, exists, kubeconfig_contexts, iter_list,
+    metadata_list_function, probe_all,
+)
+import multiprocessing
 import pandas as pd
 import os
 import re
+import threading
 
 # ==============================================================================
 # CONFIGURATION & INITIALIZATION
 # ==============================================================================
 
-logging.basicConfig(
-    filename="k8s_unused_resources.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+LOG_FILE = "k8s_unused_resources.log"
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
 
-# Load Kubernetes configuration
-config.load_kube_config()
+def configure_logging(log_format=LOG_FORMAT):
+    """Log to LOG_FILE in the working directory; done by the CLI and fleet workers, never on import."""
+    logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format=log_format)
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(logging.Formatter(log_format))
 
-# Initialize API clients
-v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
-batch_v1 = client.BatchV1Api()
-rbac_v1 = client.RbacAuthorizationV1Api()
-networking_v1 = client.NetworkingV1Api()
-apiextensions_v1 = client.ApiextensionsV1Api()
-storage_v1 = client.StorageV1Api()
-dynamic_client = dynamic.DynamicClient(ApiClient())
+# Default cluster context. Clients are built on first use, so importing this module
+# (or running --from-snapshot) never reads kubeconfig or reaches the API server.
+# Snapshots, scans and the daemon accept their own KubeContext instead.
+KUBE = KubeContext()
 
 # ==============================================================================
 # HELPER FUNCTIONS
 # ==============================================================================
 
-def get_namespaces():
+def get_namespaces(kube=None):
     if os.path.exists("namespaces.txt"):
         with open("namespaces.txt", "r") as f:
             namespaces = [line.strip() for line in f.readlines() if line.strip()]
         logging.info(f"Scanning namespaces (from file): {namespaces}")
         return namespaces
     else:
-        ns_list = [ns.metadata.name for ns in v1.list_namespace().items]
+        ns_list = [ns.metadata.name for ns in iter_list((kube or KUBE).core_v1.list_namespace)]
         logging.info(f"No namespaces.txt found. Scanning all namespaces: {ns_list}")
         return ns_list
 
-NAMESPACES = get_namespaces()
-
 def parse_duration(duration_str):
     """
     Parse a duration string (e.g. '1h30m') and return a timedelta.
@@ -93,396 +109,1598 @@ def is_resource_expired(obj, ttl_annotation="orphanTTL", default_ttl=timedelta(d
     age = datetime.utcnow() - obj.metadata.creation_timestamp.replace(tzinfo=None)
     return age > default_ttl
 
-def is_orphaned(obj):
+# Owner kinds the snapshot can resolve from memory: (API group, kind) -> snapshot kind.
+OWNER_KINDS = {
+    ("", "Pod"): "pods",
+    ("", "Service"): "services",
+    ("", "ConfigMap"): "configmaps",
+    ("", "Secret"): "secrets",
+    ("", "ServiceAccount"): "serviceaccounts",
+    ("", "PersistentVolume"): "persistentvolumes",
+    ("", "PersistentVolumeClaim"): "persistentvolumeclaims",
+    ("apps", "Deployment"): "deployments",
+    ("apps", "StatefulSet"): "statefulsets",
+    ("apps", "DaemonSet"): "daemonsets",
+    ("apps", "ReplicaSet"): "replicasets",
+    ("batch", "Job"): "jobs",
+    ("batch", "CronJob"): "cronjobs",
+    ("networking.k8s.io", "Ingress"): "ingresses",
+    ("networking.k8s.io", "IngressClass"): "ingressclasses",
+    ("storage.k8s.io", "StorageClass"): "storageclasses",
+    ("apiextensions.k8s.io", "CustomResourceDefinition"): "customresourcedefinitions",
+}
+
+def _owner_exists_live(owner, namespace, kube=None):
+    try:
+        res = (kube or KUBE).resource(owner.api_version, owner.kind)
+        if namespace and res.namespaced:
+            found = res.get(name=owner.name, namespace=namespace)
+        else:
+            found = res.get(name=owner.name)
+        return not owner.uid or found.metadata.uid == owner.uid
+    except Exception as e:
+        logging.info(f"Owner {owner.kind}/{owner.name} not resolvable: {e}")
+        return False
+
+def owner_exists(owner, namespace, snapshot=None):
+    """
+    Resolves one owner reference.
+    - Kinds in OWNER_KINDS are looked up by UID in the snapshot (no API call).
+    - Other kinds (e.g. CRD-backed owners) fall back to a GET, memoized by snapshot.lookup().
+    """
+    group = owner.api_version.rpartition("/")[0]
+    kind = OWNER_KINDS.get((group, owner.kind))
+    if snapshot is None:
+        return _owner_exists_live(owner, namespace)
+    if kind is not None:
+        return owner.uid in snapshot.uids(kind)
+    key = ("owner", owner.api_version, owner.kind, namespace, owner.name, owner.uid)
+    # None means a replayed capture never saw this owner; do not call that orphaned.
+    return snapshot.lookup(key, lambda: _owner_exists_live(owner, namespace, snapshot.kube)) is not False
+
+def is_orphaned(obj, snapshot=None):
     """
     Checks owner references. Returns True if any owner reference is unresolvable.
+    With a snapshot, owners are resolved from its UID index instead of one GET per owner.
     """
     if not obj.metadata.owner_references:
         return False
     for owner in obj.metadata.owner_references:
-        try:
-            res = dynamic_client.resources.get(api_version=owner.api_version, kind=owner.kind)
-            if obj.metadata.namespace:
-                res.get(name=owner.name, namespace=obj.metadata.namespace)
-            else:
-                res.get(name=owner.name)
-        except Exception as e:
-            logging.info(f"Resource {obj.metadata.name} orphaned due to missing owner {owner.name}: {e}")
+        if not owner_exists(owner, obj.metadata.namespace, snapshot):
+            logging.info(f"Resource {obj.metadata.name} orphaned due to missing owner {owner.kind}/{owner.name}")
             return True
     return False
 
+# ==============================================================================
+# CLUSTER SNAPSHOT
+# ==============================================================================
+
+# Kinds the finders only read metadata of (names, labels, annotations, timestamps).
+METADATA_ONLY_KINDS = {"configmaps", "secrets", "serviceaccounts", "storageclasses", "ingressclasses"}
+
+def default_list_functions(metadata_only=True, fast=False, kube=None):
+    """
+    Returns the LIST call used for every resource kind the finders read.
+    Namespaced kinds are listed cluster-wide once instead of once per namespace.
+    With metadata_only, METADATA_ONLY_KINDS are listed as PartialObjectMetadataList so
+    Secret data and ConfigMap payloads are never transferred or parsed.
+    With fast, responses skip model deserialization and are projected to RECORD_FIELDS.
+    Value: (list function, namespaced).
+    """
+    kube = kube or KUBE
+    v1, apps_v1, batch_v1 = kube.core_v1, kube.apps_v1, kube.batch_v1
+    networking_v1, storage_v1 = kube.networking_v1, kube.storage_v1
+    functions = {
+        "pods": (v1.list_pod_for_all_namespaces, True),
+        "persistentvolumeclaims": (v1.list_persistent_volume_claim_for_all_namespaces, True),
+        "services": (v1.list_service_for_all_namespaces, True),
+        "endpoints": (v1.list_endpoints_for_all_namespaces, True),
+        "endpointslices": (kube.discovery_v1.list_endpoint_slice_for_all_namespaces, True),
+        "configmaps": (v1.list_config_map_for_all_namespaces, True),
+        "secrets": (v1.list_secret_for_all_namespaces, True),
+        "serviceaccounts": (v1.list_service_account_for_all_namespaces, True),
+        "deployments": (apps_v1.list_deployment_for_all_namespaces, True),
+        "statefulsets": (apps_v1.list_stateful_set_for_all_namespaces, True),
+        "daemonsets": (apps_v1.list_daemon_set_for_all_namespaces, True),
+        "replicasets": (apps_v1.list_replica_set_for_all_namespaces, True),
+        "jobs": (batch_v1.list_job_for_all_namespaces, True),
+        "cronjobs": (batch_v1.list_cron_job_for_all_namespaces, True),
+        "ingresses": (networking_v1.list_ingress_for_all_namespaces, True),
+        "ingressclasses": (networking_v1.list_ingress_class, False),
+        "persistentvolumes": (v1.list_persistent_volume, False),
+        "storageclasses": (storage_v1.list_storage_class, False),
+        "customresourcedefinitions": (kube.apiextensions_v1.list_custom_resource_definition, False),
+    }
+    if fast:
+        for kind, (_, namespaced) in functions.items():
+            accept = METADATA_ACCEPT if metadata_only and kind in METADATA_ONLY_KINDS else None
+            list_fn = raw_list_function(kube.dynamic, REST_LIST_PATHS[kind][0], RECORD_FIELDS[kind], kind, accept)
+            functions[kind] = (list_fn, namespaced)
+    elif metadata_only:
+        for kind in METADATA_ONLY_KINDS:
+            functions[kind] = (metadata_list_function(kube.dynamic, REST_LIST_PATHS[kind][0]), functions[kind][1])
+    return functions
+
+# REST path and list model of every kind, used by the asyncio engine (k8s_async.py).
+REST_LIST_PATHS = {
+    "pods": ("/api/v1/pods", "V1PodList"),
+    "persistentvolumeclaims": ("/api/v1/persistentvolumeclaims", "V1PersistentVolumeClaimList"),
+    "services": ("/api/v1/services", "V1ServiceList"),
+    "endpoints": ("/api/v1/endpoints", "V1EndpointsList"),
+    "endpointslices": ("/apis/discovery.k8s.io/v1/endpointslices", "V1EndpointSliceList"),
+    "configmaps": ("/api/v1/configmaps", "V1ConfigMapList"),
+    "secrets": ("/api/v1/secrets", "V1SecretList"),
+    "serviceaccounts": ("/api/v1/serviceaccounts", "V1ServiceAccountList"),
+    "deployments": ("/apis/apps/v1/deployments", "V1DeploymentList"),
+    "statefulsets": ("/apis/apps/v1/statefulsets", "V1StatefulSetList"),
+    "daemonsets": ("/apis/apps/v1/daemonsets", "V1DaemonSetList"),
+    "replicasets": ("/apis/apps/v1/replicasets", "V1ReplicaSetList"),
+    "jobs": ("/apis/batch/v1/jobs", "V1JobList"),
+    "cronjobs": ("/apis/batch/v1/cronjobs", "V1CronJobList"),
+    "ingresses": ("/apis/networking.k8s.io/v1/ingresses", "V1IngressList"),
+    "ingressclasses": ("/apis/networking.k8s.io/v1/ingressclasses", "V1IngressClassList"),
+    "persistentvolumes": ("/api/v1/persistentvolumes", "V1PersistentVolumeList"),
+    "storageclasses": ("/apis/storage.k8s.io/v1/storageclasses", "V1StorageClassList"),
+    "customresourcedefinitions": ("/apis/apiextensions.k8s.io/v1/customresourcedefinitions", "V1CustomResourceDefinitionList"),
+}
+
+# Fields each kind is projected to on the raw-JSON fast path (k8s_records.py);
+# must cover every attribute the finders read. metadata is always included.
+_BACKEND = {
+    "service": {"name": None},
+    "resource": {"apiGroup": None, "kind": None, "name": None},
+}
+_CONTAINER = {
+    "env": [{"valueFrom": {"configMapKeyRef": {"name": None}, "secretKeyRef": {"name": None}}}],
+    "envFrom": [{"configMapRef": {"name": None}, "secretRef": {"name": None}}],
+}
+# Everything k8s_refs.pod_spec_refs() follows.
+_POD_SPEC = {
+    "volumes": [{
+        "persistentVolumeClaim": {"claimName": None},
+        "configMap": {"name": None},
+        "secret": {"secretName": None},
+        "projected": {"sources": [{"configMap": {"name": None}, "secret": {"name": None}}]},
+    }],
+    "containers": [_CONTAINER],
+    "initContainers": [_CONTAINER],
+    "ephemeralContainers": [_CONTAINER],
+    "imagePullSecrets": [{"name": None}],
+    "serviceAccountName": None,
+}
+_TEMPLATE = {"spec": _POD_SPEC}
+RECORD_FIELDS = {
+    "pods": {
+        "spec": _POD_SPEC,
+        "status": {"phase": None},
+    },
+    "persistentvolumeclaims": {
+        "spec": {"volumeName": None, "storageClassName": None, "resources": {"requests": None}},
+        "status": {"phase": None, "capacity": None},
+    },
+    "services": {"spec": {"type": None}},
+    "endpoints": {"subsets": [{}]},
+    "endpointslices": {"endpoints": [{}]},
+    "configmaps": {},
+    "secrets": {},
+    "serviceaccounts": {},
+    "deployments": {"spec": {"replicas": None, "template": _TEMPLATE}, "status": {"availableReplicas": None}},
+    "statefulsets": {
+        "spec": {"replicas": None, "template": _TEMPLATE, "volumeClaimTemplates": [{"metadata": {"name": None}}]},
+    },
+    "daemonsets": {"spec": {"template": _TEMPLATE}, "status": {"currentNumberScheduled": None}},
+    "replicasets": {"spec": {"replicas": None, "template": _TEMPLATE}},
+    "jobs": {"spec": {"template": _TEMPLATE}, "status": {"succeeded": None, "failed": None}},
+    "cronjobs": {
+        "spec": {"suspend": None, "jobTemplate": {"spec": {"template": _TEMPLATE}}},
+        "status": {"lastScheduleTime": None},
+    },
+    "ingresses": {
+        "spec": {
+            "defaultBackend": _BACKEND,
+            "ingressClassName": None,
+            "rules": [{"http": {"paths": [{"backend": _BACKEND}]}}],
+        },
+    },
+    "ingressclasses": {},
+    "persistentvolumes": {"spec": {"storageClassName": None, "capacity": None}, "status": {"phase": None}},
+    "storageclasses": {},
+    "customresourcedefinitions": {
+        "spec": {"group": None, "names": {"kind": None, "plural": None}, "versions": [{"name": None, "served": None}]},
+    },
+}
+
+# Kinds whose pod specs / pod templates feed the reference graph.
+WORKLOAD_KINDS = ("deployments", "statefulsets", "daemonsets", "replicasets", "jobs", "cronjobs")
+REFERENCE_KINDS = ("pods",) + WORKLOAD_KINDS
+# Namespaced kinds indexed in every namespace, not just the scanned ones: StorageClass
+# usage is cluster-wide. Namespaced finders still only read the namespaces in scope.
+CLUSTER_WIDE_KINDS = {"persistentvolumeclaims"}
+STORAGE_KINDS = ("persistentvolumeclaims", "persistentvolumes")
+
+def _storage_bytes(resources):
+    """Bytes of the "storage" entry of a requests/capacity map (0 if absent or unparsable)."""
+    try:
+        return int(parse_quantity((resources or {})["storage"]))
+    except (KeyError, ValueError):
+        return 0
+
+def storage_class_usage(pvcs, pvs):
+    """
+    One pass over all PVCs and PVs, grouped by StorageClass:
+    {class: {"pvcs", "requested_bytes", "pvs", "capacity_bytes"}}.
+    PVs count on their own, so statically provisioned volumes (no PVC, or a PVC
+    created without a class) keep their class in use.
+    """
+    usage = {}
+
+    def entry(name):
+        return usage.setdefault(name, {"pvcs": 0, "requested_bytes": 0, "pvs": 0, "capacity_bytes": 0})
+
+    for pvc in pvcs:
+        if pvc.spec and pvc.spec.storage_class_name:
+            row = entry(pvc.spec.storage_class_name)
+            row["pvcs"] += 1
+            row["requested_bytes"] += _storage_bytes(pvc.spec.resources.requests if pvc.spec.resources else None)
+    for pv in pvs:
+        if pv.spec and pv.spec.storage_class_name:
+            row = entry(pv.spec.storage_class_name)
+            row["pvs"] += 1
+            row["capacity_bytes"] += _storage_bytes(pv.spec.capacity)
+    return usage
+
+class ClusterSnapshot:
+    """
+    In-memory view of the cluster shared by all finders of one scan.
+    - Each kind is listed at most once, on first use (or up front via prefetch()).
+    - Namespaced objects outside `namespaces` are dropped while indexing
+      (except CLUSTER_WIDE_KINDS).
+    - Objects are indexed as {namespace: {name: obj}}; cluster-scoped kinds use namespace None.
+    - LISTs are paginated (page_size objects per request, see k8s_utils.iter_list).
+    - metadata_only lists METADATA_ONLY_KINDS without their spec/data.
+    - fast stores compact records (k8s_records.py) instead of client models.
+    - kube (default: KUBE) supplies the clients; list_functions replaces them entirely,
+      e.g. with an offline data source.
+    """
+
+    def __init__(self, namespaces, list_functions=None, page_size=None, metadata_only=True, fast=False, kube=None):
+        self.namespaces = list(namespaces)
+        self.kube = kube or KUBE
+        self.page_size = page_size
+        self.metadata_only = metadata_only
+        self.fast = fast
+        self._namespace_set = set(self.namespaces)
+        self._list_functions = list_functions or default_list_functions(metadata_only, fast, self.kube)
+        self._index = {}
+        self._locks = {kind: threading.Lock() for kind in self._list_functions}
+        self._uids = {}
+        self._errors = {}
+        self._finder_errors = {}
+        self._lookups = {}
+        self._references = {}
+        self._storage_usage = None
+        self.resource_versions = {}
+        self.capture = None
+        self.replay = False
+
+    def is_namespaced(self, kind):
+        return self._list_functions[kind][1]
+
+    def list_function(self, kind):
+        return self._list_functions[kind][0]
+
+    def load_kind(self, kind):
+        """LIST one kind and return its index; records the list resourceVersion for WATCH."""
+        list_fn, namespaced = self._list_functions[kind]
+        index = {}
+        list_meta = {}
+        listed = 0
+        for listed, obj in enumerate(iter_list(list_fn, page_size=self.page_size, list_meta=list_meta), 1):
+            self._add(kind, index, namespaced, obj)
+        self._listed(kind, list_meta.get("resource_version"), listed)
+        logging.info(f"Snapshot loaded {sum(len(v) for v in index.values())} {kind}")
+        return index
+
+    def in_scope(self, kind, namespace):
+        return namespace in self._namespace_set or kind in CLUSTER_WIDE_KINDS
+
+    def _add(self, kind, index, namespaced, obj):
+        ns = obj.metadata.namespace if namespaced else None
+        if namespaced and not self.in_scope(kind, ns):
+            return
+        index.setdefault(ns, {})[obj.metadata.name] = obj
+        if self.capture:
+            self.capture.object(kind, obj)
+
+    def _listed(self, kind, resource_version, listed):
+        REGISTRY.inc(OBJECTS_LISTED, {"kind": kind}, listed)
+        self.resource_versions[kind] = resource_version
+        if self.capture:
+            self.capture.list_done(kind, resource_version)
+
+    async def _load_kind_async(self, kube, kind):
+        path, response_type = REST_LIST_PATHS[kind]
+        namespaced = self.is_namespaced(kind)
+        index = {}
+        list_meta = {}
+        metadata_only = self.metadata_only and kind in METADATA_ONLY_KINDS
+        project = compile_list_projection(RECORD_FIELDS[kind], kind) if self.fast else None
+        listed = 0
+        async for obj in kube.iter_list(path, response_type, list_meta=list_meta,
+                                        metadata_only=metadata_only, project=project):
+            listed += 1
+            self._add(kind, index, namespaced, obj)
+        self._listed(kind, list_meta.get("resource_version"), listed)
+        logging.info(f"Snapshot loaded {sum(len(v) for v in index.values())} {kind} (async)")
+        return index
+
+    def prefetch_async(self, kinds=None, **engine_options):
+        """
+        Like prefetch(), but every LIST runs on one asyncio engine sharing a global
+        concurrency limit and QPS/burst token bucket (see k8s_async.AsyncKubeClient).
+        """
+        kinds = [k for k in (kinds or self._list_functions) if k not in self._index]
+
+        async def load_all():
+            configuration = self.kube.configuration
+            async with AsyncKubeClient(configuration, page_size=self.page_size, **engine_options) as kube:
+                return await asyncio.gather(
+                    *(self._load_kind_async(kube, kind) for kind in kinds), return_exceptions=True
+                )
+
+        for kind, result in zip(kinds, asyncio.run(load_all())):
+            if isinstance(result, Exception):
+                logging.error(f"Error listing {kind}: {result}")
+                self._errors[kind] = result
+            else:
+                self._index[kind] = result
+
+    def _kind_index(self, kind):
+        if kind not in self._index:
+            with self._locks[kind]:
+                if kind in self._errors:
+                    # A failed LIST is not retried for every namespace of the same scan.
+                    raise self._errors[kind]
+                if kind not in self._index:
+                    try:
+                        self._index[kind] = self.load_kind(kind)
+                    except Exception as e:
+                        self._errors[kind] = e
+                        raise
+        return self._index[kind]
+
+    def loaded_kinds(self):
+        return set(self._index)
+
+    def lookup(self, key, compute):
+        """
+        Result of a live API lookup the index cannot answer (owners of unindexed kinds,
+        custom-resource probes), memoized per snapshot. Captures record every result;
+        a replayed snapshot answers from the capture and returns None for unseen keys.
+        """
+        key = tuple(key)
+        if key not in self._lookups:
+            if self.replay:
+                logging.warning(f"Lookup {key} not in capture; result unknown")
+                return None
+            value = compute()
+            self._lookups[key] = value
+            if self.capture:
+                self.capture.lookup(key, value)
+        return self._lookups[key]
+
+    def probe_all(self, paths):
+        """
+        Existence probes for {key: REST list path}, run concurrently (limit=1, metadata
+        only) and memoized like lookup(). Returns {key: True/False}; failed probes and
+        keys a replayed capture never saw are left out.
+        """
+        def probe(key, path):
+            return lambda: self.lookup(key, lambda: exists(metadata_list_function(self.kube.dynamic, path)))
+
+        results = probe_all({key: probe(key, path) for key, path in paths.items()})
+        return {key: found for key, found in results.items() if found is not None}
+
+    def clear_lookups(self):
+        if not self.replay:
+            self._lookups.clear()
+
+    def start_capture(self, path):
+        """Stream every object this snapshot lists (and every lookup) to a capture file."""
+        if self.fast:
+            raise ValueError("--capture needs client models; it cannot be combined with --fast")
+        kinds = {kind: namespaced for kind, (_, namespaced) in self._list_functions.items()}
+        metadata_only = [kind for kind in kinds if self.metadata_only and kind in METADATA_ONLY_KINDS]
+        self.capture = CaptureWriter(path, self.namespaces, kinds, metadata_only)
+
+    @classmethod
+    def from_capture(cls, path, fast=False):
+        """
+        Offline snapshot rebuilt from a --capture file; needs neither kubeconfig nor an API
+        server. Objects become client models again (PartialObjectMetadata for kinds that
+        were captured metadata-only), or compact records with fast=True.
+        """
+        records = read_capture(path)
+        header = next(records)
+        kinds = header["kinds"]
+        metadata_only = set(header.get("metadata_only", ()))
+
+        def not_captured(kind):
+            def list_missing(**_):
+                raise RuntimeError(f"{kind} was not listed in capture {path}")
+            return list_missing
+
+        snapshot = cls(header["namespaces"], {kind: (not_captured(kind), ns) for kind, ns in kinds.items()}, fast=fast)
+        snapshot.replay = True
+        api_client = ApiClient()
+        converters = {}
+        for kind in kinds:
+            if fast:
+                converters[kind] = compile_item_projection(RECORD_FIELDS[kind], kind)
+            elif kind in metadata_only:
+                converters[kind] = lambda data: PartialObjectMetadata(
+                    deserialize_model(api_client, data.get("metadata") or {}, "V1ObjectMeta")
+                )
+            else:
+                model = REST_LIST_PATHS[kind][1][:-len("List")]
+                converters[kind] = lambda data, model=model: deserialize_model(api_client, data, model)
+        indexes = {}
+        for record in records:
+            if record["type"] == "object":
+                kind = record["kind"]
+                snapshot._add(kind, indexes.setdefault(kind, {}), kinds[kind], converters[kind](record["object"]))
+            elif record["type"] == "list":
+                snapshot._index[record["kind"]] = indexes.pop(record["kind"], {})
+                snapshot.resource_versions[record["kind"]] = record["resource_version"]
+            elif record["type"] == "lookup":
+                snapshot._lookups[tuple(record["key"])] = record["value"]
+        logging.info(f"Snapshot replayed from {path} (captured {header['captured_at']})")
+        return snapshot
+
+    def uids(self, kind):
+        """UIDs of every object of a kind; built once from the index and dropped when it changes."""
+        uids = self._uids.get(kind)
+        if uids is None:
+            uids = {obj.metadata.uid for objects in self._kind_index(kind).values() for obj in objects.values()}
+            self._uids[kind] = uids
+        return uids
+
+    def replace_kind(self, kind, index):
+        """Install a freshly listed index; returns the namespaces whose contents may have changed."""
+        old = self._index.get(kind, {})
+        self._index[kind] = index
+        self._errors.pop(kind, None)
+        self._uids.pop(kind, None)
+        self.clear_lookups()
+        if kind in REFERENCE_KINDS:
+            self._references.clear()
+        if kind in STORAGE_KINDS:
+            self._storage_usage = None
+        return set(old) | set(index)
+
+    def apply_event(self, kind, event_type, obj):
+        """Apply one WATCH event (ADDED/MODIFIED/DELETED). Returns False if the object is out of scope."""
+        namespaced = self.is_namespaced(kind)
+        ns = obj.metadata.namespace if namespaced else None
+        if namespaced and not self.in_scope(kind, ns):
+            return False
+        objects = self._kind_index(kind).setdefault(ns, {})
+        self._uids.pop(kind, None)
+        if kind in REFERENCE_KINDS:
+            self._references.pop(ns, None)
+        if kind in STORAGE_KINDS:
+            self._storage_usage = None
+        if event_type == "DELETED":
+            objects.pop(obj.metadata.name, None)
+        else:
+            objects[obj.metadata.name] = obj
+        return True
+
+    def ensure_loaded(self, kind):
+        """LIST a kind now unless it is already in the snapshot."""
+        self._kind_index(kind)
+
+    def prefetch(self, kinds=None):
+        """List the given kinds (default: all) concurrently, one LIST per kind."""
+        kinds = [k for k in (kinds or self._list_functions) if k not in self._index]
+        with ThreadPoolExecutor(max_workers=max(len(kinds), 1)) as executor:
+            futures = {executor.submit(self._kind_index, kind): kind for kind in kinds}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error listing {futures[future]}: {e}")
+
+    def list(self, kind, namespace=None):
+        """All objects of a kind in one namespace (namespaced kinds) or cluster-wide."""
+        return list(self._kind_index(kind).get(namespace, {}).values())
+
+    def get(self, kind, namespace, name):
+        return self._kind_index(kind).get(namespace, {}).get(name)
+
+    def references(self, namespace):
+        """
+        ReferenceGraph (k8s_refs.py) of one namespace: its pods and the pod templates of
+        its workloads, walked once and kept until one of REFERENCE_KINDS changes there.
+        """
+        graph = self._references.get(namespace)
+        if graph is None:
+            graph = ReferenceGraph()
+            for pod in self.list("pods", namespace):
+                graph.add_pod(pod)
+            for kind in WORKLOAD_KINDS:
+                for workload in self.list(kind, namespace):
+                    graph.add_workload(workload)
+            self._references[namespace] = graph
+        return graph
+
+    def failed_kinds(self):
+        """Kinds whose LIST failed in this snapshot."""
+        return set(self._errors)
+
+    def finder_error(self, sheet, namespace, error):
+        """
+        Record an error a finder caught and carried on after, for one namespace (None:
+        cluster-wide): its `sheet` is incomplete for this run (see record_state).
+        """
+        self._finder_errors.setdefault(sheet, {})[namespace] = error
+
+    def pop_finder_errors(self, sheets):
+        """{sheet: {namespace: error}} recorded by finder_error() for these sheets, then forgotten."""
+        return {sheet: self._finder_errors.pop(sheet) for sheet in sheets if sheet in self._finder_errors}
+
+    def list_all(self, kind):
+        """Every indexed object of a kind, across all namespaces."""
+        return [obj for objects in self._kind_index(kind).values() for obj in objects.values()]
+
+    def storage_usage(self):
+        """storage_class_usage() over all PVCs and PVs; computed once, dropped when either changes."""
+        usage = self._storage_usage
+        if usage is None:
+            usage = storage_class_usage(self.list_all("persistentvolumeclaims"), self.list_all("persistentvolumes"))
+            self._storage_usage = usage
+        return usage
+
+    def names(self, kind, namespace=None):
+        return set(self._kind_index(kind).get(namespace, {}))
+
 # ==============================================================================
 # ADVANCED UNUSED RESOURCE DETECTION FUNCTIONS
 # ==============================================================================
+# Namespaced finders take an optional `namespaces` list so daemon mode can
+# recompute only the namespaces touched by watch events.
+
+def _scope(snapshot, namespaces):
+    return snapshot.namespaces if namespaces is None else namespaces
 
-def find_unused_pvs():
+def find_unused_pvs(snapshot):
     try:
-        pvs = v1.list_persistent_volume().items
         unused = []
-        for pv in pvs:
+        for pv in snapshot.list("persistentvolumes"):
             if skip_due_to_label(pv) is True:
                 continue
-            if pv.status.phase == "Available" or is_orphaned(pv):
+            if pv.status.phase == "Available" or is_orphaned(pv, snapshot):
                 unused.append(pv.metadata.name)
         return unused
     except Exception as e:
         logging.error(f"Error in find_unused_pvs: {e}")
+        snapshot.finder_error("PersistentVolumes", None, e)
         return []
 
-def find_unused_pvcs():
+def find_unused_pvcs(snapshot, namespaces=None):
     """
     Enhanced PVC check:
     - For each namespace, retrieve all PVCs.
-    - Build a set of PVCs referenced by pods in "Running" or "Pending" state.
-    - Also check if a PVC is in Bound state but its associated PV is Released.
+    - PVCs referenced by live pods or workload templates come from the namespace's
+      reference graph (pods that Succeeded or Failed do not count).
+    - Also check if a PVC is in Bound state but its associated PV is Released
+      (PVs come from the snapshot's name index shared with find_unused_pvs).
     - Mark a PVC as unused if it is either not Bound or is Bound but not referenced.
     """
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            pvc_list = v1.list_namespaced_persistent_volume_claim(ns).items
-            referenced = set()
-            pods = v1.list_namespaced_pod(ns).items
-            for pod in pods:
-                if pod.status.phase in ["Running", "Pending"]:
-                    if pod.spec.volumes:
-                        for vol in pod.spec.volumes:
-                            if vol.persistent_volume_claim:
-                                referenced.add(vol.persistent_volume_claim.claim_name)
-            for pvc in pvc_list:
+            graph = snapshot.references(ns)
+            for pvc in snapshot.list("persistentvolumeclaims", ns):
                 if skip_due_to_label(pvc) is True:
                     continue
                 # If PVC is not Bound, or if Bound but not referenced
-                if pvc.status.phase != "Bound" or pvc.metadata.name not in referenced:
-                    ns_unused.append(f"{ns}/{pvc.metadata.name}")
-                else:
-                    # Optionally, check associated PV status if available.
-                    if pvc.spec.volumeName:
-                        try:
-                            pv = v1.read_persistent_volume(pvc.spec.volumeName)
-                            if pv.status.phase in ["Released", "Failed"]:
-                                ns_unused.append(f"{ns}/{pvc.metadata.name}")
-                        except Exception as e:
-                            logging.error(f"Error reading PV {pvc.spec.volumeName} for PVC {pvc.metadata.name}: {e}")
-            return ns_unused
+                referenced = graph.is_referenced(ns, PERSISTENTVOLUMECLAIMS, pvc.metadata.name)
+                if pvc.status.phase != "Bound" or not referenced:
+                    unused.append(f"{ns}/{pvc.metadata.name}")
+                elif pvc.spec.volume_name:
+                    # Bound and referenced: still unused if the PV behind it is Released/Failed.
+                    pv = snapshot.get("persistentvolumes", None, pvc.spec.volume_name)
+                    if pv is None:
+                        logging.error(f"PV {pvc.spec.volume_name} for PVC {ns}/{pvc.metadata.name} not found")
+                    elif pv.status.phase in ["Released", "Failed"]:
+                        unused.append(f"{ns}/{pvc.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_pvcs for namespace {ns}: {e}")
-            return []
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("PersistentVolumeClaims", ns, e)
     return unused
 
-def find_unused_configmaps_and_secrets():
-    used_configmaps, used_secrets = set(), set()
-    def process_namespace(ns):
-        local_used_cm, local_used_sec = set(), set()
+def find_unused_configmaps_and_secrets(snapshot, namespaces=None):
+    """
+    ConfigMaps and Secrets no pod or workload template in their own namespace
+    references (volumes, projected volumes, env, envFrom, imagePullSecrets).
+    """
+    unused_configmaps, unused_secrets = [], []
+    for ns in _scope(snapshot, namespaces):
         try:
-            pods = v1.list_namespaced_pod(ns).items
-            for pod in pods:
-                if pod.spec.volumes:
-                    for vol in pod.spec.volumes:
-                        if vol.config_map:
-                            local_used_cm.add(vol.config_map.name)
-                        if vol.secret:
-                            local_used_sec.add(vol.secret.secret_name)
+            graph = snapshot.references(ns)
+            unused_configmaps.extend(f"{ns}/{name}" for name in graph.unused(CONFIGMAPS, ns, snapshot.names("configmaps", ns)))
+            unused_secrets.extend(f"{ns}/{name}" for name in graph.unused(SECRETS, ns, snapshot.names("secrets", ns)))
         except Exception as e:
-            logging.error(f"Error scanning pods in {ns} for ConfigMap/Secret usage: {e}")
-        return local_used_cm, local_used_sec
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            cm, sec = future.result()
-            used_configmaps.update(cm)
-            used_secrets.update(sec)
-    try:
-        all_configmaps = {cm.metadata.name for cm in v1.list_config_map_for_all_namespaces().items}
-        all_secrets = {sec.metadata.name for sec in v1.list_secret_for_all_namespaces().items}
-    except Exception as e:
-        logging.error(f"Error listing all ConfigMaps/Secrets: {e}")
-        return [], []
-    return list(all_configmaps - used_configmaps), list(all_secrets - used_secrets)
+            logging.error(f"Error checking ConfigMap/Secret usage in {ns}: {e}")
+            snapshot.finder_error("ConfigMaps", ns, e)
+            snapshot.finder_error("Secrets", ns, e)
+    return unused_configmaps, unused_secrets
 
-def find_unused_pods():
+def find_unused_pods(snapshot, namespaces=None):
     unused = []
-    threshold = datetime.utcnow() - timedelta(hours=1)
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            pods = v1.list_namespaced_pod(ns).items
-            for pod in pods:
+            for pod in snapshot.list("pods", ns):
                 if skip_due_to_label(pod) is True:
                     continue
                 phase = pod.status.phase
                 if phase in ["Succeeded", "Failed"]:
-                    ns_unused.append(f"{ns}/{pod.metadata.name}")
+                    unused.append(f"{ns}/{pod.metadata.name}")
                 else:
                     creation_ts = pod.metadata.creation_timestamp
                     if creation_ts and (datetime.utcnow() - creation_ts.replace(tzinfo=None)) > timedelta(days=15):
-                        ns_unused.append(f"{ns}/{pod.metadata.name}")
+                        unused.append(f"{ns}/{pod.metadata.name}")
                     elif is_resource_expired(pod, "orphanTTL"):
-                        ns_unused.append(f"{ns}/{pod.metadata.name}")
+                        unused.append(f"{ns}/{pod.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_pods for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("Pods", ns, e)
     return unused
 
-def find_unused_services():
+def services_with_endpoints(snapshot, ns):
+    """
+    Names of Services in ns that have at least one endpoint.
+    Joins EndpointSlices (discovery.k8s.io/v1) to Services in memory through the
+    kubernetes.io/service-name label, so a Service split across several slices counts
+    as backed if any slice has endpoints. Falls back to core Endpoints on clusters
+    without the EndpointSlice API.
+    """
+    try:
+        slices = snapshot.list("endpointslices", ns)
+    except Exception as e:
+        logging.warning(f"EndpointSlices unavailable, using Endpoints for {ns}: {e}")
+        return {ep.metadata.name for ep in snapshot.list("endpoints", ns) if ep.subsets}
+    backed = set()
+    for endpoint_slice in slices:
+        svc_name = (endpoint_slice.metadata.labels or {}).get("kubernetes.io/service-name")
+        if svc_name and endpoint_slice.endpoints:
+            backed.add(svc_name)
+    return backed
+
+def find_unused_services(snapshot, namespaces=None):
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            services = v1.list_namespaced_service(ns).items
-            for svc in services:
+            backed = services_with_endpoints(snapshot, ns)
+            for svc in snapshot.list("services", ns):
                 if skip_due_to_label(svc) is True:
                     continue
                 if svc.spec.type == "ExternalName":
                     continue
-                try:
-                    ep = v1.read_namespaced_endpoints(svc.metadata.name, ns)
-                    if not ep.subsets:
-                        ns_unused.append(f"{ns}/{svc.metadata.name}")
-                except Exception as e:
-                    logging.error(f"Error reading endpoints for service {ns}/{svc.metadata.name}: {e}")
-                    ns_unused.append(f"{ns}/{svc.metadata.name}")
+                if svc.metadata.name not in backed:
+                    unused.append(f"{ns}/{svc.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_services for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("Services", ns, e)
     return unused
 
-def find_unused_deployments():
+def find_unused_deployments(snapshot, namespaces=None):
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            deps = apps_v1.list_namespaced_deployment(ns).items
-            for dep in deps:
+            for dep in snapshot.list("deployments", ns):
                 if skip_due_to_label(dep) is True:
                     continue
                 desired = dep.spec.replicas or 0
                 available = dep.status.available_replicas or 0
                 if desired == 0 or available == 0:
-                    ns_unused.append(f"{ns}/{dep.metadata.name}")
-                elif is_orphaned(dep):
-                    ns_unused.append(f"{ns}/{dep.metadata.name}")
+                    unused.append(f"{ns}/{dep.metadata.name}")
+                elif is_orphaned(dep, snapshot):
+                    unused.append(f"{ns}/{dep.metadata.name}")
                 elif is_resource_expired(dep, "orphanTTL"):
-                    ns_unused.append(f"{ns}/{dep.metadata.name}")
+                    unused.append(f"{ns}/{dep.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_deployments for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("Deployments", ns, e)
     return unused
 
-def find_unused_statefulsets():
+def find_unused_statefulsets(snapshot, namespaces=None):
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            sts_list = apps_v1.list_namespaced_stateful_set(ns).items
-            for sts in sts_list:
+            for sts in snapshot.list("statefulsets", ns):
                 if skip_due_to_label(sts) is True:
                     continue
                 if (sts.spec.replicas or 0) == 0 or is_resource_expired(sts, "orphanTTL"):
-                    ns_unused.append(f"{ns}/{sts.metadata.name}")
+                    unused.append(f"{ns}/{sts.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_statefulsets for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("StatefulSets", ns, e)
     return unused
 
-def find_unused_daemonsets():
+def find_unused_daemonsets(snapshot, namespaces=None):
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            ds_list = apps_v1.list_namespaced_daemon_set(ns).items
-            for ds in ds_list:
+            for ds in snapshot.list("daemonsets", ns):
                 if skip_due_to_label(ds) is True:
                     continue
                 if (ds.status.current_number_scheduled or 0) == 0 or is_resource_expired(ds, "orphanTTL"):
-                    ns_unused.append(f"{ns}/{ds.metadata.name}")
+                    unused.append(f"{ns}/{ds.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_daemonsets for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("DaemonSets", ns, e)
     return unused
 
-def find_unused_replicasets():
+def find_unused_replicasets(snapshot, namespaces=None):
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            rs_list = apps_v1.list_namespaced_replica_set(ns).items
-            for rs in rs_list:
+            for rs in snapshot.list("replicasets", ns):
                 if skip_due_to_label(rs) is True:
                     continue
                 if (rs.spec.replicas or 0) == 0 or is_resource_expired(rs, "orphanTTL"):
-                    ns_unused.append(f"{ns}/{rs.metadata.name}")
+                    unused.append(f"{ns}/{rs.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_replicasets for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("ReplicaSets", ns, e)
     return unused
 
-def find_unused_jobs():
+def find_unused_jobs(snapshot, namespaces=None):
     unused_jobs = []
     unused_cronjobs = []
-    def process_namespace(ns):
-        ns_unused_jobs = []
-        ns_unused_cronjobs = []
+    for ns in _scope(snapshot, namespaces):
         try:
-            jobs = batch_v1.list_namespaced_job(ns).items
-            for job in jobs:
+            for job in snapshot.list("jobs", ns):
                 if skip_due_to_label(job) is True:
                     continue
                 if job.status.succeeded or job.status.failed or is_resource_expired(job, "orphanTTL"):
-                    ns_unused_jobs.append(f"{ns}/{job.metadata.name}")
+                    unused_jobs.append(f"{ns}/{job.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_jobs for namespace {ns}: {e}")
+            snapshot.finder_error("Jobs", ns, e)
         try:
-            cronjobs = batch_v1.list_namespaced_cron_job(ns).items
-            for cj in cronjobs:
+            for cj in snapshot.list("cronjobs", ns):
                 if skip_due_to_label(cj) is True:
                     continue
-                if not cj.spec.suspend and not cj.status.lastScheduleTime:
-                    ns_unused_cronjobs.append(f"{ns}/{cj.metadata.name}")
+                if not cj.spec.suspend and not cj.status.last_schedule_time:
+                    unused_cronjobs.append(f"{ns}/{cj.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_cronjobs for namespace {ns}: {e}")
-        return ns_unused_jobs, ns_unused_cronjobs
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            nj, ncj = future.result()
-            unused_jobs.extend(nj)
-            unused_cronjobs.extend(ncj)
+            snapshot.finder_error("CronJobs", ns, e)
     return unused_jobs, unused_cronjobs
 
-def find_unused_ingresses():
+def ingress_backends(ing):
+    """All backends of an ingress: the default backend plus every rule path."""
+    backends = []
+    if ing.spec.default_backend:
+        backends.append(ing.spec.default_backend)
+    for rule in ing.spec.rules or []:
+        if rule.http and rule.http.paths:
+            backends.extend(path.backend for path in rule.http.paths)
+    return backends
+
+def backend_exists(backend, ns, snapshot, service_names):
+    """
+    Resolves a service backend against the namespace's Service names, and a resource
+    backend against the snapshot when its kind is indexed (see OWNER_KINDS).
+    Resource backends of other kinds cannot be checked from memory and are assumed present.
+    """
+    if backend.service:
+        return backend.service.name in service_names
+    if backend.resource:
+        kind = OWNER_KINDS.get((backend.resource.api_group or "", backend.resource.kind))
+        if kind is None:
+            return True
+        namespace = ns if snapshot.is_namespaced(kind) else None
+        return snapshot.get(kind, namespace, backend.resource.name) is not None
+    return False
+
+def find_unused_ingresses(snapshot, namespaces=None):
+    """
+    An Ingress is unused when any backend is missing, its ingressClassName names an
+    IngressClass that does not exist, or it is past its TTL. Everything is resolved
+    from the snapshot, so the check makes no API calls.
+    """
     unused = []
-    def process_namespace(ns):
-        ns_unused = []
+    ingress_classes = snapshot.names("ingressclasses")
+    for ns in _scope(snapshot, namespaces):
         try:
-            ing_list = networking_v1.list_namespaced_ingress(ns).items
-            for ing in ing_list:
+            service_names = snapshot.names("services", ns)
+            for ing in snapshot.list("ingresses", ns):
                 if skip_due_to_label(ing) is True:
                     continue
-                backend_missing = False
-                if ing.spec.default_backend:
-                    svc_name = ing.spec.default_backend.service.name
-                    try:
-                        v1.read_namespaced_service(svc_name, ns)
-                    except Exception:
-                        backend_missing = True
-                if ing.spec.rules:
-                    for rule in ing.spec.rules:
-                        if rule.http and rule.http.paths:
-                            for path in rule.http.paths:
-                                svc_name = path.backend.service.name
-                                try:
-                                    v1.read_namespaced_service(svc_name, ns)
-                                except Exception:
-                                    backend_missing = True
-                if backend_missing or is_resource_expired(ing, "orphanTTL"):
-                    ns_unused.append(f"{ns}/{ing.metadata.name}")
+                backend_missing = any(
+                    not backend_exists(backend, ns, snapshot, service_names)
+                    for backend in ingress_backends(ing)
+                )
+                class_missing = bool(ing.spec.ingress_class_name) and ing.spec.ingress_class_name not in ingress_classes
+                if backend_missing or class_missing or is_resource_expired(ing, "orphanTTL"):
+                    unused.append(f"{ns}/{ing.metadata.name}")
         except Exception as e:
             logging.error(f"Error in find_unused_ingresses for namespace {ns}: {e}")
-        return ns_unused
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            unused.extend(future.result())
+            snapshot.finder_error("Ingresses", ns, e)
     return unused
 
-def find_unused_storageclasses():
+def find_unused_storageclasses(snapshot):
+    """StorageClasses no PVC (in any namespace) or PV refers to; see storage_class_usage()."""
     try:
-        storage_classes = [sc.metadata.name for sc in storage_v1.list_storage_class().items]
-        all_pvcs = []
-        for ns in NAMESPACES:
-            try:
-                pvcs = v1.list_namespaced_persistent_volume_claim(ns).items
-                all_pvcs.extend([pvc for pvc in pvcs if pvc.spec.storage_class_name])
-            except Exception as e:
-                logging.error(f"Error listing PVCs in namespace {ns}: {e}")
-        used_sc = {pvc.spec.storage_class_name for pvc in all_pvcs}
-        unused = [sc for sc in storage_classes if sc not in used_sc]
-        return unused
+        usage = snapshot.storage_usage()
+        return [sc.metadata.name for sc in snapshot.list("storageclasses") if sc.metadata.name not in usage]
     except Exception as e:
         logging.error(f"Error in find_unused_storageclasses: {e}")
+        snapshot.finder_error("StorageClasses", None, e)
         return []
 
-def find_unused_serviceaccounts():
-    used_sas = set()
-    def process_namespace(ns):
-        ns_used = set()
-        try:
-            pods = v1.list_namespaced_pod(ns).items
-            for pod in pods:
-                sa = pod.spec.service_account_name or "default"
-                ns_used.add(f"{ns}/{sa}")
-        except Exception as e:
-            logging.error(f"Error scanning pods in {ns} for service account usage: {e}")
-        return ns_used
-    with ThreadPoolExecutor() as executor:
-        futures = {executor.submit(process_namespace, ns): ns for ns in NAMESPACES}
-        for future in as_completed(futures):
-            used_sas.update(future.result())
+def find_unused_serviceaccounts(snapshot, namespaces=None):
     unused = []
-    for ns in NAMESPACES:
+    for ns in _scope(snapshot, namespaces):
         try:
-            sas = v1.list_namespaced_service_account(ns).items
-            for sa in sas:
-                key = f"{ns}/{sa.metadata.name}"
-                if key not in used_sas:
-                    unused.append(key)
+            graph = snapshot.references(ns)
+            unused.extend(f"{ns}/{name}" for name in graph.unused(SERVICEACCOUNTS, ns, snapshot.names("serviceaccounts", ns)))
         except Exception as e:
-            logging.error(f"Error listing service accounts in {ns}: {e}")
+            logging.error(f"Error checking service account usage in {ns}: {e}")
+            snapshot.finder_error("ServiceAccounts", ns, e)
     return unused
 
-def find_unused_namespaces():
-    unused = []
+def find_unused_namespaces(snapshot, namespaces=None):
+    """
+    Non-system namespaces without pods. Answered from the snapshot's pod index, which
+    the scan lists anyway; if pods could not be listed, every namespace is probed
+    instead (limit=1, metadata only, concurrently).
+    """
     system_ns = {"kube-system", "kube-public", "default", "kube-node-lease"}
-    for ns in NAMESPACES:
-        if ns in system_ns:
-            continue
-        try:
-            pods = v1.list_namespaced_pod(ns).items
-            if not pods:
-                unused.append(ns)
-        except Exception as e:
-            logging.error(f"Error checking namespace {ns} for pods: {e}")
-    return unused
+    scope = [ns for ns in _scope(snapshot, namespaces) if ns not in system_ns]
+    try:
+        has_pods = {ns: bool(snapshot.names("pods", ns)) for ns in scope}
+    except Exception as e:
+        logging.warning(f"Pod index unavailable ({e}); probing namespaces for pods")
+        has_pods = snapshot.probe_all({("namespace-pods", ns): f"/api/v1/namespaces/{ns}/pods" for ns in scope})
+        has_pods = {key[1]: found for key, found in has_pods.items()}
+        for ns in scope:
+            if ns not in has_pods:
+                snapshot.finder_error("Namespaces", ns, RuntimeError("pod existence probe failed"))
+    return [ns for ns in scope if has_pods.get(ns) is False]
 
-def find_unused_crds():
-    unused = []
+def find_unused_crds(snapshot):
+    """
+    CRDs without a single custom resource. Each CRD costs one concurrent existence
+    probe (limit=1, metadata only) instead of a LIST of all its objects.
+    """
     try:
-        crds = apiextensions_v1.list_custom_resource_definition().items
-        for crd in crds:
-            group = crd.spec.group
+        paths = {}
+        for crd in snapshot.list("customresourcedefinitions"):
             versions = [v.name for v in crd.spec.versions if v.served]
-            if not versions:
+            if versions:
+                paths[("crd-instances", crd.metadata.name)] = f"/apis/{crd.spec.group}/{versions[0]}/{crd.spec.names.plural}"
+        has_instances = snapshot.probe_all(paths)
+        if len(has_instances) < len(paths):
+            snapshot.finder_error("CRDs", None, RuntimeError(f"{len(paths) - len(has_instances)} CRD probes failed"))
+        return sorted(key[1] for key in paths if has_instances.get(key) is False)
+    except Exception as e:
+        logging.error(f"Error in find_unused_crds: {e}")
+        snapshot.finder_error("CRDs", None, e)
+        return []
+
+# ==============================================================================
+# FINDER REGISTRY
+# ==============================================================================
+# sheets:     report sheet(s) the finder fills, in the order of its return values
+# kinds:      snapshot kinds the finder reads
+# namespaced: finder accepts a `namespaces` subset and reports "<ns>/..." items
+
+Finder = namedtuple("Finder", ["sheets", "func", "kinds", "namespaced"])
+
+FINDERS = [
+    Finder(("PersistentVolumes",), find_unused_pvs, ("persistentvolumes",), False),
+    Finder(("PersistentVolumeClaims",), find_unused_pvcs, REFERENCE_KINDS + ("persistentvolumeclaims", "persistentvolumes"), True),
+    Finder(("ConfigMaps", "Secrets"), find_unused_configmaps_and_secrets, REFERENCE_KINDS + ("configmaps", "secrets"), True),
+    Finder(("Pods",), find_unused_pods, ("pods",), True),
+    Finder(("Services",), find_unused_services, ("services", "endpointslices"), True),
+    Finder(("Deployments",), find_unused_deployments, ("deployments",), True),
+    Finder(("StatefulSets",), find_unused_statefulsets, ("statefulsets",), True),
+    Finder(("DaemonSets",), find_unused_daemonsets, ("daemonsets",), True),
+    Finder(("ReplicaSets",), find_unused_replicasets, ("replicasets",), True),
+    Finder(("Jobs", "CronJobs"), find_unused_jobs, ("jobs", "cronjobs"), True),
+    Finder(("Ingresses",), find_unused_ingresses, ("ingresses", "services", "ingressclasses"), True),
+    Finder(("StorageClasses",), find_unused_storageclasses, ("storageclasses",) + STORAGE_KINDS, False),
+    Finder(("ServiceAccounts",), find_unused_serviceaccounts, REFERENCE_KINDS + ("serviceaccounts",), True),
+    Finder(("Namespaces",), find_unused_namespaces, ("pods",), True),
+    Finder(("CRDs",), find_unused_crds, ("customresourcedefinitions",), False),
+]
+
+# Snapshot kind of the objects each report sheet lists (None: not indexed by the snapshot).
+SHEET_KINDS = {
+    "PersistentVolumes": "persistentvolumes",
+    "PersistentVolumeClaims": "persistentvolumeclaims",
+    "ConfigMaps": "configmaps",
+    "Secrets": "secrets",
+    "Pods": "pods",
+    "Services": "services",
+    "Deployments": "deployments",
+    "StatefulSets": "statefulsets",
+    "DaemonSets": "daemonsets",
+    "ReplicaSets": "replicasets",
+    "Jobs": "jobs",
+    "CronJobs": "cronjobs",
+    "Ingresses": "ingresses",
+    "StorageClasses": "storageclasses",
+    "ServiceAccounts": "serviceaccounts",
+    "Namespaces": None,
+    "CRDs": "customresourcedefinitions",
+}
+
+def run_finder(finder, snapshot, namespaces=None):
+    """Run one finder and return {sheet: [items]}; timed into k8s_metrics.REGISTRY."""
+    name = finder.func.__name__
+    start = time.monotonic()
+    try:
+        if finder.namespaced:
+            result = finder.func(snapshot, namespaces)
+        else:
+            result = finder.func(snapshot)
+    finally:
+        REGISTRY.observe(FINDER_DURATION, {"finder": name}, time.monotonic() - start)
+    if len(finder.sheets) == 1:
+        result = (result,)
+    results = dict(zip(finder.sheets, result))
+    if namespaces is None:
+        # Partial (per-namespace) daemon reruns would undercount.
+        for sheet, items in results.items():
+            REGISTRY.set(FINDER_FINDINGS, {"finder": name, "sheet": sheet}, len(items))
+    return results
+
+def run_finders(snapshot, finders=None, max_workers=None, errors=None):
+    """
+    Dependency-aware scheduler for one scan.
+    - Every kind any finder reads is listed once, all kinds in parallel.
+    - Each finder starts as soon as all of its kinds are loaded, concurrently with
+      the remaining LISTs and finders, so scan latency tracks the slowest LIST
+      rather than the sum of all finders.
+    - A failing finder is logged and reported as empty; if errors is a dict, its
+      sheets are also recorded there ({sheet: exception}), and so are the sheets of
+      finders that caught an error and carried on (snapshot.finder_error).
+    Returns {sheet: [items]} in registry order.
+    """
+    finders = list(finders or FINDERS)
+    sheets = [sheet for finder in finders for sheet in finder.sheets]
+    kinds = sorted({kind for finder in finders for kind in finder.kinds})
+    results = {}
+    loaded = set()
+    snapshot.pop_finder_errors(sheets)
+    with ThreadPoolExecutor(max_workers=max_workers or len(kinds) + len(finders)) as executor:
+        pending = {executor.submit(snapshot.ensure_loaded, kind): ("kind", kind) for kind in kinds}
+        waiting = list(finders)
+        while pending or waiting:
+            for finder in [f for f in waiting if loaded.issuperset(f.kinds)]:
+                waiting.remove(finder)
+                pending[executor.submit(run_finder, finder, snapshot)] = ("finder", finder)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task, target = pending.pop(future)
+                if task == "kind":
+                    loaded.add(target)
+                    if future.exception():
+                        logging.error(f"Error listing {target}: {future.exception()}")
+                elif future.exception():
+                    logging.error(f"Error in {target.func.__name__}: {future.exception()}")
+                    results.update({sheet: [] for sheet in target.sheets})
+                    if errors is not None:
+                        errors.update({sheet: future.exception() for sheet in target.sheets})
+                else:
+                    results.update(future.result())
+    for sheet, namespaces in snapshot.pop_finder_errors(sheets).items():
+        logging.warning(f"{sheet} is incomplete: errors in {', '.join(sorted(ns or '<cluster>' for ns in namespaces))}")
+        if errors is not None:
+            errors.setdefault(sheet, next(iter(namespaces.values())))
+    return {sheet: results.get(sheet, []) for sheet in sheets}
+
+# ==============================================================================
+# REPORTING
+# ==============================================================================
+
+def storage_capacity_rows(snapshot):
+    """StorageClass capacity table (one row per class) from the snapshot's storage usage."""
+    try:
+        usage = snapshot.storage_usage()
+        classes = {sc.metadata.name for sc in snapshot.list("storageclasses")}
+    except Exception as e:
+        logging.error(f"Error building StorageClass capacity report: {e}")
+        return []
+    return [
+        {
+            "StorageClass": name,
+            "Exists": name in classes,
+            "PVCs": row["pvcs"],
+            "Requested Bytes": row["requested_bytes"],
+            "PVs": row["pvs"],
+            "PV Capacity Bytes": row["capacity_bytes"],
+        }
+        for name, row in sorted(usage.items())
+    ] + [
+        {"StorageClass": name, "Exists": True, "PVCs": 0, "Requested Bytes": 0, "PVs": 0, "PV Capacity Bytes": 0}
+        for name in sorted(classes - set(usage))
+    ]
+
+# ==============================================================================
+# CLEANUP
+# ==============================================================================
+
+def object_path(kind, namespace, name):
+    """REST path of one object, derived from the kind's list path in REST_LIST_PATHS."""
+    base, _, plural = REST_LIST_PATHS[kind][0].rpartition("/")
+    if namespace:
+        return f"{base}/namespaces/{namespace}/{plural}/{name}"
+    return f"{base}/{plural}/{name}"
+
+def cleanup_allowed(obj):
+    """
+    Last guard before deleting a flagged object:
+    - kor/used=true always wins,
+    - an orphanTTL annotation protects the object until the TTL has passed.
+    """
+    if skip_due_to_label(obj) is True:
+        return False, "kor/used=true"
+    if "orphanTTL" in (obj.metadata.annotations or {}) and not is_resource_expired(obj, "orphanTTL"):
+        return False, "orphanTTL not expired"
+    return True, None
+
+def cleanup_targets(snapshot, unused_resources, sheets):
+    """
+    CleanupTargets for the items the scan flagged in `sheets`, taken from the snapshot
+    (uid/resourceVersion become delete preconditions). Sheets without a snapshot kind
+    (Namespaces) are never cleaned up.
+    """
+    targets = []
+    for sheet in sheets:
+        kind = SHEET_KINDS.get(sheet)
+        if kind is None:
+            logging.warning(f"Cleanup of {sheet} is not supported; skipping")
+            continue
+        namespaced = snapshot.is_namespaced(kind)
+        for item in unused_resources.get(sheet, []):
+            namespace, _, name = item.rpartition("/") if namespaced else (None, None, item)
+            obj = snapshot.get(kind, namespace, name)
+            if obj is None:
+                logging.warning(f"Cleanup: {sheet} {item} is no longer in the snapshot; skipping")
                 continue
-            version = versions[0]
+            allowed, reason = cleanup_allowed(obj)
+            if not allowed:
+                logging.info(f"Cleanup: {sheet} {item} skipped ({reason})")
+                continue
+            targets.append(CleanupTarget(
+                kind, namespace, name, obj.metadata.uid, obj.metadata.resource_version,
+                object_path(kind, namespace, name),
+            ))
+    return targets
+
+def record_state(state_db, cluster, snapshot, unused_resources, errors, days=30):
+    """
+    Upsert this scan's verdicts into the state store (k8s_state.py) and write the
+    newly unused / resolved / unused > N days views. Only the snapshot's namespaces
+    are resolved; sheets whose finder failed (or caught an error in some namespace)
+    or whose kinds could not be listed are left untouched instead of being resolved.
+    """
+    failed_kinds = snapshot.failed_kinds()
+    complete = [
+        sheet for finder in FINDERS for sheet in finder.sheets
+        if sheet not in errors and not failed_kinds.intersection(finder.kinds)
+    ]
+
+    def uid_of(sheet, namespace, name):
+        kind = SHEET_KINDS.get(sheet)
+        if kind is None:
+            return None
+        obj = snapshot.get(kind, namespace or None, name)
+        return obj.metadata.uid if obj is not None else None
+
+    with StateStore(state_db) as store:
+        store.record_run(cluster, findings_from_report(unused_resources, uid_of), complete, snapshot.namespaces)
+        return save_deltas_to_excel(store, cluster, days)
+
+def save_results_to_excel(unused_resources, capacity=None):
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    file_name = f"unused_k8s_resources_{timestamp}.xlsx"
+    with pd.ExcelWriter(file_name) as writer:
+        summary = pd.DataFrame(
+            [(resource, len(items)) for resource, items in unused_resources.items()],
+            columns=["Resource", "Unused Count"],
+        )
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+        for resource, items in unused_resources.items():
+            if items:
+                df = pd.DataFrame(items, columns=["Unused " + resource])
+                df.to_excel(writer, sheet_name=resource, index=False)
+        if capacity:
+            pd.DataFrame(capacity).to_excel(writer, sheet_name="StorageClass Capacity", index=False)
+    logging.info(f"Results saved to '{file_name}'")
+    return file_name
+
+def scan_unused_resources(engine="threads", engine_options=None, metadata_only=True, fast=False,
+                          capture=None, snapshot=None, kube=None, namespaces=None,
+                          state_db=None, cluster=None, unused_days=30, cleanup=None, metrics_file=None,
+                          save_report=True):
+    """
+    engine="threads" lists kinds on a thread pool with the sync client;
+    engine="async" uses the rate-limited asyncio engine (engine_options: qps, burst, max_concurrency).
+    metadata_only=False fetches full objects for METADATA_ONLY_KINDS too.
+    fast=True skips client model deserialization (raw JSON projected to RECORD_FIELDS).
+    capture streams everything listed to a .jsonl.gz file; snapshot runs the checks
+    against an existing (e.g. replayed) snapshot instead of the live cluster.
+    kube/namespaces default to KUBE and get_namespaces().
+    state_db records the verdicts run over run (see record_state); cluster names the
+    cluster in it (default: the kubeconfig context name).
+    cleanup: {"sheets": [...], "journal": path, "confirm": bool, **engine options};
+    dry-runs (and with confirm, deletes) the flagged objects of those sheets (k8s_cleanup.py).
+    metrics_file gets the run's metrics in the Prometheus text format (k8s_metrics.py).
+    save_report=False skips the per-run Excel report (fleet scans write one merged report).
+    """
+    logging.info("Scanning Kubernetes cluster for unused resources...")
+    if snapshot is None:
+        if namespaces is None:
+            namespaces = get_namespaces(kube)
+        snapshot = ClusterSnapshot(namespaces, metadata_only=metadata_only, fast=fast, kube=kube)
+        if capture:
+            snapshot.start_capture(capture)
+        if engine == "async":
+            snapshot.prefetch_async(sorted({kind for finder in FINDERS for kind in finder.kinds}), **(engine_options or {}))
+
+    errors = {}
+    try:
+        unused_resources = run_finders(snapshot, errors=errors)
+    finally:
+        if snapshot.capture:
+            snapshot.capture.close()
+            logging.info(f"Capture written to {snapshot.capture.path}")
+
+    if save_report:
+        save_results_to_excel(unused_resources, capacity=storage_capacity_rows(snapshot))
+    if state_db:
+        record_state(state_db, cluster or snapshot.kube.context_name, snapshot, unused_resources, errors, unused_days)
+    if cleanup:
+        options = dict(cleanup)
+        targets = cleanup_targets(snapshot, unused_resources, options.pop("sheets"))
+        run_cleanup(targets, options.pop("journal"), options.pop("confirm", False), snapshot.kube.configuration, **options)
+    summary = f"Run metrics:\n{REGISTRY.summary_table()}"
+    logging.info(summary)
+    print(summary)
+    if metrics_file:
+        REGISTRY.write_textfile(metrics_file)
+    return unused_resources
+
+# ==============================================================================
+# FLEET MODE
+# One worker process per kubeconfig context: every cluster gets its own clients,
+# rate limits and GIL, so a slow or hanging cluster only delays its own result and
+# a fleet scan takes as long as its slowest cluster.
+# ==============================================================================
+
+DEFAULT_FLEET_WORKERS = 16
+
+def _scan_context(context, config_file, scan_options):
+    """Worker process: scan one kubeconfig context; returns (unused_resources, seconds)."""
+    configure_logging(f"%(asctime)s - [{context}] %(levelname)s - %(message)s")
+    start = time.monotonic()
+    kube = KubeContext(context=context, config_file=config_file)
+    unused_resources = scan_unused_resources(kube=kube, cluster=context, save_report=False, **scan_options)
+    return unused_resources, time.monotonic() - start
+
+def save_fleet_results_to_excel(results, errors=None):
+    """
+    Merged report of a fleet scan: results {cluster: unused_resources}; every sheet
+    gets a Cluster column. errors {cluster: message} go to an Errors sheet.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    file_name = f"unused_k8s_fleet_resources_{timestamp}.xlsx"
+    sheets = {}
+    for cluster in sorted(results):
+        for resource, items in results[cluster].items():
+            sheets.setdefault(resource, []).extend((cluster, item) for item in items)
+    with pd.ExcelWriter(file_name) as writer:
+        summary = pd.DataFrame(
+            [
+                (cluster, resource, len(items))
+                for cluster in sorted(results)
+                for resource, items in results[cluster].items()
+            ],
+            columns=["Cluster", "Resource", "Unused Count"],
+        )
+        summary.to_excel(writer, sheet_name="Summary", index=False)
+        for resource, rows in sheets.items():
+            if rows:
+                df = pd.DataFrame(rows, columns=["Cluster", "Unused " + resource])
+                df.to_excel(writer, sheet_name=resource, index=False)
+        if errors:
+            pd.DataFrame(sorted(errors.items()), columns=["Cluster", "Error"]).to_excel(
+                writer, sheet_name="Errors", index=False
+            )
+    logging.info(f"Fleet results saved to '{file_name}'")
+    return file_name
+
+def scan_fleet(contexts, config_file=None, max_workers=DEFAULT_FLEET_WORKERS, **scan_options):
+    """
+    Scan every kubeconfig context in its own worker process and write one merged report.
+    scan_options go to scan_unused_resources in each worker (engine, engine_options,
+    metadata_only, fast, state_db, unused_days); the context name is the cluster name.
+    Returns ({cluster: unused_resources}, {cluster: error message}).
+    """
+    results, errors = {}, {}
+    if not contexts:
+        logging.warning("Fleet scan: no contexts given")
+        return results, errors
+    start = time.monotonic()
+    workers = max(1, min(max_workers, len(contexts)))
+    logging.info(f"Fleet scan of {len(contexts)} cluster(s) with {workers} worker process(es)")
+    # spawn: workers start clean instead of inheriting the parent's threads and clients.
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_scan_context, context, config_file, scan_options): context for context in contexts}
+        for future in as_completed(futures):
+            context = futures[future]
+            try:
+                results[context], seconds = future.result()
+                logging.info(f"Fleet scan: {context} done in {seconds:.1f}s")
+            except Exception as e:
+                errors[context] = f"{type(e).__name__}: {e}"
+                logging.error(f"Fleet scan: {context} failed: {errors[context]}")
+    logging.info(f"Fleet scan finished in {time.monotonic() - start:.1f}s: {len(results)} ok, {len(errors)} failed")
+    save_fleet_results_to_excel(results, errors)
+    return results, errors
+
+# ==============================================================================
+# DAEMON MODE
+# ==============================================================================
+
+class UnusedResourceDaemon:
+    """
+    Long-running mode: one LIST per kind, then WATCH streams keep the snapshot current.
+    - Watch threads only enqueue events; a single loop applies them and recomputes,
+      so the snapshot is never mutated while a finder is reading it.
+    - Namespaced finders are re-run only for the namespaces touched since the last
+      batch; cluster-scoped finders are re-run when one of their kinds changes.
+    - Every resync_interval seconds all finders are re-run from memory so TTL-based
+      verdicts age without any API traffic.
+    - An expired resourceVersion (410) relists only the affected kind; so does a kind
+      whose initial LIST failed (before its WATCH starts) or an event that cannot be applied.
+    """
+
+    def __init__(self, namespaces, resync_interval=600, batch_interval=2, kube=None):
+        # WATCH needs the typed list functions, so daemon mode keeps full objects.
+        self.snapshot = ClusterSnapshot(namespaces, metadata_only=False, kube=kube)
+        self.kinds = sorted({kind for finder in FINDERS for kind in finder.kinds})
+        self.resync_interval = resync_interval
+        self.batch_interval = batch_interval
+        self._events = queue.Queue()
+        self._stop = threading.Event()
+        self._results = {}  # sheet -> {namespace (None for cluster-scoped): [items]}
+        self._report_lock = threading.Lock()
+        self._relisting = set()
+        self.last_updated = None
+
+    # ---------------- watch threads ----------------
+
+    def _watch(self, kind):
+        list_fn = self.snapshot.list_function(kind)
+        # A kind whose initial LIST failed has no index to apply events to and no
+        # resourceVersion to watch from; it is listed again first.
+        listed = kind not in self.snapshot.failed_kinds() and self.snapshot.resource_versions.get(kind) is not None
+        while not self._stop.is_set():
+            if not listed:
+                listed = self._relist(kind)
+                continue
+            w = watch.Watch()
+            try:
+                for event in w.stream(
+                    list_fn,
+                    resource_version=self.snapshot.resource_versions.get(kind),
+                    allow_watch_bookmarks=True,
+                    timeout_seconds=300,
+                ):
+                    if self._stop.is_set():
+                        w.stop()
+                        return
+                    if event["type"] == "ERROR":
+                        raw = event.get("raw_object") or {}
+                        if raw.get("code") == 410:
+                            raise ApiException(status=410, reason=raw.get("message"))
+                        logging.error(f"Watch error on {kind}: {raw}")
+                        break
+                    if event["type"] != "BOOKMARK":
+                        self._events.put((kind, event["type"], event["object"]))
+                    self.snapshot.resource_versions[kind] = w.resource_version
+            except ApiException as e:
+                if e.status == 410:
+                    logging.warning(f"Watch on {kind} expired; relisting")
+                    listed = self._relist(kind)
+                else:
+                    logging.error(f"Watch on {kind} failed: {e}")
+                    self._stop.wait(5)
+            except Exception as e:
+                logging.error(f"Watch on {kind} failed: {e}")
+                self._stop.wait(5)
+
+    def _relist(self, kind):
+        """LIST a kind again and queue the result for the event loop; returns whether it worked."""
+        try:
+            self._events.put((kind, "RELIST", self.snapshot.load_kind(kind)))
+            return True
+        except Exception as e:
+            logging.error(f"Relist of {kind} failed: {e}")
+            self._stop.wait(5)
+            return False
+
+    def _relist_in_background(self, kind):
+        """Relist from a short-lived thread so the event loop keeps going (one at a time per kind)."""
+        if kind in self._relisting:
+            return
+        self._relisting.add(kind)
+
+        def relist():
+            try:
+                while not self._relist(kind) and not self._stop.is_set():
+                    pass
+            finally:
+                self._relisting.discard(kind)
+
+        threading.Thread(target=relist, daemon=True, name=f"relist-{kind}").start()
+
+    # ---------------- event loop ----------------
+
+    def _drain_events(self):
+        """Apply queued events; returns {kind: set of touched namespaces}."""
+        dirty = {}
+        try:
+            item = self._events.get(timeout=self.batch_interval)
+        except queue.Empty:
+            return dirty
+        while True:
+            kind, event_type, payload = item
             try:
-                resource = dynamic_client.resources.get(api
+                if event_type == "RELIST":
+                    dirty.setdefault(kind, set()).update(self.snapshot.replace_kind(kind, payload))
+                elif self.snapshot.apply_event(kind, event_type, payload):
+                    ns = payload.metadata.namespace if self.snapshot.is_namespaced(kind) else None
+                    dirty.setdefault(kind, set()).add(ns)
+            except Exception as e:
+                logging.error(f"Could not apply {event_type} event on {kind}: {e}; relisting")
+                self._relist_in_background(kind)
+            try:
+                item = self._events.get_nowait()
+            except queue.Empty:
+                return dirty
+
+    def _store(self, finder, results, namespaces):
+        with self._report_lock:
+            for sheet, items in results.items():
+                by_ns = self._results.setdefault(sheet, {})
+                if namespaces is None:
+                    by_ns.clear()
+                    if finder.namespaced:
+                        for item in items:
+                            by_ns.setdefault(item.split("/", 1)[0], []).append(item)
+                    else:
+                        by_ns[None] = items
+                else:
+                    for ns in namespaces:
+                        by_ns[ns] = []
+                    for item in items:
+                        by_ns[item.split("/", 1)[0]].append(item)
+            self.last_updated = datetime.utcnow()
+
+    def _recompute_all(self):
+        self.snapshot.clear_lookups()
+        for finder in FINDERS:
+            self._store(finder, run_finder(finder, self.snapshot), None)
+
+    def _recompute(self, dirty):
+        for finder in FINDERS:
+            touched = [kind for kind in finder.kinds if kind in dirty]
+            if not touched:
+                continue
+            if not finder.namespaced or any(not self.snapshot.is_namespaced(kind) for kind in touched):
+                self._store(finder, run_finder(finder, self.snapshot), None)
+                continue
+            # CLUSTER_WIDE_KINDS report changes outside the scanned namespaces too.
+            namespaces = sorted(set().union(*(dirty[kind] for kind in touched)) & set(self.snapshot.namespaces))
+            if not namespaces:
+                continue
+            self._store(finder, run_finder(finder, self.snapshot, namespaces), namespaces)
+
+    # ---------------- output ----------------
+
+    def report(self):
+        with self._report_lock:
+            return {
+                "last_updated": self.last_updated.isoformat() + "Z" if self.last_updated else None,
+                "unused": {
+                    sheet: sorted(item for items in by_ns.values() for item in items)
+                    for sheet, by_ns in self._results.items()
+                },
+            }
+
+    def update_metrics(self):
+        """Findings gauges from the merged daemon report (run_finder only sets them on full runs)."""
+        with self._report_lock:
+            for finder in FINDERS:
+                for sheet in finder.sheets:
+                    count = sum(len(items) for items in self._results.get(sheet, {}).values())
+                    REGISTRY.set(FINDER_FINDINGS, {"finder": finder.func.__name__, "sheet": sheet}, count)
+
+    def flush(self, report_file=None, metrics_file=None):
+        if report_file:
+            tmp_file = f"{report_file}.tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(self.report(), f, indent=2)
+            os.replace(tmp_file, report_file)
+        if metrics_file:
+            self.update_metrics()
+            REGISTRY.write_textfile(metrics_file)
+
+    def _serve(self, port):
+        daemon = self
+
+        class ReportHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/healthz":
+                    body, status, content_type = b"ok", 200, "text/plain"
+                elif self.path in ("/", "/report"):
+                    body, status, content_type = json.dumps(daemon.report()).encode(), 200, "application/json"
+                elif self.path == "/metrics":
+                    daemon.update_metrics()
+                    body, status, content_type = REGISTRY.render().encode(), 200, "text/plain; version=0.0.4"
+                else:
+                    body, status, content_type = b"not found", 404, "text/plain"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+        server = ThreadingHTTPServer(("", port), ReportHandler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="report-http").start()
+        logging.info(f"Serving unused-resource report on :{port}/report and metrics on :{port}/metrics")
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self, port=None, report_file=None, flush_interval=60, metrics_file=None):
+        self.snapshot.prefetch(self.kinds)
+        self._recompute_all()
+        # Owner kinds loaded by orphan checks are watched too so the UID index stays current.
+        self.kinds = sorted(set(self.kinds) | self.snapshot.loaded_kinds())
+        for kind in self.kinds:
+            threading.Thread(target=self._watch, args=(kind,), daemon=True, name=f"watch-{kind}").start()
+        if port:
+            self._serve(port)
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        last_resync = last_flush = time.monotonic()
+        while not self._stop.is_set():
+            dirty = self._drain_events()
+            if dirty:
+                self._recompute(dirty)
+            now = time.monotonic()
+            if now - last_resync >= self.resync_interval:
+                self._recompute_all()
+                last_resync = now
+            if (report_file or metrics_file) and now - last_flush >= flush_interval:
+                self.flush(report_file, metrics_file)
+                last_flush = now
+        if report_file or metrics_file:
+            self.flush(report_file, metrics_file)
+
+if __name__ == "__main__":
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Find unused Kubernetes resources.")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and follow the cluster through WATCH streams")
+    parser.add_argument("--port", type=int, help="Daemon mode: serve the report as JSON on this port (/report)")
+    parser.add_argument("--report-file", help="Daemon mode: periodically write the report as JSON to this file")
+    parser.add_argument("--flush-interval", type=int, default=60, help="Seconds between report-file writes")
+    parser.add_argument("--resync-interval", type=int, default=600, help="Seconds between full in-memory recomputes")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="How LISTs are issued: thread pool (default) or the rate-limited asyncio engine")
+    parser.add_argument("--qps", type=float, default=DEFAULT_QPS, help="Async engine and cleanup: sustained requests per second")
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST, help="Async engine and cleanup: maximum request burst")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="Async engine and cleanup: maximum in-flight requests")
+    parser.add_argument("--full-objects", action="store_true",
+                        help="Fetch full objects even for kinds whose metadata is enough (ConfigMaps, Secrets, ...)")
+    parser.add_argument("--fast", action="store_true",
+                        help="Skip client model deserialization; keep only the fields the checks read")
+    parser.add_argument("--capture", metavar="FILE", help="Also stream everything listed to FILE (.jsonl.gz)")
+    parser.add_argument("--from-snapshot", metavar="FILE", help="Run all checks against a --capture file, offline")
+    parser.add_argument("--state-db", metavar="FILE",
+                        help="SQLite state store: track first/last seen per finding and write newly unused/resolved views")
+    parser.add_argument("--cluster", help="Cluster name in the state store (default: kubeconfig context name)")
+    parser.add_argument("--unused-days", type=int, default=30, help="State store: threshold of the 'Unused > N Days' view")
+    parser.add_argument("--cleanup", metavar="SHEETS",
+                        help="Comma-separated report sheets (e.g. Pods,ConfigMaps) whose flagged objects are "
+                             "verified with a server-side dry-run delete")
+    parser.add_argument("--cleanup-confirm", action="store_true", help="Actually delete what passed the dry run")
+    parser.add_argument("--cleanup-journal", default="cleanup_journal.jsonl",
+                        help="Resumable cleanup journal (JSON lines)")
+    parser.add_argument("--contexts", metavar="CONTEXTS",
+                        help="Fleet mode: comma-separated kubeconfig contexts, each scanned in its own worker "
+                             "process into one merged report")
+    parser.add_argument("--all-contexts", action="store_true", help="Fleet mode: scan every context in the kubeconfig")
+    parser.add_argument("--kubeconfig", help="Fleet mode: kubeconfig file (default: $KUBECONFIG or ~/.kube/config)")
+    parser.add_argument("--fleet-workers", type=int, default=DEFAULT_FLEET_WORKERS,
+                        help="Fleet mode: maximum clusters scanned in parallel")
+    parser.add_argument("--metrics-file", metavar="FILE",
+                        help="Write finder and API-call metrics to FILE in the Prometheus text format "
+                             "(node-exporter textfile collector); the daemon rewrites it every flush interval")
+    args = parser.parse_args()
+    if args.fast and args.capture:
+        parser.error("--capture needs client models; it cannot be combined with --fast")
+    engine_options = {"qps": args.qps, "burst": args.burst, "max_concurrency": args.max_concurrency}
+    run_options = {
+        "state_db": args.state_db,
+        "cluster": args.cluster,
+        "unused_days": args.unused_days,
+        "metrics_file": args.metrics_file,
+    }
+    if args.cleanup:
+        run_options["cleanup"] = {
+            "sheets": [sheet.strip() for sheet in args.cleanup.split(",") if sheet.strip()],
+            "journal": args.cleanup_journal,
+            "confirm": args.cleanup_confirm,
+            **engine_options,
+        }
+
+    if args.contexts or args.all_contexts:
+        if args.daemon or args.from_snapshot or args.capture or args.cleanup or args.metrics_file:
+            parser.error("fleet mode does not support --daemon, --from-snapshot, --capture, --cleanup or --metrics-file")
+        if args.cluster:
+            parser.error("fleet mode names every cluster after its context; drop --cluster")
+        if args.all_contexts:
+            contexts = kubeconfig_contexts(args.kubeconfig)
+        else:
+            contexts = [context.strip() for context in args.contexts.split(",") if context.strip()]
+        scan_fleet(
+            contexts,
+            config_file=args.kubeconfig,
+            max_workers=args.fleet_workers,
+            engine=args.engine,
+            engine_options=engine_options,
+            metadata_only=not args.full_objects,
+            fast=args.fast,
+            state_db=args.state_db,
+            unused_days=args.unused_days,
+        )
+        raise SystemExit(0)
+
+    if args.from_snapshot:
+        if args.state_db and not args.cluster:
+            parser.error("--state-db with --from-snapshot needs --cluster")
+        scan_unused_resources(snapshot=ClusterSnapshot.from_capture(args.from_snapshot, fast=args.fast), **run_options)
+        raise SystemExit(0)
+
+    if args.daemon:
+        UnusedResourceDaemon(get_namespaces(), resync_interval=args.resync_interval).run(
+            port=args.port, report_file=args.report_file, flush_interval=args.flush_interval,
+            metrics_file=args.metrics_file,
+        )
+    else:
+        scan_unused_resources(
+            engine=args.engine,
+            engine_options=engine_options,
+            metadata_only=not args.full_objects,
+            fast=args.fast,
+            capture=args.capture,
+            **run_options,
+        )
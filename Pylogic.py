@@ -1,8 +1,12 @@
 import datetime
+import json
 import pandas as pd
 from tabulate import tabulate
 import subprocess
 import os
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill, Border, Side, Alignment
+from openpyxl.utils.dataframe import dataframe_to_rows
 
 COST_PER_GB = 0.21601728
 
@@ -13,17 +17,40 @@ def run_command(command):
         raise Exception(error)
     return output.decode('utf-8').strip()
 
+def kubectl_json(*args):
+    # One kubectl process per call, no shell; warnings on stderr are not errors.
+    result = subprocess.run(["kubectl", *args, "-o", "json"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(result.stderr.strip())
+    return json.loads(result.stdout)
+
 def get_namespaces():
-    namespaces = run_command("echo $NAMESPACE").split()
+    namespaces = os.environ.get("NAMESPACE", "").split()
     return namespaces
 
-def get_pvc_list(namespace):
+def get_namespace_objects(namespace):
+    # PVCs and pods of a namespace in a single call: [pvc, ...], [pod, ...]
     try:
-        pvc_list = run_command(f"kubectl get pvc -n {namespace} --no-headers | awk '{{print $1}}'").split()
+        items = kubectl_json("get", "pvc,pods", "-n", namespace).get("items", [])
     except Exception as e:
-        print(f"No resources found in {namespace} namespace.")
-        pvc_list = []
-    return pvc_list
+        print(f"Could not list PVCs and pods in {namespace}: {e}")
+        items = []
+    pvcs = [item for item in items if item["kind"] == "PersistentVolumeClaim"]
+    pods = [item for item in items if item["kind"] == "Pod"]
+    return pvcs, pods
+
+def get_pvc_users(pods):
+    # claim name -> pods mounting it, from pod specs (what `kubectl describe pvc` shows as "Used By")
+    users = {}
+    for pod in pods:
+        pod_name = pod["metadata"]["name"]
+        for volume in pod.get("spec", {}).get("volumes") or []:
+            if volume.get("persistentVolumeClaim"):
+                users.setdefault(volume["persistentVolumeClaim"]["claimName"], []).append(pod_name)
+            elif "ephemeral" in volume:
+                # Generic ephemeral volumes get a PVC named <pod>-<volume>
+                users.setdefault(f"{pod_name}-{volume['name']}", []).append(pod_name)
+    return users
 
 def convert_to_gb(capacity_str):
     if "Gi" in capacity_str:
@@ -33,30 +60,32 @@ def convert_to_gb(capacity_str):
     else:
         return 0
 
-def get_pvc_capacity(namespace):
-    try:
-        pvc_capacity = run_command(f"kubectl get pvc -n {namespace} --no-headers | grep -E 'Bound' | awk '{{print $4}}'").split()
-        pvc_capacity_gb = [convert_to_gb(capacity) for capacity in pvc_capacity]
-    except Exception as e:
-        print(f"No resources found in {namespace} namespace.")
-        pvc_capacity_gb = []
-    return pvc_capacity_gb
+def get_pvc_capacity(pvc):
+    # Provisioned size of a bound claim, else its request
+    capacity = (pvc.get("status", {}).get("capacity") or {}).get("storage")
+    capacity = capacity or ((pvc.get("spec", {}).get("resources") or {}).get("requests") or {}).get("storage")
+    return convert_to_gb(capacity or "")
 
-def calculate_pvc_cost(pvc_capacity_gb):
-    return [capacity * COST_PER_GB for capacity in pvc_capacity_gb]
+def calculate_pvc_cost(capacity_gb):
+    return capacity_gb * COST_PER_GB
 
-def get_unattached_pvcs(namespace, pvc_list, pvc_capacity_gb):
+def get_unattached_pvcs(namespace, pvcs, pvc_users, cluster_name):
     unattached_pvcs = []
-    pvc_costs = calculate_pvc_cost(pvc_capacity_gb)
-    for i, pvc in enumerate(pvc_list):
-        pvc_status = run_command(f"kubectl describe pvc {pvc} -n {namespace} | grep -E 'Used By: <none>'") or None
-        if pvc_status:
-            pod_name, controller_type, controller_name = get_pod_and_deployment_name(namespace, pvc)
-            unattached_pvcs.append((get_cluster_name(), namespace, pvc, pvc_capacity_gb[i], pod_name, controller_type, controller_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), pvc_costs[i]))
+    for pvc in pvcs:
+        pvc_name = pvc["metadata"]["name"]
+        if pvc_users.get(pvc_name):
+            continue
+        capacity_gb = get_pvc_capacity(pvc)
+        pod_name, controller_type, controller_name = get_pod_and_deployment_name(namespace, pvc_name, pvc)
+        unattached_pvcs.append((cluster_name, namespace, pvc_name, capacity_gb, pod_name, controller_type, controller_name, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), calculate_pvc_cost(capacity_gb)))
     return unattached_pvcs
 
-def get_pod_and_deployment_name(namespace, pvc_name):
+def get_pod_and_deployment_name(namespace, pvc_name, pvc=None):
     try:
+        # StatefulSets with a PVC retention policy set themselves as owner of their claims
+        for owner in (pvc or {}).get("metadata", {}).get("ownerReferences") or []:
+            if owner["kind"] == "StatefulSet":
+                return pvc_name.split('-', 1)[-1], "StatefulSet", owner["name"]
         parts = pvc_name.split('-', 1)
         if len(parts) > 1:
             prefix, rest = parts
@@ -107,11 +136,12 @@ def main(namespace_file, platform_file, ingestion_file, support_file):
     ingestion_apps = load_team_data(ingestion_file)
     support_apps = load_team_data(support_file)
 
+    # One kubectl call per namespace (PVCs + pods), joined in memory
     all_unattached_pvcs = []
+    cluster_name = get_cluster_name()
     for namespace in namespaces:
-        pvc_list = get_pvc_list(namespace)
-        pvc_capacity_gb = get_pvc_capacity(namespace)
-        unattached_pvcs = get_unattached_pvcs(namespace, pvc_list, pvc_capacity_gb)
+        pvcs, pods = get_namespace_objects(namespace)
+        unattached_pvcs = get_unattached_pvcs(namespace, pvcs, get_pvc_users(pods), cluster_name)
         all_unattached_pvcs.extend(unattached_pvcs)
 
     print(tabulate(all_unattached_pvcs, headers=["Cluster Name", "Namespace", "Unattached PVC Name", "Capacity GB", "Unattached Pod Name", "Controller Type", "Controller Name", "Date", "Cost ($)"]))
@@ -133,7 +163,7 @@ def main(namespace_file, platform_file, ingestion_file, support_file):
 
     unique_recipients = set().union(*email_recipients)
     
-    file_name = f"{get_cluster_name()}-{datetime.datetime.now().strftime('%d-%m-%Y')}.xlsx"
+    file_name = f"{cluster_name}-{datetime.datetime.now().strftime('%d-%m-%Y')}.xlsx"
     apply_excel_formatting(file_name, df)
 
     print(f"Excel file with advanced formatting created at: {os.path.abspath(file_name)}")
@@ -0,0 +1,210 @@
+"""
+k8s_async.py
+
+Asyncio engine for the unused-resource scanners: talks to the Kubernetes REST API
+with aiohttp so every LIST of a scan can run cooperatively on one event loop.
+
+- One global semaphore caps in-flight requests (max_concurrency).
+- A token bucket enforces a client-side QPS/burst limit across all requests.
+- 429 and 5xx responses are retried; Retry-After pauses the whole bucket so the
+  scan backs off together instead of each request hammering API Priority & Fairness.
+- Responses are deserialized into the usual kubernetes-client models, so finders
+  do not care which engine filled the snapshot.
+
+Requirements:
+  pip install aiohttp
+  (authentication comes from the regular kubernetes client Configuration)
+"""
+
+import asyncio
+import json
+import logging
+import ssl
+import time
+
+from kubernetes import client
+from kubernetes.client.rest import ApiException
+
+from k8s_metrics import observe_api
+from k8s_records import loads
+from k8s_utils import (
+    DEFAULT_PAGE_SIZE, METADATA_ACCEPT, continue_from_410, deserialize_model, item_key, to_partial_metadata_list,
+)
+
+try:
+    import aiohttp
+except ImportError:  # optional: only needed for --engine async
+    aiohttp = None
+
+DEFAULT_QPS = 20
+DEFAULT_BURST = 40
+DEFAULT_MAX_CONCURRENCY = 16
+
+
+class TokenBucket:
+    """Client-side rate limit: refills `qps` tokens per second, holds at most `burst`."""
+
+    def __init__(self, qps=DEFAULT_QPS, burst=DEFAULT_BURST):
+        self.qps = qps
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block_for(self, seconds):
+        """Hold every caller for `seconds` (server asked us to back off)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.qps)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.qps)
+
+
+def _retry_after(headers, attempt):
+    try:
+        return max(float(headers.get("Retry-After", "")), 0.0)
+    except ValueError:
+        return min(2 ** attempt, 30)
+
+
+class AsyncKubeClient:
+    """
+    Rate-limited aiohttp client for the Kubernetes API.
+
+    Usage:
+        async with AsyncKubeClient(qps=20, burst=40) as kube:
+            async for obj in kube.iter_list("/api/v1/pods", "V1PodList"):
+                ...
+    """
+
+    def __init__(self, configuration=None, qps=DEFAULT_QPS, burst=DEFAULT_BURST,
+                 max_concurrency=DEFAULT_MAX_CONCURRENCY, page_size=None, max_retries=5):
+        if aiohttp is None:
+            raise RuntimeError("The async engine needs aiohttp: pip install aiohttp")
+        self.configuration = configuration or client.Configuration.get_default_copy()
+        self.api_client = client.ApiClient(self.configuration)
+        self.bucket = TokenBucket(qps, burst)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.page_size = page_size or DEFAULT_PAGE_SIZE
+        self.max_retries = max_retries
+        self.session = None
+
+    def _ssl_context(self):
+        cfg = self.configuration
+        if not cfg.verify_ssl:
+            return False
+        context = ssl.create_default_context(cafile=cfg.ssl_ca_cert)
+        if cfg.cert_file:
+            context.load_cert_chain(cfg.cert_file, cfg.key_file)
+        return context
+
+    def _headers(self):
+        headers = {"Accept": "application/json"}
+        token = self.configuration.get_api_key_with_prefix("authorization")
+        if token:
+            headers["Authorization"] = token
+        return headers
+
+    async def __aenter__(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=self._ssl_context()))
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    async def get(self, path, params=None, headers=None):
+        """GET a path and return the body text; retries 429/5xx honoring Retry-After."""
+        return await self.request("GET", path, params=params, headers=headers)
+
+    async def request(self, method, path, params=None, headers=None, body=None):
+        """
+        Send one request (body is sent as JSON) and return the response text.
+        Retries 429/5xx honoring Retry-After; other errors raise ApiException.
+        """
+        url = self.configuration.host.rstrip("/") + path
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            async with self.semaphore:
+                start = time.monotonic()
+                async with self.session.request(
+                    method, url, params=params, headers={**self._headers(), **(headers or {})}, json=body
+                ) as resp:
+                    raw = await resp.read()
+                    status, reason, resp_headers = resp.status, resp.reason, resp.headers
+                observe_api(method, path, params, status, time.monotonic() - start, len(raw))
+            text = raw.decode("utf-8")
+            if (status == 429 or status >= 500) and attempt < self.max_retries:
+                delay = _retry_after(resp_headers, attempt)
+                if status == 429:
+                    self.bucket.block_for(delay)
+                logging.warning(f"{method} {path} returned {status}; retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if status >= 400:
+                error = ApiException(status=status, reason=reason)
+                error.body = text
+                error.headers = resp_headers
+                raise error
+            return text
+
+    def deserialize(self, body, response_type):
+        return deserialize_model(self.api_client, json.loads(body), response_type)
+
+    async def iter_list(self, path, response_type, params=None, list_meta=None, metadata_only=False, project=None):
+        """
+        Async counterpart of k8s_utils.iter_list(): pages through a LIST path and yields
+        deserialized objects, recovering from expired continue tokens the same way
+        (a relist skips what was yielded by etcd key order, see k8s_utils.item_key).
+        With metadata_only, pages are requested as PartialObjectMetadataList.
+        With project (see k8s_records.compile_list_projection), pages skip model
+        deserialization and are projected to compact records.
+        """
+        headers = {"Accept": METADATA_ACCEPT} if metadata_only else None
+        token = None
+        last_key = None
+        relisting = False
+        while True:
+            page_params = dict(params or {}, limit=str(self.page_size))
+            if token:
+                page_params["continue"] = token
+            try:
+                body = await self.get(path, page_params, headers=headers)
+                if project is not None:
+                    page = project(loads(body))
+                elif metadata_only:
+                    page = to_partial_metadata_list(self.api_client, json.loads(body))
+                else:
+                    page = self.deserialize(body, response_type)
+            except ApiException as e:
+                if e.status != 410 or token is None:
+                    raise
+                token = continue_from_410(e)
+                relisting = token is None
+                if list_meta is not None and relisting:
+                    list_meta.pop("resource_version", None)
+                logging.warning(f"Continue token expired during LIST {path}; {'relisting' if relisting else 'resuming'}")
+                continue
+            if list_meta is not None and "resource_version" not in list_meta:
+                list_meta["resource_version"] = page.metadata.resource_version
+            for item in page.items:
+                key = item_key(item)
+                if relisting:
+                    if last_key is not None and key <= last_key:
+                        continue
+                    relisting = False
+                last_key = key
+                yield item
+            token = page.metadata._continue
+            if not token:
+                return
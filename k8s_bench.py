@@ -0,0 +1,318 @@
+"""
+k8s_bench.py
+
+Scale benchmark for the unused-resource scanners (NadeemHD.py, Nadeem.py, unused.py)
+against a local fake API server (k8s_fakeapi.py); no cluster needed.
+
+  python k8s_bench.py --namespaces 200 --pods 100 --latency-ms 5 --output bench.json
+  python k8s_bench.py ... --baseline bench.json --max-regression 0.2   (regression gate)
+
+- The synthetic cluster is generated from --seed, so runs are comparable.
+- Every case (a whole scan, or one finder on a cold snapshot) runs in a fresh
+  process, so peak RSS is its own and no client or cache state leaks between cases.
+- Per case: wall time (median of --repeat runs), API calls and objects served by
+  the fake server, 429s injected, peak RSS and objects/second.
+- NadeemHD.daemon lists every kind, then follows --watch-cycles WATCH streams per
+  kind of --watch-events seeded events each (--watch-expire-rate of them ending
+  in 410 Gone, i.e. a relist) and stops once they are applied and recomputed.
+- With --baseline, exits 1 when a case got slower than baseline * (1 + max-regression),
+  issues more API calls than before, or fails where it did not.
+
+Requirements:
+  pip install aiohttp
+"""
+
+import argparse
+import contextlib
+import functools
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from k8s_fakeapi import FakeApiServer, generate_cluster, object_count, write_kubeconfig
+
+SCAN_CASES = [
+    "NadeemHD.scan[threads]",
+    "NadeemHD.scan[fast]",
+    "NadeemHD.scan[async]",
+    "NadeemHD.daemon",
+    "Nadeem.scan",
+    "unused.scan",
+]
+
+WARM_APIS = ("core_v1", "apps_v1", "batch_v1", "rbac_v1", "networking_v1", "apiextensions_v1",
+             "storage_v1", "discovery_v1", "custom_objects")
+
+# Parameters that shape the cluster or the injected faults; baselines must match them.
+COMPARABLE_PARAMETERS = ("namespaces", "pods", "secrets", "pvcs", "services", "virtual_services", "roles",
+                         "seed", "latency_ms", "jitter_ms", "throttle_rate", "retry_after",
+                         "watch_cycles", "watch_events", "watch_expire_rate")
+
+
+def case_names():
+    """Every benchmark case: whole scans, then each NadeemHD and Nadeem.py finder alone."""
+    import NadeemHD
+    finders = [f"NadeemHD.{finder.func.__name__}" for finder in NadeemHD.FINDERS]
+    nadeem_finders = [f"Nadeem.{name}" for name in ("find_unused_pvs", "find_unused_configmaps_and_secrets",
+                                                   "find_unused_jobs", "find_unused_rbac")]
+    return SCAN_CASES + finders + nadeem_finders
+
+
+def _run_daemon(kube, namespaces, watch_cycles):
+    """NadeemHD daemon until every kind has been through watch_cycles WATCH streams."""
+    import NadeemHD
+    daemon = NadeemHD.UnusedResourceDaemon(namespaces, batch_interval=0.05, kube=kube)
+    streams = Counter()
+    lock = threading.Lock()
+    list_function = daemon.snapshot.list_function
+
+    def counted_list_function(kind):
+        list_fn = list_function(kind)
+
+        @functools.wraps(list_fn)  # the watch finds its object type in the docstring
+        def watch(*args, **kwargs):
+            with lock:
+                streams[kind] += 1
+                done = streams[kind] > watch_cycles
+            if done:
+                # The stream after the last cycle is never opened; the thread waits for the end.
+                daemon._stop.wait()
+                raise RuntimeError("benchmark watch cycles done")
+            return list_fn(*args, **kwargs)
+        return watch
+
+    def stop_when_applied():
+        while not daemon._stop.wait(0.01):
+            with lock:
+                done = daemon.kinds and all(streams[kind] > watch_cycles for kind in daemon.kinds)
+            # The run loop finishes the batch it is recomputing before it sees the stop.
+            if done and daemon._events.empty():
+                daemon.stop()
+
+    daemon.snapshot.list_function = counted_list_function
+    threading.Thread(target=stop_when_applied, daemon=True).start()
+    daemon.run()
+
+
+def _run(case, kube, namespaces, watch_cycles):
+    """Body of one case, inside the worker process."""
+    module, _, name = case.partition(".")
+    if module == "NadeemHD":
+        import NadeemHD
+        if name == "daemon":
+            _run_daemon(kube, namespaces, watch_cycles)
+            return
+        if name.startswith("scan["):
+            engine = name[len("scan["):-1]
+            NadeemHD.scan_unused_resources(
+                engine="async" if engine == "async" else "threads",
+                fast=engine == "fast",
+                kube=kube,
+                namespaces=namespaces,
+                save_report=False,
+            )
+            return
+        finder = next(f for f in NadeemHD.FINDERS if f.func.__name__ == name)
+        NadeemHD.run_finders(NadeemHD.ClusterSnapshot(namespaces, kube=kube), finders=[finder])
+    elif module == "Nadeem":
+        import Nadeem
+        if name == "scan":
+            Nadeem.scan_unused_resources(kube=kube, namespaces=namespaces)
+        elif name == "find_unused_pvs":
+            Nadeem.find_unused_pvs(kube)
+        else:
+            getattr(Nadeem, name)(kube, namespaces)
+    elif module == "unused":
+        import unused
+        unused.get_unused_resources(namespaces, unused.get_references(namespaces, kube), kube)
+    else:
+        raise ValueError(f"unknown benchmark case {case}")
+
+
+def _worker(case, kubeconfig, workdir, namespaces, watch_cycles, results):
+    os.chdir(workdir)
+    # The scanners log to a file like their CLIs do; importing them configures nothing.
+    logging.basicConfig(filename="k8s_unused_resources.log", level=logging.INFO,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+    # Imports are not part of the measurement; the kubernetes client imports its
+    # API classes lazily (seconds on a cold process), so those are touched up front too.
+    importlib.import_module(case.partition(".")[0])
+    from k8s_utils import KubeContext
+    kube = KubeContext(config_file=kubeconfig)
+    for api in WARM_APIS:
+        getattr(kube, api)
+    start = time.perf_counter()
+    try:
+        # What the scanners print would interleave with the results table.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            _run(case, kube, namespaces, watch_cycles)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux.
+    results.put({"seconds": elapsed, "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                 "error": error})
+
+
+def run_case(case, server, kubeconfig, workdir, namespaces, repeat=1, watch_cycles=1):
+    """Run one case `repeat` times in fresh processes; returns its result row."""
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        server.reset_stats()
+        results = context.Queue()
+        process = context.Process(target=_worker, args=(case, kubeconfig, workdir, namespaces, watch_cycles, results))
+        process.start()
+        run = results.get()
+        process.join()
+        stats = dict(server.stats)
+        run["api_calls"] = sum(count for key, count in stats.items() if isinstance(key, tuple))
+        run["objects"] = stats.get("items", 0)
+        run["throttled"] = stats.get("throttled", 0)
+        runs.append(run)
+    seconds = statistics.median(run["seconds"] for run in runs)
+    last = runs[-1]
+    return {
+        "case": case,
+        "seconds": round(seconds, 4),
+        "api_calls": last["api_calls"],
+        "objects": last["objects"],
+        "objects_per_second": round(last["objects"] / seconds, 1) if seconds else 0,
+        "throttled": last["throttled"],
+        "peak_rss_mib": round(max(run["peak_rss_mib"] for run in runs), 1),
+        "error": last["error"],
+    }
+
+
+def compare(rows, baseline, max_regression):
+    """Regressions of rows against a previous --output file: list of messages."""
+    previous = {row["case"]: row for row in baseline["results"]}
+    regressions = []
+    for row in rows:
+        before = previous.get(row["case"])
+        if row["error"]:
+            if before is None or not before["error"]:
+                regressions.append(f"{row['case']}: {row['error']}")
+            continue
+        if before is None or before["error"]:
+            continue
+        if row["seconds"] > before["seconds"] * (1 + max_regression):
+            regressions.append(f"{row['case']}: {before['seconds']:.3f}s -> {row['seconds']:.3f}s")
+        if row["api_calls"] > before["api_calls"]:
+            regressions.append(f"{row['case']}: {before['api_calls']} -> {row['api_calls']} API calls")
+    return regressions
+
+
+def format_table(rows):
+    lines = [f"{'Case':<52}{'Wall s':>9}{'API calls':>11}{'Objects':>10}{'Obj/s':>11}{'429s':>6}{'RSS MiB':>9}"]
+    for row in rows:
+        lines.append(
+            f"{row['case']:<52}{row['seconds']:>9.3f}{row['api_calls']:>11}{row['objects']:>10}"
+            f"{row['objects_per_second']:>11.0f}{row['throttled']:>6}{row['peak_rss_mib']:>9.1f}"
+            + (f"  ERROR {row['error']}" if row["error"] else "")
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the unused-resource scanners against a fake API server.")
+    parser.add_argument("--namespaces", type=int, default=20, help="Number of namespaces")
+    parser.add_argument("--pods", type=int, default=50, help="Mean pods per namespace")
+    parser.add_argument("--secrets", type=int, default=20, help="Mean secrets (and configmaps) per namespace")
+    parser.add_argument("--pvcs", type=int, default=5, help="Mean PVCs per namespace")
+    parser.add_argument("--services", type=int, default=10, help="Mean services per namespace")
+    parser.add_argument("--virtual-services", type=int, default=0,
+                        help="Mean Istio VirtualServices per namespace (0: no Istio objects)")
+    parser.add_argument("--roles", type=int, default=0, help="Mean RBAC Roles per namespace (0: no RBAC objects)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic cluster and injected faults")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random latency on top of --latency-ms")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with injected 429s")
+    parser.add_argument("--watch-cycles", type=int, default=3, help="NadeemHD.daemon: WATCH streams followed per kind")
+    parser.add_argument("--watch-events", type=int, default=20, help="Seeded events sent on every WATCH stream")
+    parser.add_argument("--watch-expire-rate", type=float, default=0.1,
+                        help="Share of WATCH streams that end in 410 Gone (a relist)")
+    parser.add_argument("--cases", help="Comma-separated cases (default: all; see --list)")
+    parser.add_argument("--list", action="store_true", help="List the available cases and exit")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the median wall time is reported")
+    parser.add_argument("--output", metavar="FILE", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="Previous --output to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed wall-time growth over the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    available = case_names()
+    if args.list:
+        print("\n".join(available))
+        return 0
+    cases = [case.strip() for case in args.cases.split(",")] if args.cases else available
+    unknown = sorted(set(cases) - set(available))
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    objects = generate_cluster(args.namespaces, args.pods, args.secrets, pvcs=args.pvcs, services=args.services,
+                               virtual_services=args.virtual_services, roles=args.roles, seed=args.seed)
+    namespaces = [ns["metadata"]["name"] for ns in objects[("v1", "namespaces")]]
+    logging.info(f"Benchmark cluster: {len(namespaces)} namespaces, {object_count(objects)} objects (seed {args.seed})")
+    print(f"Synthetic cluster: {len(namespaces)} namespaces, {object_count(objects)} objects (seed {args.seed})")
+
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="k8s-bench-") as workdir, FakeApiServer(
+        objects,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        watch_events=args.watch_events,
+        watch_expire_rate=args.watch_expire_rate,
+        # Streams end right after their events, so a watch cycle is not a timeout wait.
+        watch_timeout=0,
+        seed=args.seed,
+    ) as server:
+        kubeconfig = write_kubeconfig(os.path.join(workdir, "kubeconfig"), server.url)
+        print(format_table([]))
+        for case in cases:
+            row = run_case(case, server, kubeconfig, workdir, namespaces, args.repeat, args.watch_cycles)
+            rows.append(row)
+            print(format_table([row]).splitlines()[-1], flush=True)
+
+    result = {
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "list")},
+        "objects": object_count(objects),
+        "results": rows,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatched = [
+            key for key in COMPARABLE_PARAMETERS
+            if baseline["parameters"].get(key) != result["parameters"][key]
+        ]
+        if mismatched:
+            print(f"Baseline {args.baseline} was run with different {', '.join(mismatched)}; not comparing")
+            return 2
+        regressions = compare(rows, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
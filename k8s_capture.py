@@ -0,0 +1,69 @@
+"""
+k8s_capture.py
+
+Snapshot capture files for offline runs of the unused-resource scanners
+(python NadeemHD.py --capture scan.jsonl.gz, then --from-snapshot scan.jsonl.gz).
+
+Format: gzip-compressed JSON lines, written while the scan lists the cluster.
+  {"type": "header", "captured_at": ..., "namespaces": [...], "kinds": {kind: namespaced},
+   "metadata_only": [kind, ...]}                               kinds captured as metadata only
+  {"type": "object", "kind": "pods", "object": {...}}         one per listed object (API JSON)
+  {"type": "list", "kind": "pods", "resource_version": "..."}  after a kind was listed completely
+  {"type": "lookup", "key": [...], "value": ...}               live lookups the index cannot answer
+"""
+
+import gzip
+import json
+import threading
+from datetime import datetime
+
+from kubernetes.client import ApiClient
+
+from k8s_utils import PartialObjectMetadata
+
+
+class CaptureWriter:
+    """Thread-safe writer; every LIST and lookup of a scan is streamed straight to disk."""
+
+    def __init__(self, path, namespaces, kinds, metadata_only=()):
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._sanitize = ApiClient().sanitize_for_serialization
+        self._write({
+            "type": "header",
+            "captured_at": datetime.utcnow().isoformat() + "Z",
+            "namespaces": list(namespaces),
+            "kinds": kinds,
+            "metadata_only": sorted(metadata_only),
+        })
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def object(self, kind, obj):
+        if isinstance(obj, PartialObjectMetadata):
+            data = {"metadata": self._sanitize(obj.metadata)}
+        else:
+            data = self._sanitize(obj)
+        self._write({"type": "object", "kind": kind, "object": data})
+
+    def list_done(self, kind, resource_version):
+        self._write({"type": "list", "kind": kind, "resource_version": resource_version})
+
+    def lookup(self, key, value):
+        self._write({"type": "lookup", "key": list(key), "value": value})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_capture(path):
+    """Yield the records of a capture file in the order they were written."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
@@ -0,0 +1,142 @@
+"""
+k8s_cleanup.py
+
+Bulk cleanup of the resources a scan flagged as unused (python NadeemHD.py --cleanup ...).
+
+- Targets come straight from the scan result; nothing else is ever deleted.
+- Every target is first deleted with dryRun=All, so RBAC, admission and
+  preconditions are verified server-side without changing anything. Only targets
+  whose dry run succeeded are deleted for real, and only when confirmed.
+- Deletes use propagationPolicy=Background and preconditions on uid and
+  resourceVersion: an object recreated or modified since the scan (for example
+  relabelled kor/used=true) fails with 409 Conflict instead of being deleted.
+- Requests run in parallel through k8s_async.AsyncKubeClient (QPS/burst limit,
+  concurrency cap, 429 Retry-After handling).
+- Every outcome is appended to a JSON-lines journal. Rerunning with the same
+  journal skips targets already deleted (or already gone), so an interrupted
+  cleanup resumes where it stopped.
+
+Requirements:
+  pip install aiohttp
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import Counter, namedtuple
+from datetime import datetime
+
+from kubernetes.client.rest import ApiException
+
+from k8s_async import AsyncKubeClient
+
+CleanupTarget = namedtuple("CleanupTarget", ["kind", "namespace", "name", "uid", "resource_version", "path"])
+
+# Journal statuses after which a target is never touched again.
+FINAL_STATUSES = {"deleted", "gone"}
+
+
+def target_key(target):
+    return f"{target.kind}/{target.namespace or ''}/{target.name}/{target.uid}"
+
+
+class CleanupJournal:
+    """Append-only JSON-lines record of every cleanup outcome; remembers finished targets."""
+
+    def __init__(self, path):
+        self.path = path
+        self.finished = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry["status"] in FINAL_STATUSES:
+                            self.finished.add(entry["key"])
+        self._file = open(path, "a")
+
+    def record(self, target, phase, status, code=None, message=None):
+        entry = {
+            "at": datetime.utcnow().isoformat() + "Z",
+            "key": target_key(target),
+            "phase": phase,
+            "status": status,
+            "code": code,
+            "message": message,
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if status in FINAL_STATUSES:
+            self.finished.add(entry["key"])
+
+    def close(self):
+        self._file.close()
+
+
+def _api_message(error):
+    try:
+        return json.loads(error.body).get("message") or error.reason
+    except (TypeError, ValueError, AttributeError):
+        return error.reason
+
+
+async def _delete(kube, target, dry_run):
+    """DELETE one target; returns (status, HTTP code, message)."""
+    body = {
+        "apiVersion": "v1",
+        "kind": "DeleteOptions",
+        "propagationPolicy": "Background",
+        "preconditions": {"uid": target.uid, "resourceVersion": target.resource_version},
+    }
+    params = {"dryRun": "All"} if dry_run else None
+    try:
+        await kube.request("DELETE", target.path, params=params, body=body)
+    except ApiException as e:
+        if e.status == 404:
+            return "gone", e.status, _api_message(e)
+        if e.status == 409:
+            return "conflict", e.status, _api_message(e)
+        return "error", e.status, _api_message(e)
+    except Exception as e:
+        return "error", None, str(e)
+    return ("verified" if dry_run else "deleted"), 200, None
+
+
+def run_cleanup(targets, journal_path, confirm=False, configuration=None, **engine_options):
+    """
+    Dry-run every target, then (with confirm) delete the ones that passed.
+    engine_options go to AsyncKubeClient (qps, burst, max_concurrency).
+    Returns Counter({(phase, status): count}).
+    """
+    journal = CleanupJournal(journal_path)
+    summary = Counter()
+    pending = [t for t in targets if target_key(t) not in journal.finished]
+    summary[("resume", "skipped")] = len(targets) - len(pending)
+
+    async def phase(kube, name, batch, dry_run):
+        results = await asyncio.gather(*(_delete(kube, t, dry_run) for t in batch))
+        passed = []
+        for target, (status, code, message) in zip(batch, results):
+            journal.record(target, name, status, code, message)
+            summary[(name, status)] += 1
+            if status not in ("verified", "deleted"):
+                logging.warning(f"Cleanup {name} {target_key(target)}: {status} ({code}) {message or ''}")
+            elif dry_run:
+                passed.append(target)
+        return passed
+
+    async def clean():
+        async with AsyncKubeClient(configuration, **engine_options) as kube:
+            verified = await phase(kube, "dry-run", pending, dry_run=True)
+            if confirm:
+                await phase(kube, "delete", verified, dry_run=False)
+
+    try:
+        if pending:
+            asyncio.run(clean())
+    finally:
+        journal.close()
+    for (name, status), count in sorted(summary.items()):
+        logging.info(f"Cleanup {name}: {count} {status}")
+    return summary
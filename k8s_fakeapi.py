@@ -0,0 +1,632 @@
+"""
+k8s_fakeapi.py
+
+Local stand-in for the Kubernetes API server, for benchmarking and trying the
+unused-resource scanners (NadeemHD.py, Nadeem.py, unused.py) without a cluster.
+
+- generate_cluster() builds a synthetic cluster from seeded distributions: N
+  namespaces of skewed size holding pods, secrets, configmaps, PVCs, services and
+  the workloads, endpoint slices and PVs around them, with a share of them unused.
+- FakeApiServer serves it over HTTP: discovery, cluster-wide and namespaced LIST
+  with limit/continue pagination (and PartialObjectMetadataList on request), GET
+  and DELETE (dryRun, uid/resourceVersion preconditions) of single objects, and
+  WATCH streams of seeded ADDED/MODIFIED/DELETED/BOOKMARK events, some of them
+  ending in 410 Gone, that stay open until their timeout.
+- Every request can be delayed (latency + jitter) and a share of them answered
+  with 429 Too Many Requests and a Retry-After header.
+- write_kubeconfig() points the kubernetes client (and every scanner) at it.
+
+Requirements:
+  pip install aiohttp
+"""
+
+import asyncio
+import copy
+import json
+import math
+import random
+import threading
+from collections import Counter
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:  # optional: only needed to serve the fake cluster
+    aiohttp = web = None
+
+# group/version, plural, kind, namespaced
+RESOURCES = [
+    ("v1", "namespaces", "Namespace", False),
+    ("v1", "nodes", "Node", False),
+    ("v1", "pods", "Pod", True),
+    ("v1", "services", "Service", True),
+    ("v1", "endpoints", "Endpoints", True),
+    ("v1", "configmaps", "ConfigMap", True),
+    ("v1", "secrets", "Secret", True),
+    ("v1", "serviceaccounts", "ServiceAccount", True),
+    ("v1", "persistentvolumeclaims", "PersistentVolumeClaim", True),
+    ("v1", "persistentvolumes", "PersistentVolume", False),
+    ("apps/v1", "deployments", "Deployment", True),
+    ("apps/v1", "statefulsets", "StatefulSet", True),
+    ("apps/v1", "daemonsets", "DaemonSet", True),
+    ("apps/v1", "replicasets", "ReplicaSet", True),
+    ("batch/v1", "jobs", "Job", True),
+    ("batch/v1", "cronjobs", "CronJob", True),
+    ("networking.k8s.io/v1", "ingresses", "Ingress", True),
+    ("networking.k8s.io/v1", "ingressclasses", "IngressClass", False),
+    ("discovery.k8s.io/v1", "endpointslices", "EndpointSlice", True),
+    ("storage.k8s.io/v1", "storageclasses", "StorageClass", False),
+    ("apiextensions.k8s.io/v1", "customresourcedefinitions", "CustomResourceDefinition", False),
+    ("rbac.authorization.k8s.io/v1", "roles", "Role", True),
+    ("rbac.authorization.k8s.io/v1", "rolebindings", "RoleBinding", True),
+    ("rbac.authorization.k8s.io/v1", "clusterroles", "ClusterRole", False),
+    ("rbac.authorization.k8s.io/v1", "clusterrolebindings", "ClusterRoleBinding", False),
+    ("networking.istio.io/v1beta1", "gateways", "Gateway", True),
+    ("networking.istio.io/v1beta1", "virtualservices", "VirtualService", True),
+    ("networking.istio.io/v1beta1", "destinationrules", "DestinationRule", True),
+    ("networking.istio.io/v1beta1", "serviceentries", "ServiceEntry", True),
+    # Custom resources of the generated CRDs (see _crd).
+    ("example.com/v1", "widgets", "Widget", True),
+    ("example.com/v1", "gadgets", "Gadget", True),
+]
+
+RESOURCE_KINDS = {(gv, plural): kind for gv, plural, kind, _ in RESOURCES}
+NAMESPACED = {(gv, plural): namespaced for gv, plural, _, namespaced in RESOURCES}
+
+CREATED = "2020-01-01T00:00:00Z"
+LAST_SCHEDULED = "2020-01-02T03:00:00Z"
+STORAGE_CLASSES = ("standard", "fast", "legacy")
+
+
+def _skewed_counts(rng, mean, n):
+    """n per-namespace sizes with the given mean, log-normally skewed (a few big namespaces)."""
+    if mean <= 0:
+        return [0] * n
+    sigma = 0.75
+    mu = math.log(mean) - sigma ** 2 / 2
+    return [max(0, round(rng.lognormvariate(mu, sigma))) for _ in range(n)]
+
+
+class _Builder:
+    """Accumulates generated objects as {(group/version, plural): [object, ...]}."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.objects = {(gv, plural): [] for gv, plural, _, _ in RESOURCES}
+        self._uids = 0
+
+    def uid(self):
+        self._uids += 1
+        return f"00000000-0000-4000-8000-{self._uids:012d}"
+
+    def add(self, gv, plural, name, namespace=None, labels=None, owner=None, **fields):
+        metadata = {"name": name, "uid": self.uid(), "resourceVersion": "1", "creationTimestamp": CREATED}
+        if namespace:
+            metadata["namespace"] = namespace
+        if labels:
+            metadata["labels"] = labels
+        if owner:
+            metadata["ownerReferences"] = [owner]
+        obj = {"apiVersion": gv, "kind": RESOURCE_KINDS[(gv, plural)], "metadata": metadata, **fields}
+        self.objects[(gv, plural)].append(obj)
+        return obj
+
+
+def _owner_ref(obj, controller=True):
+    return {
+        "apiVersion": obj["apiVersion"],
+        "kind": obj["kind"],
+        "name": obj["metadata"]["name"],
+        "uid": obj["metadata"]["uid"],
+        "controller": controller,
+    }
+
+
+def _pod_spec(rng, secrets, configmaps, pvcs, service_accounts, p_ref=0.6, p_pvc=0.3):
+    """A pod spec that references a random subset of the namespace's objects."""
+    container = {"name": "app", "image": "registry.local/app:1.0"}
+    spec = {"containers": [container], "volumes": []}
+    if secrets and rng.random() < p_ref:
+        spec["volumes"].append({"name": "secret", "secret": {"secretName": rng.choice(secrets)}})
+    if configmaps and rng.random() < p_ref:
+        container["envFrom"] = [{"configMapRef": {"name": rng.choice(configmaps)}}]
+    if pvcs and rng.random() < p_pvc:
+        spec["volumes"].append({"name": "data", "persistentVolumeClaim": {"claimName": rng.choice(pvcs)}})
+    if service_accounts:
+        spec["serviceAccountName"] = rng.choice(service_accounts)
+    return spec
+
+
+def _add_istio(b, rng, ns, service_names, mean_virtual_services):
+    istio = "networking.istio.io/v1beta1"
+    gateways = []
+    if rng.random() < 0.5:
+        b.add(istio, "gateways", "ingress", ns, spec={
+            "selector": {"istio": "ingressgateway"},
+            "servers": [{"port": {"number": 80, "name": "http", "protocol": "HTTP"}, "hosts": ["*"]}],
+        })
+        gateways.append(f"{ns}/ingress")
+    if rng.random() < 0.1:
+        b.add(istio, "gateways", "legacy", ns, spec={"selector": {"istio": "ingressgateway"}, "servers": []})
+    entry_hosts = []
+    if rng.random() < 0.3:
+        entry_hosts.append(f"api.partner-{ns}.com")
+        b.add(istio, "serviceentries", "partner-api", ns, spec={
+            "hosts": entry_hosts, "location": "MESH_EXTERNAL", "ports": [{"number": 443, "name": "https", "protocol": "TLS"}],
+        })
+    n_virtual_services = _skewed_counts(rng, mean_virtual_services, 1)[0]
+    for j in range(n_virtual_services):
+        if entry_hosts and rng.random() < 0.5:
+            destination = entry_hosts[0]
+        elif service_names and rng.random() < 0.8:
+            destination = rng.choice(service_names)
+        else:
+            destination = f"gone-{j}"
+        bound = rng.choice(gateways) if gateways and rng.random() < 0.6 else None
+        if rng.random() < 0.05:
+            bound = "istio-system/missing"
+        spec = {
+            "hosts": [f"vs-{j:03d}.{ns}.example.com"],
+            "http": [{"route": [{"destination": {"host": destination}}]}],
+        }
+        if bound:
+            spec["gateways"] = [bound]
+        b.add(istio, "virtualservices", f"vs-{j:03d}", ns, spec=spec)
+    for name in service_names:
+        if rng.random() < 0.5:
+            b.add(istio, "destinationrules", name, ns, spec={"host": name, "trafficPolicy": {"tls": {"mode": "ISTIO_MUTUAL"}}})
+    if rng.random() < 0.1:
+        b.add(istio, "destinationrules", "ghost", ns, spec={"host": "ghost"})
+
+
+def _add_rbac(b, rng, namespace_names, mean_roles):
+    rbac = "rbac.authorization.k8s.io/v1"
+    rule = {"apiGroups": [""], "resources": ["configmaps"], "verbs": ["get", "list"]}
+    b.add(rbac, "clusterroles", "system:basic-user", labels={"kubernetes.io/bootstrapping": "rbac-defaults"}, rules=[rule])
+    b.add(rbac, "clusterroles", "monitoring", aggregationRule={
+        "clusterRoleSelectors": [{"matchLabels": {"rbac.example.com/aggregate-to-monitoring": "true"}}],
+    }, rules=[])
+    b.add(rbac, "clusterroles", "monitoring-pods", labels={"rbac.example.com/aggregate-to-monitoring": "true"}, rules=[rule])
+    cluster_roles = [f"tenant-{j}" for j in range(4)]
+    for name in cluster_roles:
+        b.add(rbac, "clusterroles", name, rules=[rule])
+    b.add(rbac, "clusterrolebindings", "monitoring", roleRef={
+        "apiGroup": "rbac.authorization.k8s.io", "kind": "ClusterRole", "name": "monitoring",
+    }, subjects=[{"kind": "Group", "name": "monitoring", "apiGroup": "rbac.authorization.k8s.io"}])
+    for ns, _, sa_names in namespace_names:
+        role_names = [f"role-{j:03d}" for j in range(_skewed_counts(rng, mean_roles, 1)[0])]
+        for name in role_names:
+            b.add(rbac, "roles", name, ns, rules=[rule])
+        for j, name in enumerate(role_names):
+            if rng.random() < 0.3:
+                continue
+            role_ref = {"apiGroup": "rbac.authorization.k8s.io", "kind": "Role", "name": name}
+            if rng.random() < 0.1:
+                role_ref = dict(role_ref, kind="ClusterRole", name=rng.choice(cluster_roles))
+            elif rng.random() < 0.05:
+                role_ref = dict(role_ref, name=f"deleted-{j}")
+            subject = rng.choice(sa_names) if rng.random() < 0.9 else f"deleted-sa-{j}"
+            b.add(rbac, "rolebindings", f"{name}-binding", ns, roleRef=role_ref,
+                  subjects=[{"kind": "ServiceAccount", "name": subject, "namespace": ns}])
+
+
+def _crd(b, plural, kind, group="example.com"):
+    """Namespaced CRD served at <group>/v1 (its objects must be listed in RESOURCES)."""
+    b.add("apiextensions.k8s.io/v1", "customresourcedefinitions", f"{plural}.{group}", spec={
+        "group": group,
+        "names": {"plural": plural, "kind": kind},
+        "scope": "Namespaced",
+        "versions": [{"name": "v1", "served": True, "storage": True}],
+    })
+
+
+def generate_cluster(namespaces=10, pods=50, secrets=20, configmaps=None, pvcs=5, services=10,
+                     virtual_services=0, roles=0, seed=0):
+    """
+    Synthetic cluster: `namespaces` namespaces whose pod/secret/configmap/PVC/service
+    counts are drawn (seeded) around the given per-namespace means.
+    - Pods belong to Deployments (through ReplicaSets); ~5% are orphans of a deleted
+      ReplicaSet and ~10% have finished (Succeeded/Failed).
+    - Each pod template references a random secret, configmap and (sometimes) PVC,
+      so the rest are unused; ~30% of services select nothing.
+    - Bound PVCs get a PV; a few Available PVs and an unused StorageClass exist too.
+    - Two CRDs are served: widgets.example.com with one Widget, and gadgets.example.com
+      with none (unused).
+    - virtual_services > 0 adds Istio objects (networking.istio.io/v1beta1): Gateways,
+      VirtualServices, DestinationRules and ServiceEntries, some of them dangling. They
+      come from their own random stream, so the rest of the cluster stays the same.
+    - roles > 0 adds RBAC objects the same way: Roles, RoleBindings (some to missing
+      roles or deleted ServiceAccounts), ClusterRoles (one aggregated) and bindings.
+    Returns {(group/version, plural): [object, ...]}.
+    """
+    configmaps = secrets if configmaps is None else configmaps
+    b = _Builder(seed)
+    rng = b.rng
+    namespace_names = []
+    for sc in STORAGE_CLASSES:
+        b.add("storage.k8s.io/v1", "storageclasses", sc, provisioner="kubernetes.io/fake")
+    b.add("networking.k8s.io/v1", "ingressclasses", "nginx", spec={"controller": "k8s.io/ingress-nginx"})
+    b.add("v1", "nodes", "node-0", status={"conditions": [{"type": "Ready", "status": "True"}]})
+    _crd(b, "widgets", "Widget")
+
+    sizes = zip(*(_skewed_counts(rng, mean, namespaces) for mean in (pods, secrets, configmaps, pvcs, services)))
+    for i, (n_pods, n_secrets, n_configmaps, n_pvcs, n_services) in enumerate(sizes):
+        ns = f"ns-{i:04d}"
+        b.add("v1", "namespaces", ns, status={"phase": "Active"})
+        sa_names = ["default"] + [f"sa-{j}" for j in range(rng.randint(0, 2))]
+        for name in sa_names:
+            b.add("v1", "serviceaccounts", name, ns)
+        secret_names = [f"secret-{j:04d}" for j in range(n_secrets)]
+        for name in secret_names:
+            b.add("v1", "secrets", name, ns, type="Opaque", data={"key": "dmFsdWU="})
+        configmap_names = [f"config-{j:04d}" for j in range(n_configmaps)]
+        for name in configmap_names:
+            b.add("v1", "configmaps", name, ns, data={"key": "value"})
+        pvc_names = [f"data-{j:04d}" for j in range(n_pvcs)]
+        for name in pvc_names:
+            sc = rng.choice(STORAGE_CLASSES[:2])
+            bound = rng.random() < 0.8
+            pvc_spec = {
+                "accessModes": ["ReadWriteOnce"],
+                "storageClassName": sc,
+                "resources": {"requests": {"storage": f"{rng.choice((1, 5, 10, 50))}Gi"}},
+            }
+            if bound:
+                pv_name = f"pv-{ns}-{name}"
+                pvc_spec["volumeName"] = pv_name
+                b.add("v1", "persistentvolumes", pv_name, spec={
+                    "capacity": {"storage": pvc_spec["resources"]["requests"]["storage"]},
+                    "storageClassName": sc,
+                    "claimRef": {"namespace": ns, "name": name},
+                }, status={"phase": "Bound"})
+            b.add("v1", "persistentvolumeclaims", name, ns, spec=pvc_spec,
+                  status={"phase": "Bound" if bound else "Pending"})
+
+        deployments = []
+        for j in range(max(1, n_pods // 5) if n_pods else 0):
+            app = f"app-{j:03d}"
+            template = {
+                "metadata": {"labels": {"app": app}},
+                "spec": _pod_spec(rng, secret_names, configmap_names, pvc_names, sa_names),
+            }
+            deployment = b.add("apps/v1", "deployments", app, ns, labels={"app": app}, spec={
+                "replicas": 1, "selector": {"matchLabels": {"app": app}}, "template": template,
+            }, status={"replicas": 1, "availableReplicas": 1})
+            replicaset = b.add("apps/v1", "replicasets", f"{app}-5d9f7", ns, labels={"app": app},
+                               owner=_owner_ref(deployment), spec={
+                                   "replicas": 1, "selector": {"matchLabels": {"app": app}}, "template": template,
+                               }, status={"replicas": 1})
+            deployments.append((app, template, replicaset))
+        for j in range(n_pods):
+            app, template, replicaset = deployments[j % len(deployments)]
+            owner = _owner_ref(replicaset)
+            if rng.random() < 0.05:
+                owner = dict(owner, name=f"{app}-gone", uid=b.uid())
+            phase = rng.choices(("Running", "Succeeded", "Failed"), (90, 5, 5))[0]
+            b.add("v1", "pods", f"{app}-5d9f7-{j:05d}", ns, labels={"app": app}, owner=owner,
+                  spec=dict(template["spec"], nodeName="node-0"),
+                  status={"phase": phase, "podIP": f"10.{i % 256}.{j // 256 % 256}.{j % 256}"})
+
+        for j in range(n_services):
+            selects = deployments and rng.random() < 0.7
+            app = rng.choice(deployments)[0] if selects else f"gone-{j}"
+            service = b.add("v1", "services", f"svc-{j:03d}", ns, spec={
+                "selector": {"app": app}, "ports": [{"port": 80, "targetPort": 8080}],
+            })
+            endpoints = [{"addresses": ["10.0.0.1"], "conditions": {"ready": True}}] if selects else []
+            b.add("discovery.k8s.io/v1", "endpointslices", f"svc-{j:03d}-abcde", ns,
+                  labels={"kubernetes.io/service-name": service["metadata"]["name"]},
+                  addressType="IPv4", endpoints=endpoints, ports=[{"port": 8080}])
+        if n_services and rng.random() < 0.5:
+            b.add("networking.k8s.io/v1", "ingresses", "web", ns, spec={
+                "ingressClassName": "nginx",
+                "rules": [{"http": {"paths": [{"path": "/", "pathType": "Prefix", "backend": {
+                    "service": {"name": f"svc-{rng.randrange(n_services):03d}", "port": {"number": 80}},
+                }}]}}],
+            })
+        if rng.random() < 0.5:
+            b.add("batch/v1", "jobs", "migrate", ns, spec={
+                "template": {"spec": {"containers": [{"name": "job", "image": "busybox"}], "restartPolicy": "Never"}},
+            }, status={"succeeded": 1})
+        if rng.random() < 0.3:
+            # Every other namespace's cronjob has never been scheduled.
+            b.add("batch/v1", "cronjobs", "nightly", ns, spec={
+                "schedule": "0 3 * * *", "suspend": rng.random() < 0.5,
+                "jobTemplate": {"spec": {"template": {"spec": {
+                    "containers": [{"name": "job", "image": "busybox"}], "restartPolicy": "Never",
+                }}}},
+            }, status={"lastScheduleTime": LAST_SCHEDULED} if i % 2 else {})
+
+        namespace_names.append((ns, [f"svc-{j:03d}" for j in range(n_services)], sa_names))
+
+    for j in range(max(1, pvcs * namespaces // 10)):
+        b.add("v1", "persistentvolumes", f"pv-available-{j:04d}", spec={
+            "capacity": {"storage": "10Gi"}, "storageClassName": "legacy",
+        }, status={"phase": "Available"})
+    if virtual_services > 0:
+        istio_rng = random.Random(f"{seed}-istio")
+        for ns, service_names, _ in namespace_names:
+            _add_istio(b, istio_rng, ns, service_names, virtual_services)
+    if roles > 0:
+        _add_rbac(b, random.Random(f"{seed}-rbac"), namespace_names, roles)
+    # Added last so the UIDs of everything above stay the same.
+    _crd(b, "gadgets", "Gadget")
+    if namespace_names:
+        b.add("example.com/v1", "widgets", "widget-0", namespace_names[0][0], spec={"size": 1})
+    return b.objects
+
+
+def object_count(objects):
+    return sum(len(items) for items in objects.values())
+
+
+def _discovery():
+    groups = {}
+    for gv, plural, kind, namespaced in RESOURCES:
+        groups.setdefault(gv, []).append({
+            "name": plural,
+            "singularName": kind.lower(),
+            "namespaced": namespaced,
+            "kind": kind,
+            "verbs": ["get", "list", "watch", "delete"],
+        })
+    return groups
+
+
+class FakeApiServer:
+    """
+    aiohttp app serving `objects` (see generate_cluster) like an API server.
+    - latency/jitter: seconds added to every request (uniform jitter on top).
+    - throttle_rate: share of requests answered 429 with Retry-After: retry_after.
+    - watch_events: events sent at the start of every WATCH stream, drawn (seeded per
+      stream) from the watched objects: MODIFIED and DELETED copies of them, ADDED
+      new ones and BOOKMARKs. The store itself is not changed, so a relist still
+      returns `objects`.
+    - watch_expire_rate: share of WATCH streams that end with a 410 Gone ERROR event.
+    - watch_timeout caps how long a WATCH stream stays open after its events.
+    - DELETE removes the object from the store (not with dryRun=All).
+    stats counts requests by (method, group/version, plural, verb), items served,
+    watch events sent and WATCH streams expired.
+    start() runs it on a background thread; use as a context manager.
+    """
+
+    def __init__(self, objects, latency=0.0, jitter=0.0, throttle_rate=0.0, retry_after=1,
+                 watch_events=0, watch_expire_rate=0.0, watch_timeout=5.0, seed=0, host="127.0.0.1", port=0):
+        self.objects = objects
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.watch_events = watch_events
+        self.watch_expire_rate = watch_expire_rate
+        self.watch_timeout = watch_timeout
+        self.seed = seed
+        self.host = host
+        self.port = port
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._resource_version = 100
+        self._watches = Counter()
+        self._discovery = _discovery()
+        self._index = {}
+        for (gv, plural), items in objects.items():
+            for obj in items:
+                metadata = obj["metadata"]
+                self._index[(gv, plural, metadata.get("namespace"), metadata["name"])] = obj
+        self._loop = None
+        self._runner = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def reset_stats(self):
+        """Clear the stats; WATCH events start over too, so every run sees the same ones."""
+        self.stats.clear()
+        self._watches.clear()
+
+    def app(self):
+        app = web.Application()
+        app.router.add_route("GET", "/{tail:.*}", self.handle)
+        app.router.add_route("DELETE", "/{tail:.*}", self.handle)
+        return app
+
+    async def handle(self, request):
+        delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.throttle_rate and self._rng.random() < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.json_response(
+                {"kind": "Status", "status": "Failure", "reason": "TooManyRequests", "code": 429},
+                status=429, headers={"Retry-After": str(self.retry_after)},
+            )
+        parts = [p for p in request.path.split("/") if p]
+        if parts == ["version"]:
+            return web.json_response({"major": "1", "minor": "29", "gitVersion": "v1.29.0-fake"})
+        if parts == ["api"]:
+            return web.json_response({"kind": "APIVersions", "versions": ["v1"]})
+        if parts == ["apis"]:
+            return web.json_response({"kind": "APIGroupList", "apiVersion": "v1", "groups": [
+                {
+                    "name": gv.split("/")[0],
+                    "versions": [{"groupVersion": gv, "version": gv.split("/")[1]}],
+                    "preferredVersion": {"groupVersion": gv, "version": gv.split("/")[1]},
+                }
+                for gv in self._discovery if "/" in gv
+            ]})
+        if parts[:1] == ["api"]:
+            gv, rest = parts[1] if len(parts) > 1 else "", parts[2:]
+        elif parts[:1] == ["apis"] and len(parts) >= 3:
+            gv, rest = f"{parts[1]}/{parts[2]}", parts[3:]
+        else:
+            return self._status(404, "NotFound", f"unknown path {request.path}")
+        if not rest:
+            if gv not in self._discovery:
+                return self._status(404, "NotFound", f"unknown group version {gv}")
+            return web.json_response({"kind": "APIResourceList", "groupVersion": gv, "resources": self._discovery[gv]})
+
+        namespace = None
+        if len(rest) >= 3 and rest[0] == "namespaces":
+            namespace, rest = rest[1], rest[2:]
+        plural, name = rest[0], (rest[1] if len(rest) > 1 else None)
+        if (gv, plural) not in self.objects:
+            return self._status(404, "NotFound", f"the server could not find the requested resource ({plural})")
+        if request.method == "DELETE":
+            self.stats[("DELETE", gv, plural, "delete")] += 1
+            if name is None:
+                return self._status(405, "MethodNotAllowed", "deletecollection is not supported")
+            return await self._delete(request, gv, plural, namespace, name)
+        if name is not None:
+            self.stats[("GET", gv, plural, "get")] += 1
+            obj = self._index.get((gv, plural, namespace, name))
+            if obj is None:
+                return self._status(404, "NotFound", f'{plural} "{name}" not found')
+            self.stats["items"] += 1
+            return web.json_response(obj)
+        if request.query.get("watch") in ("true", "1", "True"):
+            self.stats[("GET", gv, plural, "watch")] += 1
+            return await self._watch(request, gv, plural, namespace)
+        self.stats[("GET", gv, plural, "list")] += 1
+        return self._list(request, gv, plural, namespace)
+
+    def _list(self, request, gv, plural, namespace):
+        items = self.objects[(gv, plural)]
+        if namespace is not None:
+            items = [obj for obj in items if obj["metadata"].get("namespace") == namespace]
+        start = int(request.query.get("continue") or 0)
+        limit = int(request.query.get("limit") or 0)
+        page = items[start:start + limit] if limit else items[start:]
+        metadata = {"resourceVersion": str(self._resource_version)}
+        if limit and start + limit < len(items):
+            metadata["continue"] = str(start + limit)
+            metadata["remainingItemCount"] = len(items) - start - limit
+        kind = f"{RESOURCE_KINDS[(gv, plural)]}List"
+        if "as=PartialObjectMetadataList" in request.headers.get("Accept", ""):
+            page = [
+                {"apiVersion": "meta.k8s.io/v1", "kind": "PartialObjectMetadata", "metadata": obj["metadata"]}
+                for obj in page
+            ]
+            gv, kind = "meta.k8s.io/v1", "PartialObjectMetadataList"
+        self.stats["items"] += len(page)
+        return web.json_response({"apiVersion": gv, "kind": kind, "metadata": metadata, "items": page})
+
+    def _next_resource_version(self):
+        self._resource_version += 1
+        return str(self._resource_version)
+
+    def _watch_event(self, rng, gv, plural, items):
+        """One seeded WATCH event over `items` (the watched objects)."""
+        event_type = rng.choices(("MODIFIED", "ADDED", "DELETED", "BOOKMARK"), (60, 20, 10, 10))[0] if items else "BOOKMARK"
+        resource_version = self._next_resource_version()
+        if event_type == "BOOKMARK":
+            kind = RESOURCE_KINDS[(gv, plural)]
+            return {"type": event_type, "object": {"apiVersion": gv, "kind": kind,
+                                                   "metadata": {"resourceVersion": resource_version}}}
+        obj = copy.deepcopy(rng.choice(items))
+        metadata = obj["metadata"]
+        metadata["resourceVersion"] = resource_version
+        if event_type == "ADDED":
+            metadata["name"] = f"{metadata['name']}-w{resource_version}"
+            metadata["uid"] = f"00000000-0000-4000-9000-{int(resource_version):012d}"
+        elif event_type == "MODIFIED":
+            metadata["labels"] = dict(metadata.get("labels") or {}, **{"example.com/revision": resource_version})
+        return {"type": event_type, "object": obj}
+
+    async def _watch(self, request, gv, plural, namespace):
+        items = self.objects[(gv, plural)]
+        if namespace is not None:
+            items = [obj for obj in items if obj["metadata"].get("namespace") == namespace]
+        # Each stream gets its own seeded random stream, so concurrent watches stay reproducible.
+        stream = (gv, plural, namespace)
+        self._watches[stream] += 1
+        rng = random.Random(f"{self.seed}-{gv}/{plural}-{namespace}-{self._watches[stream]}")
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        for _ in range(self.watch_events):
+            await response.write(json.dumps(self._watch_event(rng, gv, plural, items)).encode() + b"\n")
+            self.stats["watch_events"] += 1
+        if self.watch_expire_rate and rng.random() < self.watch_expire_rate:
+            self.stats["expired"] += 1
+            await response.write(json.dumps({"type": "ERROR", "object": {
+                "kind": "Status", "apiVersion": "v1", "status": "Failure", "reason": "Expired",
+                "message": "too old resource version", "code": 410,
+            }}).encode() + b"\n")
+        else:
+            timeout = float(request.query.get("timeoutSeconds") or self.watch_timeout)
+            await asyncio.sleep(min(timeout, self.watch_timeout))
+        await response.write_eof()
+        return response
+
+    async def _delete(self, request, gv, plural, namespace, name):
+        obj = self._index.get((gv, plural, namespace, name))
+        if obj is None:
+            return self._status(404, "NotFound", f'{plural} "{name}" not found')
+        body = await request.json() if request.can_read_body else {}
+        preconditions = (body or {}).get("preconditions") or {}
+        for field in ("uid", "resourceVersion"):
+            value = preconditions.get(field)
+            if value is not None and obj["metadata"].get(field) != value:
+                return self._status(409, "Conflict", f"Precondition failed: {field} in precondition: {value}, "
+                                                     f"{field} in object meta: {obj['metadata'].get(field)}")
+        if request.query.get("dryRun") != "All":
+            self.objects[(gv, plural)].remove(obj)
+            del self._index[(gv, plural, namespace, name)]
+            self._next_resource_version()
+        return web.json_response({
+            "kind": "Status", "apiVersion": "v1", "status": "Success",
+            "details": {"name": name, "kind": plural, "uid": obj["metadata"]["uid"]},
+        })
+
+    @staticmethod
+    def _status(code, reason, message):
+        return web.json_response(
+            {"kind": "Status", "apiVersion": "v1", "status": "Failure", "reason": reason, "message": message, "code": code},
+            status=code,
+        )
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._runner = web.AppRunner(self.app())
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, self.host, self.port)
+        self._loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        if aiohttp is None:
+            raise RuntimeError("the fake API server needs aiohttp (pip install aiohttp)")
+        threading.Thread(target=self._serve, daemon=True, name="fake-apiserver").start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def write_kubeconfig(path, url, context="fake"):
+    """Kubeconfig with a single context pointing at url (a FakeApiServer)."""
+    kubeconfig = {
+        "apiVersion": "v1",
+        "kind": "Config",
+        "clusters": [{"name": context, "cluster": {"server": url}}],
+        "users": [{"name": context, "user": {"token": "fake"}}],
+        "contexts": [{"name": context, "context": {"cluster": context, "user": context}}],
+        "current-context": context,
+    }
+    with open(path, "w") as f:
+        json.dump(kubeconfig, f, indent=2)
+    return path
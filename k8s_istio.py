@@ -0,0 +1,212 @@
+"""
+k8s_istio.py
+
+Istio networking objects for the unused-resource scanners (unused.py).
+
+Each Istio kind is listed cluster-wide once (all kinds concurrently) at the version
+API discovery reports as preferred, and the references between them become hashed
+indexes. Unused means unreferenced:
+  - Gateway:          no VirtualService in any namespace binds to it (spec.gateways).
+  - VirtualService:   every gateway it binds to is missing, or none of its route
+                      destinations resolves to a Service or ServiceEntry host.
+  - DestinationRule:  its host resolves to no Service and no ServiceEntry host.
+  - ServiceEntry:     no VirtualService or DestinationRule names one of its hosts.
+
+Hosts are resolved the way Istio does: short names are relative to the namespace of
+the object naming them ("reviews" in "shop" is reviews.shop.svc.cluster.local), and
+"*" wildcards match either way.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+
+from kubernetes import client
+
+from k8s_utils import iter_list
+
+ISTIO_GROUP = "networking.istio.io"
+
+GATEWAYS = "gateways"
+VIRTUAL_SERVICES = "virtualservices"
+DESTINATION_RULES = "destinationrules"
+SERVICE_ENTRIES = "serviceentries"
+ISTIO_PLURALS = (GATEWAYS, VIRTUAL_SERVICES, DESTINATION_RULES, SERVICE_ENTRIES)
+
+# Reserved gateway name: the sidecars of the mesh, not a Gateway object.
+MESH_GATEWAY = "mesh"
+
+
+def istio_api_version(kube, group=ISTIO_GROUP):
+    """Preferred served version of the Istio networking API group, or None when Istio is not installed."""
+    for api_group in kube.api(client.ApisApi).get_api_versions().groups or []:
+        if api_group.name == group:
+            return api_group.preferred_version.version
+    return None
+
+
+def list_istio_objects(kube, version, plurals=ISTIO_PLURALS, **list_kwargs):
+    """{plural: [object dict, ...]} of every namespace, one concurrent cluster-wide LIST per kind."""
+    def list_all(plural):
+        return list(iter_list(
+            kube.custom_objects.list_cluster_custom_object, ISTIO_GROUP, version, plural, **list_kwargs
+        ))
+
+    with ThreadPoolExecutor(max_workers=len(plurals)) as executor:
+        return dict(zip(plurals, executor.map(list_all, plurals)))
+
+
+def fqdn(host, namespace, cluster_domain="cluster.local"):
+    """A host as Istio resolves it from inside `namespace`."""
+    if host == "*" or host.startswith("*."):
+        return host
+    suffix = f"svc.{cluster_domain}"
+    parts = host.split(".")
+    if len(parts) == 1:
+        return f"{host}.{namespace}.{suffix}"
+    if len(parts) == 2:
+        return f"{host}.{suffix}"
+    if len(parts) == 3 and parts[2] == "svc":
+        return f"{host}.{cluster_domain}"
+    return host
+
+
+def _hosts_match(a, b):
+    return a == b or fnmatchcase(a, b) or fnmatchcase(b, a)
+
+
+def _key(obj):
+    metadata = obj["metadata"]
+    return metadata.get("namespace"), metadata["name"]
+
+
+def _destinations(virtual_service):
+    spec = virtual_service.get("spec") or {}
+    for protocol in ("http", "tls", "tcp"):
+        for route in spec.get(protocol) or []:
+            for destination in route.get("route") or []:
+                host = (destination.get("destination") or {}).get("host")
+                if host:
+                    yield host
+            mirror = (route.get("mirror") or {}).get("host")
+            if mirror:
+                yield mirror
+
+
+class IstioIndex:
+    """
+    Reference index of one cluster's Istio objects (dicts, as listed by
+    list_istio_objects) and the FQDNs of its Kubernetes Services.
+    """
+
+    def __init__(self, objects, service_hosts, cluster_domain="cluster.local"):
+        self.objects = objects
+        self.cluster_domain = cluster_domain
+        self.service_hosts = set(service_hosts)
+        self.entry_hosts = {}
+        for entry in objects.get(SERVICE_ENTRIES, []):
+            for host in (entry.get("spec") or {}).get("hosts") or []:
+                self.entry_hosts.setdefault(host, set()).add(_key(entry))
+        self._wildcard_entry_hosts = [host for host in self.entry_hosts if "*" in host]
+        self.gateways = {_key(gateway) for gateway in objects.get(GATEWAYS, [])}
+        self.bound_gateways = set()
+        self.referenced_entries = set()
+        for vs in objects.get(VIRTUAL_SERVICES, []):
+            namespace = vs["metadata"].get("namespace")
+            self.bound_gateways.update(self.gateway_refs(vs))
+            hosts = ((vs.get("spec") or {}).get("hosts") or []) + list(_destinations(vs))
+            for host in hosts:
+                self.referenced_entries.update(self.entries_for(self.fqdn(host, namespace)))
+        for rule in objects.get(DESTINATION_RULES, []):
+            host = (rule.get("spec") or {}).get("host")
+            if host:
+                self.referenced_entries.update(self.entries_for(self.fqdn(host, rule["metadata"].get("namespace"))))
+
+    def fqdn(self, host, namespace):
+        return fqdn(host, namespace, self.cluster_domain)
+
+    @staticmethod
+    def gateway_refs(vs):
+        """(namespace, name) of every Gateway a VirtualService binds to (not the mesh)."""
+        namespace = vs["metadata"].get("namespace")
+        for ref in (vs.get("spec") or {}).get("gateways") or []:
+            if ref == MESH_GATEWAY:
+                continue
+            gateway_ns, _, name = ref.rpartition("/")
+            if not gateway_ns and "." in name:
+                # Legacy FQDN form: <name>.<namespace>.svc.cluster.local
+                name, gateway_ns = name.split(".")[:2]
+            yield gateway_ns or namespace, name
+
+    def entries_for(self, host):
+        """(namespace, name) of the ServiceEntries declaring host (exactly or by wildcard)."""
+        found = set(self.entry_hosts.get(host, ()))
+        for entry_host in self._wildcard_entry_hosts:
+            if _hosts_match(host, entry_host):
+                found.update(self.entry_hosts[entry_host])
+        return found
+
+    def resolves(self, host):
+        """Whether an FQDN (or wildcard) names a Service or a ServiceEntry host."""
+        if host in self.service_hosts or host in self.entry_hosts:
+            return True
+        if "*" in host:
+            return any(_hosts_match(host, known) for known in self.service_hosts) or bool(self.entries_for(host))
+        return bool(self.entries_for(host))
+
+    def is_gateway_used(self, gateway):
+        return _key(gateway) in self.bound_gateways
+
+    def is_virtual_service_used(self, vs):
+        gateways = list(self.gateway_refs(vs))
+        if gateways and not any(ref in self.gateways for ref in gateways):
+            return False
+        namespace = vs["metadata"].get("namespace")
+        destinations = [self.fqdn(host, namespace) for host in _destinations(vs)]
+        return not destinations or any(self.resolves(host) for host in destinations)
+
+    def is_destination_rule_used(self, rule):
+        host = (rule.get("spec") or {}).get("host")
+        return bool(host) and self.resolves(self.fqdn(host, rule["metadata"].get("namespace")))
+
+    def is_service_entry_used(self, entry):
+        return _key(entry) in self.referenced_entries
+
+    def unused(self, plural, namespaces=None):
+        """Unreferenced objects of one Istio kind (optionally only in `namespaces`), sorted by namespace/name."""
+        check = {
+            GATEWAYS: self.is_gateway_used,
+            VIRTUAL_SERVICES: self.is_virtual_service_used,
+            DESTINATION_RULES: self.is_destination_rule_used,
+            SERVICE_ENTRIES: self.is_service_entry_used,
+        }[plural]
+        scope = set(namespaces) if namespaces is not None else None
+        found = [
+            obj for obj in self.objects.get(plural, [])
+            if (scope is None or obj["metadata"].get("namespace") in scope) and not check(obj)
+        ]
+        return sorted(found, key=_key)
+
+
+def build_istio_index(kube, cluster_domain="cluster.local", **list_kwargs):
+    """
+    IstioIndex of the whole cluster (Istio kinds plus Services, all listed concurrently),
+    or None when the networking.istio.io API is not served.
+    """
+    version = istio_api_version(kube)
+    if version is None:
+        logging.info(f"{ISTIO_GROUP} is not served; skipping the Istio scan")
+        return None
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        services = executor.submit(
+            lambda: list(iter_list(kube.core_v1.list_service_for_all_namespaces, **list_kwargs))
+        )
+        objects = list_istio_objects(kube, version, **list_kwargs)
+        service_hosts = {
+            f"{svc.metadata.name}.{svc.metadata.namespace}.svc.{cluster_domain}" for svc in services.result()
+        }
+    logging.info(
+        f"Istio {ISTIO_GROUP}/{version}: "
+        + ", ".join(f"{len(items)} {plural}" for plural, items in objects.items())
+    )
+    return IstioIndex(objects, service_hosts, cluster_domain)
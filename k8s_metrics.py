@@ -0,0 +1,227 @@
+"""
+k8s_metrics.py
+
+Instrumentation for the unused-resource scanners: per-finder latency, and per API verb
+and resource latency, call counts, bytes received and objects listed.
+
+- REGISTRY is a small thread-safe process-wide registry (counters, gauges, histograms)
+  rendered in the Prometheus text exposition format: a node-exporter textfile
+  (write_textfile) or the daemon's /metrics endpoint (render).
+- instrument_api_client() hooks a kubernetes-client ApiClient at its REST layer, so
+  every typed, dynamic and WATCH call is counted; k8s_async records its own requests.
+- summary_table() is the end-of-run report.
+
+No dependencies beyond the standard library.
+"""
+
+import logging
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from kubernetes.client.rest import ApiException
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+API_DURATION = "k8s_unused_api_request_duration_seconds"
+API_REQUESTS = "k8s_unused_api_requests_total"
+API_BYTES = "k8s_unused_api_response_bytes_total"
+OBJECTS_LISTED = "k8s_unused_objects_listed_total"
+FINDER_DURATION = "k8s_unused_finder_duration_seconds"
+FINDER_FINDINGS = "k8s_unused_finder_findings"
+
+METRICS = {
+    API_DURATION: ("histogram", "Kubernetes API request latency (WATCH: time to response headers)."),
+    API_REQUESTS: ("counter", "Kubernetes API requests by verb, resource and HTTP status code."),
+    API_BYTES: ("counter", "Response body bytes received from the Kubernetes API."),
+    OBJECTS_LISTED: ("counter", "Objects returned by LIST calls, per snapshot kind."),
+    FINDER_DURATION: ("histogram", "Wall time of one finder run."),
+    FINDER_FINDINGS: ("gauge", "Unused items reported by the latest run of a finder, per report sheet."),
+}
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Registry:
+    """Metric values keyed by (name, sorted label items)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total = self._histograms.get(key, ([0] * len(BUCKETS), [0, 0.0]))
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    buckets[i] += 1
+            total[0] += 1
+            total[1] += value
+            self._histograms[key] = (buckets, total)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+            self._histograms.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: (list(b), list(t)) for key, (b, t) in self._histograms.items()}
+        return values, histograms
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        values, histograms = self._snapshot()
+        lines = []
+        for name, (metric_type, help_text) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            if metric_type == "histogram":
+                for (metric, labels), (buckets, (count, total)) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {bucket_count}")
+                    lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {total}")
+                    lines.append(f"{name}_count{_label_text(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Atomically write render() to path (node-exporter textfile collector)."""
+        tmp_file = f"{path}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_file, path)
+        logging.info(f"Metrics written to '{path}'")
+
+    def summary_table(self):
+        """Human-readable end-of-run table: finders, API calls, objects listed."""
+        values, histograms = self._snapshot()
+        lines = [f"{'Finder':<42}{'Runs':>6}{'Total s':>10}{'Avg ms':>10}{'Findings':>10}"]
+        findings = {}
+        for (metric, labels), value in values.items():
+            if metric == FINDER_FINDINGS:
+                finder = dict(labels)["finder"]
+                findings[finder] = findings.get(finder, 0) + value
+        finder_rows = [(dict(l)["finder"], t) for (m, l), (_, t) in histograms.items() if m == FINDER_DURATION]
+        for finder, (count, total) in sorted(finder_rows, key=lambda row: -row[1][1]):
+            lines.append(f"{finder:<42}{count:>6}{total:>10.2f}{1000 * total / count:>10.1f}{findings.get(finder, 0):>10}")
+
+        lines += ["", f"{'Verb':<8}{'Resource':<48}{'Calls':>7}{'Errors':>7}{'Total s':>10}{'Avg ms':>10}{'MiB':>9}"]
+        calls, errors, received = {}, {}, {}
+        for (metric, labels), value in values.items():
+            label_map = dict(labels)
+            key = (label_map.get("verb"), label_map.get("resource"))
+            if metric == API_REQUESTS:
+                calls[key] = calls.get(key, 0) + value
+                if not str(label_map.get("code", "")).startswith("2"):
+                    errors[key] = errors.get(key, 0) + value
+            elif metric == API_BYTES:
+                received[key] = received.get(key, 0) + value
+        api_rows = [((dict(l)["verb"], dict(l)["resource"]), t) for (m, l), (_, t) in histograms.items() if m == API_DURATION]
+        for key, (count, total) in sorted(api_rows, key=lambda row: -row[1][1]):
+            lines.append(
+                f"{key[0]:<8}{key[1]:<48}{calls.get(key, count):>7}{errors.get(key, 0):>7}"
+                f"{total:>10.2f}{1000 * total / count:>10.1f}{received.get(key, 0) / 2 ** 20:>9.2f}"
+            )
+
+        lines += ["", f"{'Kind':<42}{'Objects listed':>16}"]
+        for (metric, labels), value in sorted(values.items()):
+            if metric == OBJECTS_LISTED:
+                lines.append(f"{dict(labels)['kind']:<42}{value:>16}")
+        return "\n".join(lines)
+
+
+REGISTRY = Registry()
+
+
+def classify_request(method, path, query=None):
+    """(verb, resource) of an API request, e.g. ("list", "pods") or ("delete", "apps/deployments")."""
+    parts = [p for p in urlsplit(path).path.split("/") if p]
+    group = ""
+    if parts[:1] == ["api"]:
+        parts = parts[2:]
+    elif parts[:1] == ["apis"]:
+        group, parts = parts[1] if len(parts) > 1 else "", parts[3:]
+    if len(parts) >= 3 and parts[0] == "namespaces":
+        parts = parts[2:]
+    resource = "/".join(([group] if group else []) + parts[:1] + parts[2:3]) if parts else "discovery"
+    query = dict(query or {})
+    if method == "GET":
+        if str(query.get("watch", "")).lower() in ("true", "1"):
+            verb = "watch"
+        else:
+            verb = "get" if len(parts) >= 2 else "list"
+    else:
+        verb = method.lower()
+    return verb, resource
+
+
+def observe_api(method, path, query, status, seconds, nbytes):
+    verb, resource = classify_request(method, path, query)
+    labels = {"verb": verb, "resource": resource}
+    REGISTRY.observe(API_DURATION, labels, seconds)
+    REGISTRY.inc(API_REQUESTS, {**labels, "code": str(status)})
+    if nbytes:
+        REGISTRY.inc(API_BYTES, labels, nbytes)
+
+
+def instrument_api_client(api_client):
+    """Record every request of a kubernetes-client ApiClient in REGISTRY (idempotent)."""
+    rest = api_client.rest_client
+    if getattr(rest, "_k8s_metrics", False):
+        return api_client
+    original = rest.request
+
+    def request(method, url, *args, **kwargs):
+        # Older clients pass query_params separately; newer ones build them into the URL.
+        query = kwargs.get("query_params") or parse_qsl(urlsplit(url).query)
+        start = time.monotonic()
+        try:
+            response = original(method, url, *args, **kwargs)
+        except ApiException as e:
+            observe_api(method, url, query, e.status, time.monotonic() - start, len(e.body or ""))
+            raise
+        except Exception:
+            observe_api(method, url, query, "error", time.monotonic() - start, 0)
+            raise
+        verb, _ = classify_request(method, url, query)
+        if verb == "watch":
+            # Streamed; reading the body here would block until the watch ends.
+            nbytes = 0
+        else:
+            # Both read() and .data cache the body on first access, so callers still see it.
+            data = response.data if response.data is not None else response.read()
+            nbytes = len(data or b"")
+        observe_api(method, url, query, response.status, time.monotonic() - start, nbytes)
+        return response
+
+    rest.request = request
+    rest._k8s_metrics = True
+    return api_client
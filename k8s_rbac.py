@@ -0,0 +1,147 @@
+"""
+k8s_rbac.py
+
+RBAC reachability for the unused-resource scanners (Nadeem.py).
+
+Roles, ClusterRoles, RoleBindings, ClusterRoleBindings, ServiceAccounts and pods are
+listed cluster-wide once, all six concurrently, and joined through hashed indexes
+(subject -> binding -> role), so every check is a set lookup and the whole analysis
+is linear in the number of objects:
+  - Roles / ClusterRoles no binding refers to. A ClusterRole picked up by the
+    aggregationRule of a bound ClusterRole counts as bound.
+  - RoleBindings / ClusterRoleBindings that grant nothing: their role does not exist,
+    or none of their subjects does. Only ServiceAccount subjects can be checked;
+    User and Group subjects live outside the cluster and always count as existing.
+  - ServiceAccounts no running (non-terminal) pod uses.
+Built-in objects (system: prefix, kubernetes.io/bootstrapping=rbac-defaults) and the
+per-namespace "default" ServiceAccount are never reported.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from k8s_refs import TERMINAL_PHASES
+from k8s_utils import iter_list
+
+BOOTSTRAP_LABEL = ("kubernetes.io/bootstrapping", "rbac-defaults")
+
+
+def list_rbac_objects(kube, **list_kwargs):
+    """{kind: [objects]} of every namespace, one concurrent cluster-wide LIST per kind."""
+    rbac_v1, core_v1 = kube.rbac_v1, kube.core_v1
+    list_functions = {
+        "roles": rbac_v1.list_role_for_all_namespaces,
+        "clusterroles": rbac_v1.list_cluster_role,
+        "rolebindings": rbac_v1.list_role_binding_for_all_namespaces,
+        "clusterrolebindings": rbac_v1.list_cluster_role_binding,
+        "serviceaccounts": core_v1.list_service_account_for_all_namespaces,
+        "pods": core_v1.list_pod_for_all_namespaces,
+    }
+    with ThreadPoolExecutor(max_workers=len(list_functions)) as executor:
+        futures = {
+            kind: executor.submit(lambda fn: list(iter_list(fn, **list_kwargs)), list_fn)
+            for kind, list_fn in list_functions.items()
+        }
+        return {kind: future.result() for kind, future in futures.items()}
+
+
+def is_builtin(obj):
+    labels = obj.metadata.labels or {}
+    return obj.metadata.name.startswith("system:") or labels.get(BOOTSTRAP_LABEL[0]) == BOOTSTRAP_LABEL[1]
+
+
+class RbacIndex:
+    """Hashed RBAC indexes of one cluster (objects as listed by list_rbac_objects)."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.roles = {(r.metadata.namespace, r.metadata.name) for r in objects["roles"]}
+        self.cluster_roles = {cr.metadata.name for cr in objects["clusterroles"]}
+        self.service_accounts = {(sa.metadata.namespace, sa.metadata.name) for sa in objects["serviceaccounts"]}
+        self.used_service_accounts = {
+            (pod.metadata.namespace, pod.spec.service_account_name or "default")
+            for pod in objects["pods"]
+            if pod.spec and not (pod.status and pod.status.phase in TERMINAL_PHASES)
+        }
+
+        self.bound_roles = set()
+        self.bound_cluster_roles = set()
+        for binding in objects["rolebindings"]:
+            ref = binding.role_ref
+            if ref.kind == "ClusterRole":
+                self.bound_cluster_roles.add(ref.name)
+            else:
+                self.bound_roles.add((binding.metadata.namespace, ref.name))
+        for binding in objects["clusterrolebindings"]:
+            self.bound_cluster_roles.add(binding.role_ref.name)
+        self.bound_cluster_roles |= self._aggregated(self.bound_cluster_roles)
+
+    def _aggregated(self, bound):
+        """ClusterRoles selected (matchLabels) by the aggregationRule of a bound ClusterRole."""
+        by_label = {}
+        for cr in self.objects["clusterroles"]:
+            for label in (cr.metadata.labels or {}).items():
+                by_label.setdefault(label, set()).add(cr.metadata.name)
+        aggregated = set()
+        for cr in self.objects["clusterroles"]:
+            rule = cr.aggregation_rule
+            if cr.metadata.name not in bound or not rule:
+                continue
+            for selector in rule.cluster_role_selectors or []:
+                labels = list((selector.match_labels or {}).items())
+                if labels:
+                    aggregated |= set.intersection(*(by_label.get(label, set()) for label in labels))
+        return aggregated
+
+    def subject_exists(self, subject, binding_namespace=None):
+        if subject.kind != "ServiceAccount":
+            return True
+        return (subject.namespace or binding_namespace, subject.name) in self.service_accounts
+
+    def binding_grants(self, binding):
+        """Whether a RoleBinding/ClusterRoleBinding grants anything to anyone that exists."""
+        namespace = binding.metadata.namespace
+        ref = binding.role_ref
+        if ref.kind == "ClusterRole":
+            role_exists = ref.name in self.cluster_roles
+        else:
+            role_exists = (namespace, ref.name) in self.roles
+        return role_exists and any(self.subject_exists(s, namespace) for s in binding.subjects or [])
+
+    def unused_roles(self, namespaces=None):
+        scope = set(namespaces) if namespaces is not None else None
+        return sorted(
+            f"{r.metadata.namespace}/{r.metadata.name}" for r in self.objects["roles"]
+            if (scope is None or r.metadata.namespace in scope)
+            and (r.metadata.namespace, r.metadata.name) not in self.bound_roles and not is_builtin(r)
+        )
+
+    def unused_cluster_roles(self):
+        return sorted(
+            cr.metadata.name for cr in self.objects["clusterroles"]
+            if cr.metadata.name not in self.bound_cluster_roles and not is_builtin(cr)
+        )
+
+    def unused_role_bindings(self, namespaces=None):
+        scope = set(namespaces) if namespaces is not None else None
+        return sorted(
+            f"{rb.metadata.namespace}/{rb.metadata.name}" for rb in self.objects["rolebindings"]
+            if (scope is None or rb.metadata.namespace in scope) and not is_builtin(rb) and not self.binding_grants(rb)
+        )
+
+    def unused_cluster_role_bindings(self):
+        return sorted(
+            crb.metadata.name for crb in self.objects["clusterrolebindings"]
+            if not is_builtin(crb) and not self.binding_grants(crb)
+        )
+
+    def unused_service_accounts(self, namespaces=None):
+        scope = set(namespaces) if namespaces is not None else None
+        return sorted(
+            f"{sa.metadata.namespace}/{sa.metadata.name}" for sa in self.objects["serviceaccounts"]
+            if (scope is None or sa.metadata.namespace in scope) and sa.metadata.name != "default"
+            and (sa.metadata.namespace, sa.metadata.name) not in self.used_service_accounts
+        )
+
+
+def build_rbac_index(kube, **list_kwargs):
+    return RbacIndex(list_rbac_objects(kube, **list_kwargs))
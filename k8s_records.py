@@ -0,0 +1,148 @@
+"""
+k8s_records.py
+
+Raw-JSON fast path for the unused-resource scanners.
+
+LIST responses are read undeserialized (the dynamic client returns the raw body),
+decoded with orjson when available, and every item is projected down to the few
+fields the checks read into compact __slots__ records. Records use the same
+snake_case attribute names as the kubernetes-client models, so finders work on
+either unchanged; fields outside the projection simply do not exist.
+
+Projection spec:
+  {"field": sub_spec, ...}  nested object  -> record with those fields (None if missing)
+  [sub_spec]                list of objects -> list of records
+  None                      leaf            -> raw JSON value
+  "time"                    RFC 3339 leaf   -> timezone-aware datetime
+
+Requirements (optional, falls back to the json module):
+  pip install orjson
+"""
+
+import json
+import re
+from datetime import datetime
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:  # optional speed-up
+    loads = json.loads
+
+_CAMEL = re.compile(r"(?<!^)(?=[A-Z])")
+
+OWNER_REFERENCE = {"apiVersion": None, "kind": None, "name": None, "uid": None}
+
+METADATA = {
+    "name": None,
+    "namespace": None,
+    "uid": None,
+    "resourceVersion": None,
+    "labels": None,
+    "annotations": None,
+    "creationTimestamp": "time",
+    "ownerReferences": [OWNER_REFERENCE],
+}
+
+
+class Record:
+    """Base of all projected records."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class ListMeta:
+    __slots__ = ("_continue", "resource_version")
+
+    def __init__(self, _continue, resource_version):
+        self._continue = _continue
+        self.resource_version = resource_version
+
+
+class RecordList:
+    """One projected LIST page, shaped like a typed list response for iter_list()."""
+
+    __slots__ = ("items", "metadata")
+
+    def __init__(self, items, metadata):
+        self.items = items
+        self.metadata = metadata
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _snake(name):
+    return _CAMEL.sub("_", name).lower()
+
+
+def _identity(value):
+    return value
+
+
+def compile_projection(spec, name="Record"):
+    """Turn a projection spec into a function mapping a decoded JSON value to records."""
+    if spec is None:
+        return _identity
+    if spec == "time":
+        return parse_time
+    if isinstance(spec, list):
+        project_item = compile_projection(spec[0], name)
+        return lambda values: [project_item(value) for value in values]
+    fields = tuple(
+        (key, _snake(key), compile_projection(sub_spec, name + key[:1].upper() + key[1:]))
+        for key, sub_spec in spec.items()
+    )
+    cls = type(name, (Record,), {"__slots__": tuple(attr for _, attr, _ in fields)})
+
+    def project(value):
+        record = cls.__new__(cls)
+        for key, attr, project_field in fields:
+            field_value = value.get(key)
+            setattr(record, attr, None if field_value is None else project_field(field_value))
+        return record
+
+    return project
+
+
+def compile_item_projection(spec, kind="Object"):
+    """Projector for one object: `metadata` plus the fields in spec."""
+    return compile_projection({"metadata": METADATA, **spec}, name=f"{kind[:1].upper()}{kind[1:]}Record")
+
+
+def compile_list_projection(spec, kind="Object"):
+    """
+    Projector for a whole LIST body: every item gets `metadata` plus the fields in spec.
+    Returns a function decoded_body -> RecordList.
+    """
+    project_item = compile_item_projection(spec, kind)
+
+    def project(data):
+        metadata = data.get("metadata") or {}
+        return RecordList(
+            [project_item(item) for item in data.get("items") or []],
+            ListMeta(metadata.get("continue"), metadata.get("resourceVersion")),
+        )
+
+    return project
+
+
+def raw_list_function(dynamic_client, path, spec, kind="Object", accept=None):
+    """
+    list_* style callable (limit/_continue keywords, usable with k8s_utils.iter_list())
+    that LISTs a REST path without model deserialization and returns projected records.
+    """
+    project = compile_list_projection(spec, kind)
+    header_params = {"Accept": accept or "application/json"}
+
+    def list_raw(**params):
+        response = dynamic_client.request("get", path, header_params=dict(header_params), serialize=False, **params)
+        return project(loads(response.data))
+
+    list_raw.__name__ = f"list_raw({path})"
+    return list_raw
@@ -0,0 +1,166 @@
+"""
+k8s_refs.py
+
+Reference graph for the unused-resource scanners (NadeemHD.py, Nadeem.py, unused.py).
+
+Every pod spec and workload pod template is walked once and each reference becomes a
+(namespace, kind, name) edge in a hashed index; "unused X" is then a set difference
+between the X objects of a namespace and the edges into that namespace. References
+never cross namespaces, so a ConfigMap "config" in one namespace cannot mask an
+unused "config" in another.
+
+References followed:
+  - volumes: configMap, secret, persistentVolumeClaim, projected configMap/secret sources
+  - env[].valueFrom configMapKeyRef/secretKeyRef and envFrom[] configMapRef/secretRef
+    of containers, initContainers and ephemeralContainers
+  - imagePullSecrets and serviceAccountName ("default" when unset)
+  - StatefulSet volumeClaimTemplates: claims named <template>-<statefulset>-<ordinal>
+
+Works on kubernetes-client models and on k8s_records projections alike.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from k8s_utils import iter_list
+
+CONFIGMAPS = "configmaps"
+SECRETS = "secrets"
+PERSISTENTVOLUMECLAIMS = "persistentvolumeclaims"
+SERVICEACCOUNTS = "serviceaccounts"
+
+# Pods in these phases no longer hold on to anything they reference.
+TERMINAL_PHASES = {"Succeeded", "Failed"}
+
+
+def _containers(spec):
+    for field in ("containers", "init_containers", "ephemeral_containers"):
+        yield from getattr(spec, field, None) or []
+
+
+def pod_spec_refs(spec):
+    """Yield (kind, name) for every object a pod spec references."""
+    yield SERVICEACCOUNTS, spec.service_account_name or "default"
+    for ref in spec.image_pull_secrets or []:
+        yield SECRETS, ref.name
+    for vol in spec.volumes or []:
+        if vol.config_map:
+            yield CONFIGMAPS, vol.config_map.name
+        if vol.secret:
+            yield SECRETS, vol.secret.secret_name
+        if vol.persistent_volume_claim:
+            yield PERSISTENTVOLUMECLAIMS, vol.persistent_volume_claim.claim_name
+        if vol.projected:
+            for source in vol.projected.sources or []:
+                if source.config_map:
+                    yield CONFIGMAPS, source.config_map.name
+                if source.secret:
+                    yield SECRETS, source.secret.name
+    for container in _containers(spec):
+        for env in container.env or []:
+            if env.value_from:
+                if env.value_from.config_map_key_ref:
+                    yield CONFIGMAPS, env.value_from.config_map_key_ref.name
+                if env.value_from.secret_key_ref:
+                    yield SECRETS, env.value_from.secret_key_ref.name
+        for env_from in container.env_from or []:
+            if env_from.config_map_ref:
+                yield CONFIGMAPS, env_from.config_map_ref.name
+            if env_from.secret_ref:
+                yield SECRETS, env_from.secret_ref.name
+
+
+def template_pod_spec(workload):
+    """Pod template spec of a Deployment/StatefulSet/DaemonSet/ReplicaSet/Job, or a CronJob's job template."""
+    spec = workload.spec
+    job_template = getattr(spec, "job_template", None)
+    if job_template is not None:
+        spec = job_template.spec
+    template = spec.template if spec else None
+    return template.spec if template else None
+
+
+class ReferenceGraph:
+    """
+    Hashed index of references: kind -> namespace -> set of referenced names.
+    - add_pod() skips pods in TERMINAL_PHASES.
+    - add_workload() counts templates of controllers scaled to zero or suspended too:
+      whatever they reference is needed again on the next scale-up or schedule. That
+      includes the PVCs a StatefulSet's volumeClaimTemplates create, which are matched
+      by name pattern since their ordinals are not known up front.
+    """
+
+    def __init__(self):
+        self._edges = {}
+        # namespace -> {"<template>-<statefulset>-"}
+        self._claim_prefixes = {}
+
+    def add_pod_spec(self, namespace, spec):
+        for kind, name in pod_spec_refs(spec):
+            if name:
+                self._edges.setdefault(kind, {}).setdefault(namespace, set()).add(name)
+
+    def add_pod(self, pod):
+        if pod.status and pod.status.phase in TERMINAL_PHASES:
+            return
+        if pod.spec:
+            self.add_pod_spec(pod.metadata.namespace, pod.spec)
+
+    def add_workload(self, workload):
+        spec = template_pod_spec(workload) if workload.spec else None
+        if spec:
+            self.add_pod_spec(workload.metadata.namespace, spec)
+        for template in getattr(workload.spec, "volume_claim_templates", None) or []:
+            self._claim_prefixes.setdefault(workload.metadata.namespace, set()).add(
+                f"{template.metadata.name}-{workload.metadata.name}-"
+            )
+
+    def referenced(self, kind, namespace):
+        """Names of `kind` objects referenced by name from inside `namespace` (not claim templates)."""
+        return self._edges.get(kind, {}).get(namespace, set())
+
+    def _claimed_by_template(self, namespace, name):
+        return any(
+            name.startswith(prefix) and name[len(prefix):].isdigit()
+            for prefix in self._claim_prefixes.get(namespace, ())
+        )
+
+    def is_referenced(self, namespace, kind, name):
+        if name in self.referenced(kind, namespace):
+            return True
+        return kind == PERSISTENTVOLUMECLAIMS and self._claimed_by_template(namespace, name)
+
+    def unused(self, kind, namespace, names):
+        """The names (of `kind` objects in `namespace`) nothing references, sorted."""
+        return sorted(name for name in set(names) if not self.is_referenced(namespace, kind, name))
+
+
+def build_reference_graph(kube, namespaces, **list_kwargs):
+    """
+    ReferenceGraph of the given namespaces: pods plus every workload kind with a pod
+    template, each listed cluster-wide once (all kinds concurrently) through a
+    k8s_utils.KubeContext; objects outside `namespaces` are dropped while listing.
+    list_kwargs (e.g. timeout_seconds) are passed to every LIST.
+    """
+    list_functions = (
+        kube.core_v1.list_pod_for_all_namespaces,
+        kube.apps_v1.list_deployment_for_all_namespaces,
+        kube.apps_v1.list_stateful_set_for_all_namespaces,
+        kube.apps_v1.list_daemon_set_for_all_namespaces,
+        kube.apps_v1.list_replica_set_for_all_namespaces,
+        kube.batch_v1.list_job_for_all_namespaces,
+        kube.batch_v1.list_cron_job_for_all_namespaces,
+    )
+    scope = set(namespaces)
+
+    def list_in_scope(list_fn):
+        return [obj for obj in iter_list(list_fn, **list_kwargs) if obj.metadata.namespace in scope]
+
+    with ThreadPoolExecutor(max_workers=len(list_functions)) as executor:
+        pods, *workload_lists = executor.map(list_in_scope, list_functions)
+    graph = ReferenceGraph()
+    for pod in pods:
+        graph.add_pod(pod)
+    for workloads in workload_lists:
+        for workload in workloads:
+            graph.add_workload(workload)
+    return graph
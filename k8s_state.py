@@ -0,0 +1,186 @@
+"""
+k8s_state.py
+
+Persistent run-over-run state for the unused-resource scanners (NadeemHD.py, Nadeem.py, unused.py).
+
+Every unused verdict is a row keyed by (cluster, namespace, kind, name, uid) with
+first_seen / last_seen / resolved_at timestamps. A run only touches what changed:
+  - new findings are inserted (a resolved finding that comes back is reopened),
+  - findings missing from this run are marked resolved,
+  - everything still unused gets last_seen bumped in one statement.
+Only kinds the run actually checked, in the namespaces it scanned (plus the
+cluster-scoped rows, namespace ""), are resolved, so a failed finder or a scan of a
+subset never resolves findings it did not look at.
+
+Views (SQL, per cluster, relative to its latest run):
+  newly_unused, resolved, active_unused   (+ unused_for(days) for "unused > N days")
+
+Requirements:
+  sqlite3 (standard library); pandas for the Excel views (save_deltas_to_excel).
+"""
+
+import logging
+import re
+import sqlite3
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    cluster     TEXT NOT NULL,
+    namespace   TEXT NOT NULL,
+    kind        TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    uid         TEXT NOT NULL,
+    first_seen  TEXT NOT NULL,
+    last_seen   TEXT NOT NULL,
+    resolved_at TEXT,
+    PRIMARY KEY (cluster, namespace, kind, name, uid)
+);
+CREATE INDEX IF NOT EXISTS findings_active ON findings (cluster, resolved_at);
+CREATE TABLE IF NOT EXISTS runs (
+    cluster  TEXT NOT NULL,
+    run_at   TEXT NOT NULL,
+    kinds    TEXT NOT NULL,
+    new      INTEGER NOT NULL,
+    resolved INTEGER NOT NULL,
+    active   INTEGER NOT NULL,
+    PRIMARY KEY (cluster, run_at)
+);
+CREATE VIEW IF NOT EXISTS last_runs AS
+    SELECT cluster, MAX(run_at) AS run_at FROM runs GROUP BY cluster;
+CREATE VIEW IF NOT EXISTS active_unused AS
+    SELECT * FROM findings WHERE resolved_at IS NULL;
+CREATE VIEW IF NOT EXISTS newly_unused AS
+    SELECT f.* FROM findings f JOIN last_runs r ON f.cluster = r.cluster AND f.first_seen = r.run_at
+    WHERE f.resolved_at IS NULL;
+CREATE VIEW IF NOT EXISTS resolved AS
+    SELECT f.* FROM findings f JOIN last_runs r ON f.cluster = r.cluster AND f.resolved_at = r.run_at;
+"""
+
+COLUMNS = ["cluster", "namespace", "kind", "name", "uid", "first_seen", "last_seen", "resolved_at"]
+
+
+def _timestamp(moment=None):
+    # Microseconds keep two runs in the same second apart; the format still sorts as text.
+    return (moment or datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def findings_from_report(unused_resources, uid_of=None):
+    """
+    Turn a scanner report ({kind/sheet: ["ns/name" or "name", ...]}) into
+    (namespace, kind, name, uid) tuples. uid_of(kind, namespace, name) may resolve
+    UIDs; otherwise uid is "" (name-only identity).
+    """
+    for kind, items in unused_resources.items():
+        for item in items:
+            namespace, _, name = item.rpartition("/")
+            uid = (uid_of(kind, namespace, name) if uid_of else None) or ""
+            yield namespace, kind, name, uid
+
+
+class StateStore:
+    """SQLite-backed store of unused verdicts; see the module docstring."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, cluster, findings, kinds, namespaces=None, run_at=None):
+        """
+        Apply one run's findings for `cluster`. kinds lists every kind the run checked
+        completely and namespaces the namespaces it scanned (None: all of them);
+        findings outside that scope are left alone. Returns the run's counts.
+        """
+        run_at = run_at or _timestamp()
+        kinds = sorted(set(kinds))
+        scope = f"kind IN ({','.join('?' * len(kinds))})"
+        params = list(kinds)
+        if namespaces is not None:
+            namespaces = sorted(set(namespaces) | {""})
+            scope += f" AND namespace IN ({','.join('?' * len(namespaces))})"
+            params += namespaces
+        current = {
+            (ns, kind, name, uid) for ns, kind, name, uid in findings
+            if kind in kinds and (namespaces is None or ns in namespaces)
+        }
+        with self.conn:
+            active = set()
+            if kinds:
+                active = set(self.conn.execute(
+                    f"SELECT namespace, kind, name, uid FROM findings "
+                    f"WHERE cluster = ? AND resolved_at IS NULL AND {scope}",
+                    [cluster, *params],
+                ))
+            new, gone = current - active, active - current
+            self.conn.executemany(
+                "UPDATE findings SET resolved_at = ? "
+                "WHERE cluster = ? AND namespace = ? AND kind = ? AND name = ? AND uid = ?",
+                [(run_at, cluster, *key) for key in gone],
+            )
+            if kinds:
+                self.conn.execute(
+                    f"UPDATE findings SET last_seen = ? WHERE cluster = ? AND resolved_at IS NULL AND {scope}",
+                    [run_at, cluster, *params],
+                )
+            self.conn.executemany(
+                "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, NULL) "
+                "ON CONFLICT (cluster, namespace, kind, name, uid) "
+                "DO UPDATE SET first_seen = excluded.first_seen, last_seen = excluded.last_seen, resolved_at = NULL",
+                [(cluster, *key, run_at, run_at) for key in new],
+            )
+            counts = {"new": len(new), "resolved": len(gone), "active": len(current)}
+            self.conn.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+                (cluster, run_at, ",".join(kinds), counts["new"], counts["resolved"], counts["active"]),
+            )
+        logging.info(f"State {self.path} [{cluster}]: {counts['new']} new, {counts['resolved']} resolved, {counts['active']} unused")
+        return counts
+
+    def _rows(self, query, params):
+        return [dict(zip(COLUMNS, row)) for row in self.conn.execute(query, params)]
+
+    def newly_unused(self, cluster):
+        return self._rows("SELECT * FROM newly_unused WHERE cluster = ? ORDER BY kind, namespace, name", (cluster,))
+
+    def resolved(self, cluster):
+        return self._rows("SELECT * FROM resolved WHERE cluster = ? ORDER BY kind, namespace, name", (cluster,))
+
+    def unused_for(self, cluster, days):
+        """Findings of `cluster` that have been unused for more than `days` days (as of now)."""
+        cutoff = _timestamp(datetime.utcnow() - timedelta(days=days))
+        return self._rows(
+            "SELECT * FROM active_unused WHERE cluster = ? AND first_seen < ? ORDER BY first_seen, kind, namespace, name",
+            (cluster, cutoff),
+        )
+
+
+def save_deltas_to_excel(store, cluster, days=30, file_name=None):
+    """Write the newly unused / resolved / unused > N days views of the latest run to Excel."""
+    # The cluster is part of the default name so parallel fleet workers never share a file.
+    safe_cluster = re.sub(r"[^A-Za-z0-9_.-]+", "_", cluster)
+    file_name = file_name or f"unused_k8s_deltas_{safe_cluster}_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx"
+    views = {
+        "Newly Unused": store.newly_unused(cluster),
+        "Resolved": store.resolved(cluster),
+        f"Unused > {days} Days": store.unused_for(cluster, days),
+    }
+    with pd.ExcelWriter(file_name) as writer:
+        pd.DataFrame([(view, len(rows)) for view, rows in views.items()], columns=["View", "Count"]).to_excel(
+            writer, sheet_name="Summary", index=False
+        )
+        for view, rows in views.items():
+            pd.DataFrame(rows, columns=COLUMNS).to_excel(writer, sheet_name=view, index=False)
+    logging.info(f"Deltas saved to '{file_name}'")
+    return file_name
@@ -0,0 +1,300 @@
+"""
+k8s_utils.py
+
+Shared Kubernetes helpers for the unused-resource scanners (NadeemHD.py, Nadeem.py, unused.py).
+
+- iter_list(): paginated LIST using limit/_continue, yields objects page by page
+  so a huge namespace never has to fit in one response.
+- metadata_list_function(): LIST as PartialObjectMetadataList, for kinds where only
+  metadata (name, labels, annotations, timestamps, owners) is needed.
+- exists() / probe_all(): cheap existence probes (limit=1, run concurrently) for
+  checks that only need to know whether a LIST would return anything.
+- KubeContext: lazily built API clients, so importing a scanner reads no kubeconfig
+  and makes no API calls until a scan actually begins.
+
+Page size defaults to 500 and can be changed with the K8S_LIST_PAGE_SIZE environment variable.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kubernetes import client, config, dynamic
+from kubernetes.client.rest import ApiException
+
+from k8s_metrics import instrument_api_client
+
+DEFAULT_PAGE_SIZE = int(os.getenv("K8S_LIST_PAGE_SIZE", "500"))
+DEFAULT_PROBE_WORKERS = 16
+
+# Asks the API server for metadata only; servers that do not support it fall back to plain JSON.
+METADATA_ACCEPT = "application/json;as=PartialObjectMetadataList;g=meta.k8s.io;v=v1,application/json"
+
+
+def item_key(item):
+    """
+    "namespace/name" (or "name" when cluster-scoped) of a model object or a custom-object
+    dict: the etcd key suffix, whose byte order is the order pages come in. Not a
+    (namespace, name) tuple, which sorts "app" before "app-dev" where etcd does not.
+    """
+    if isinstance(item, dict):
+        metadata = item.get("metadata", {})
+        namespace, name = metadata.get("namespace"), metadata.get("name") or ""
+    else:
+        namespace, name = item.metadata.namespace, item.metadata.name or ""
+    return f"{namespace}/{name}" if namespace else name
+
+
+def _page_parts(response):
+    """Items and continue token of a typed list response or a custom-object dict."""
+    if isinstance(response, dict):
+        return response.get("items", []), (response.get("metadata") or {}).get("continue")
+    return response.items, response.metadata._continue
+
+
+def continue_from_410(error):
+    """Continue token the API server may include in a 410 ResourceExpired status body."""
+    try:
+        return (json.loads(error.body).get("metadata") or {}).get("continue")
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def _page_resource_version(response):
+    if isinstance(response, dict):
+        return (response.get("metadata") or {}).get("resourceVersion")
+    return response.metadata.resource_version
+
+
+def iter_list(list_fn, *args, page_size=None, list_meta=None, **kwargs):
+    """
+    Yield every object returned by a Kubernetes LIST call, one page at a time.
+
+    list_fn is any list_* method of the python client (typed or CustomObjectsApi).
+    If list_meta is a dict, list_meta["resource_version"] is set to the list's
+    resourceVersion (the point a WATCH can start from).
+    If the continue token expires (410 Gone) the listing resumes with the token from
+    the error body when the server offers one; otherwise it relists from scratch and
+    skips the objects already yielded (pages are returned in etcd key order, see item_key).
+    """
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    token = None
+    last_key = None
+    relisting = False
+    while True:
+        try:
+            response = list_fn(*args, limit=page_size, _continue=token, **kwargs)
+        except ApiException as e:
+            if e.status != 410 or token is None:
+                raise
+            token = continue_from_410(e)
+            relisting = token is None
+            if list_meta is not None and relisting:
+                list_meta.pop("resource_version", None)
+            logging.warning(
+                f"Continue token expired during {getattr(list_fn, '__name__', 'list')}; "
+                f"{'relisting' if relisting else 'resuming with fresh token'}"
+            )
+            continue
+        items, token = _page_parts(response)
+        if list_meta is not None and "resource_version" not in list_meta:
+            list_meta["resource_version"] = _page_resource_version(response)
+        for item in items:
+            key = item_key(item)
+            if relisting:
+                if last_key is not None and key <= last_key:
+                    continue
+                relisting = False
+            last_key = key
+            yield item
+        if not token:
+            return
+
+
+def exists(list_fn, *args, **kwargs):
+    """
+    True if a LIST would return at least one object. Pages hold a single object, so
+    the answer costs one tiny request (a page may be empty but carry a continue token
+    when selectors filter server-side; those are followed).
+    """
+    return next(iter_list(list_fn, *args, page_size=1, **kwargs), None) is not None
+
+
+def probe_all(probes, max_workers=None):
+    """
+    Run existence checks concurrently. probes maps a key to a zero-argument callable
+    (typically wrapping exists()); returns {key: result}. Failed probes are logged and
+    left out of the result.
+    """
+    results = {}
+    if not probes:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_workers or DEFAULT_PROBE_WORKERS, len(probes))) as executor:
+        futures = {key: executor.submit(probe) for key, probe in probes.items()}
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                logging.error(f"Existence probe {key} failed: {e}")
+    return results
+
+
+class PartialObjectMetadata:
+    """Metadata-only object (meta.k8s.io/v1 PartialObjectMetadata); .metadata is a V1ObjectMeta."""
+
+    __slots__ = ("metadata",)
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+class PartialObjectMetadataList:
+    """Page of PartialObjectMetadata; shaped like a typed list response for iter_list()."""
+
+    __slots__ = ("items", "metadata")
+
+    def __init__(self, items, metadata):
+        self.items = items
+        self.metadata = metadata
+
+
+def deserialize_model(api_client, data, klass):
+    """Decoded JSON (dicts and lists) -> kubernetes-client model `klass`, e.g. "V1PodList"."""
+    # ApiClient.deserialize() changed signature across client releases; the
+    # name-mangled model mapper underneath it has not.
+    return api_client._ApiClient__deserialize(data, klass)
+
+
+def to_partial_metadata_list(api_client, data):
+    """
+    Build a PartialObjectMetadataList from a decoded LIST body. Only metadata is
+    turned into models, so a server that ignored METADATA_ACCEPT costs bytes but not parsing.
+    """
+    return PartialObjectMetadataList(
+        items=[
+            PartialObjectMetadata(deserialize_model(api_client, item.get("metadata") or {}, "V1ObjectMeta"))
+            for item in data.get("items") or []
+        ],
+        metadata=deserialize_model(api_client, data.get("metadata") or {}, "V1ListMeta"),
+    )
+
+
+def metadata_list_function(dynamic_client, path):
+    """
+    list_* style callable (limit/_continue keywords, usable with iter_list() and exists())
+    that LISTs a REST path such as "/api/v1/secrets" as PartialObjectMetadataList.
+    """
+
+    def list_metadata(**params):
+        response = dynamic_client.request(
+            "get", path, header_params={"Accept": METADATA_ACCEPT}, serialize=False, **params
+        )
+        return to_partial_metadata_list(dynamic_client.client, json.loads(response.data))
+
+    list_metadata.__name__ = f"list_metadata({path})"
+    return list_metadata
+
+
+def kubeconfig_contexts(config_file=None):
+    """Names of all contexts in a kubeconfig file (default: $KUBECONFIG / ~/.kube/config)."""
+    contexts, _ = config.list_kube_config_contexts(config_file=config_file)
+    return [context["name"] for context in contexts]
+
+
+class KubeContext:
+    """
+    API clients of one cluster, built on first use.
+    - Constructing a context is free; kubeconfig is read when the first client is needed.
+    - api_client injects a preconfigured (or fake) ApiClient; context/config_file select
+      a kubeconfig context without touching the process-wide default configuration.
+    - Typed API objects and dynamic discovery results are created once per context.
+    - Every request is recorded in k8s_metrics.REGISTRY.
+    """
+
+    def __init__(self, api_client=None, context=None, config_file=None):
+        self.context = context
+        self.config_file = config_file
+        self._api_client = instrument_api_client(api_client) if api_client is not None else None
+        self._apis = {}
+        self._resources = {}
+        self._lock = threading.RLock()
+
+    @property
+    def api_client(self):
+        with self._lock:
+            if self._api_client is None:
+                self._api_client = config.new_client_from_config(config_file=self.config_file, context=self.context)
+                logging.info(f"Loaded kubeconfig (context: {self.context or 'current'})")
+                instrument_api_client(self._api_client)
+            return self._api_client
+
+    @property
+    def context_name(self):
+        """Name of the kubeconfig context this context talks to (for reports and state)."""
+        if self.context:
+            return self.context
+        try:
+            return config.list_kube_config_contexts(config_file=self.config_file)[1]["name"]
+        except Exception as e:
+            logging.warning(f"Could not determine the current kubeconfig context: {e}")
+            return "default"
+
+    @property
+    def configuration(self):
+        return self.api_client.configuration
+
+    def api(self, api_class):
+        """Typed API object (e.g. client.CoreV1Api) sharing this context's ApiClient."""
+        with self._lock:
+            if api_class not in self._apis:
+                self._apis[api_class] = api_class(self.api_client)
+            return self._apis[api_class]
+
+    @property
+    def core_v1(self):
+        return self.api(client.CoreV1Api)
+
+    @property
+    def apps_v1(self):
+        return self.api(client.AppsV1Api)
+
+    @property
+    def batch_v1(self):
+        return self.api(client.BatchV1Api)
+
+    @property
+    def rbac_v1(self):
+        return self.api(client.RbacAuthorizationV1Api)
+
+    @property
+    def networking_v1(self):
+        return self.api(client.NetworkingV1Api)
+
+    @property
+    def apiextensions_v1(self):
+        return self.api(client.ApiextensionsV1Api)
+
+    @property
+    def storage_v1(self):
+        return self.api(client.StorageV1Api)
+
+    @property
+    def discovery_v1(self):
+        return self.api(client.DiscoveryV1Api)
+
+    @property
+    def custom_objects(self):
+        return self.api(client.CustomObjectsApi)
+
+    @property
+    def dynamic(self):
+        return self.api(dynamic.DynamicClient)
+
+    def resource(self, api_version, kind):
+        """Memoized API discovery: one resolution per (apiVersion, kind) per context."""
+        key = (api_version, kind)
+        if key not in self._resources:
+            self._resources[key] = self.dynamic.resources.get(api_version=api_version, kind=kind)
+        return self._resources[key]
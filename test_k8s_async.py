@@ -0,0 +1,47 @@
+"""
+Tests for k8s_async.AsyncKubeClient.iter_list (needs aiohttp).
+
+  python -m unittest test_k8s_async
+"""
+
+import asyncio
+import json
+import unittest
+
+from kubernetes import client
+
+from k8s_async import AsyncKubeClient, aiohttp
+from k8s_utils import item_key
+from test_k8s_utils import FakeEtcdList, pods
+
+
+class FakePagesClient(AsyncKubeClient):
+    """AsyncKubeClient whose GETs are answered by a FakeEtcdList instead of the network."""
+
+    def __init__(self, list_fn, page_size):
+        super().__init__(configuration=client.Configuration(), page_size=page_size)
+        self.list_fn = list_fn
+
+    async def get(self, path, params=None, headers=None):
+        return json.dumps(self.list_fn(int(params["limit"]), params.get("continue")))
+
+
+@unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+class AsyncIterListTest(unittest.TestCase):
+    def list_keys(self, list_fn, page_size=2):
+        async def collect():
+            kube = FakePagesClient(list_fn, page_size)
+            return [item_key(pod) async for pod in kube.iter_list("/api/v1/pods", "V1PodList")]
+        return asyncio.run(collect())
+
+    def test_relist_after_410_with_prefix_namespaces(self):
+        list_fn = FakeEtcdList(pods("app-dev/p1", "app-dev/p2", "app/p1", "app/p2"), expire={"2"})
+        self.assertEqual(self.list_keys(list_fn), ["app-dev/p1", "app-dev/p2", "app/p1", "app/p2"])
+
+    def test_relist_skips_only_yielded_objects(self):
+        list_fn = FakeEtcdList(pods("a/p1", "a/p2", "a/p3", "b/p1", "b/p2"), expire={"2", "4"})
+        self.assertEqual(self.list_keys(list_fn), ["a/p1", "a/p2", "a/p3", "b/p1", "b/p2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
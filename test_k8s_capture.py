@@ -0,0 +1,46 @@
+"""
+Tests for NadeemHD --capture / --from-snapshot against the local fake API server
+(k8s_fakeapi.py; needs aiohttp).
+
+  python -m unittest test_k8s_capture
+"""
+
+import os
+import tempfile
+import unittest
+
+import NadeemHD
+from k8s_capture import read_capture
+from k8s_fakeapi import FakeApiServer, generate_cluster, web, write_kubeconfig
+from k8s_utils import KubeContext, PartialObjectMetadata
+
+
+@unittest.skipIf(web is None, "aiohttp is not installed")
+class CaptureReplayTest(unittest.TestCase):
+    def capture_and_replay(self, fast):
+        objects = generate_cluster(namespaces=3, pods=10, secrets=4, pvcs=3, services=3, seed=1)
+        namespaces = [ns["metadata"]["name"] for ns in objects[("v1", "namespaces")]]
+        with tempfile.TemporaryDirectory() as workdir, FakeApiServer(objects) as server:
+            kube = KubeContext(config_file=write_kubeconfig(os.path.join(workdir, "kubeconfig"), server.url))
+            path = os.path.join(workdir, "scan.jsonl.gz")
+            live = NadeemHD.scan_unused_resources(kube=kube, namespaces=namespaces, capture=path, save_report=False)
+            header = next(read_capture(path))
+            snapshot = NadeemHD.ClusterSnapshot.from_capture(path, fast=fast)
+            replayed = NadeemHD.scan_unused_resources(snapshot=snapshot, save_report=False)
+        return header, snapshot, live, replayed
+
+    def test_replay_without_fast(self):
+        header, snapshot, live, replayed = self.capture_and_replay(fast=False)
+        self.assertEqual(set(header["metadata_only"]), NadeemHD.METADATA_ONLY_KINDS)
+        storage_classes = [sc for objects in snapshot._kind_index("storageclasses").values() for sc in objects.values()]
+        self.assertTrue(storage_classes)
+        self.assertTrue(all(isinstance(sc, PartialObjectMetadata) for sc in storage_classes))
+        self.assertEqual(replayed, live)
+
+    def test_replay_fast(self):
+        _, _, live, replayed = self.capture_and_replay(fast=True)
+        self.assertEqual(replayed, live)
+
+
+if __name__ == "__main__":
+    unittest.main()
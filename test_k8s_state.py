@@ -0,0 +1,46 @@
+"""
+Tests for k8s_state.StateStore.record_run: which findings a run may resolve.
+
+  python -m unittest test_k8s_state
+"""
+
+import unittest
+
+from k8s_state import StateStore
+
+
+def active(store, cluster):
+    return sorted((row[0], row[1], row[2]) for row in store.conn.execute(
+        "SELECT namespace, kind, name FROM active_unused WHERE cluster = ?", (cluster,)
+    ))
+
+
+class RecordRunTest(unittest.TestCase):
+    def setUp(self):
+        self.store = StateStore(":memory:")
+        self.addCleanup(self.store.close)
+        findings = [("a", "ConfigMaps", "cm1", ""), ("b", "ConfigMaps", "cm2", ""), ("", "PersistentVolumes", "pv1", "")]
+        self.store.record_run("c1", findings, ["ConfigMaps", "PersistentVolumes"], run_at="2026-01-01T00:00:00.000000Z")
+
+    def test_subset_of_namespaces_resolves_only_scanned_ones(self):
+        counts = self.store.record_run("c1", [], ["ConfigMaps", "PersistentVolumes"], ["a"],
+                                       run_at="2026-01-02T00:00:00.000000Z")
+        self.assertEqual(counts, {"new": 0, "resolved": 2, "active": 0})
+        self.assertEqual(active(self.store, "c1"), [("b", "ConfigMaps", "cm2")])
+        self.assertEqual([row["name"] for row in self.store.resolved("c1")], ["cm1", "pv1"])
+
+    def test_subset_keeps_last_seen_of_other_namespaces(self):
+        self.store.record_run("c1", [("a", "ConfigMaps", "cm1", "")], ["ConfigMaps"], ["a"],
+                              run_at="2026-01-02T00:00:00.000000Z")
+        last_seen = dict(self.store.conn.execute("SELECT name, last_seen FROM findings WHERE cluster = 'c1'"))
+        self.assertEqual(last_seen, {"cm1": "2026-01-02T00:00:00.000000Z", "cm2": "2026-01-01T00:00:00.000000Z",
+                                     "pv1": "2026-01-01T00:00:00.000000Z"})
+
+    def test_all_namespaces(self):
+        counts = self.store.record_run("c1", [], ["ConfigMaps"], run_at="2026-01-02T00:00:00.000000Z")
+        self.assertEqual(counts["resolved"], 2)
+        self.assertEqual(active(self.store, "c1"), [("", "PersistentVolumes", "pv1")])
+
+
+if __name__ == "__main__":
+    unittest.main()
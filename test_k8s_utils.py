@@ -0,0 +1,71 @@
+"""
+Tests for k8s_utils.iter_list: paging and recovery from expired continue tokens.
+
+  python -m unittest test_k8s_utils
+"""
+
+import unittest
+
+from kubernetes.client.rest import ApiException
+
+from k8s_utils import item_key, iter_list
+
+
+def pods(*keys):
+    """Custom-object style pod dicts for "namespace/name" keys."""
+    return [{"metadata": dict(zip(("namespace", "name"), key.split("/")))} for key in keys]
+
+
+class FakeEtcdList:
+    """
+    list_* callable serving items in the given (etcd key) order. A continue token is the
+    offset of the next page; `expire` tokens fail once with 410 and no fresh token.
+    """
+
+    def __init__(self, items, expire=()):
+        self.items = items
+        self.expire = set(expire)
+        self.calls = 0
+
+    def __call__(self, limit, _continue=None):
+        self.calls += 1
+        if _continue in self.expire:
+            self.expire.discard(_continue)
+            error = ApiException(status=410, reason="Gone")
+            error.body = '{"kind": "Status", "reason": "Expired"}'
+            raise error
+        start = int(_continue or 0)
+        end = start + limit
+        return {
+            "items": self.items[start:end],
+            "metadata": {"continue": str(end) if end < len(self.items) else None},
+        }
+
+
+class IterListTest(unittest.TestCase):
+    def test_item_key_follows_etcd_order(self):
+        keys = [item_key(item) for item in pods("app/p1", "app-dev/p1")]
+        self.assertEqual(sorted(keys), ["app-dev/p1", "app/p1"])
+        self.assertEqual(item_key({"metadata": {"name": "pv-1"}}), "pv-1")
+
+    def test_pages(self):
+        items = pods("a/p1", "a/p2", "b/p1", "b/p2", "c/p1")
+        list_fn = FakeEtcdList(items)
+        self.assertEqual(list(iter_list(list_fn, page_size=2)), list_fn.items)
+        self.assertEqual(list_fn.calls, 3)
+
+    def test_relist_after_410_with_prefix_namespaces(self):
+        # "app-dev/..." sorts before "app/..." in etcd ('-' < '/'); a relist must not
+        # drop the "app" objects as already seen.
+        list_fn = FakeEtcdList(pods("app-dev/p1", "app-dev/p2", "app/p1", "app/p2"), expire={"2"})
+        listed = [item_key(item) for item in iter_list(list_fn, page_size=2)]
+        self.assertEqual(listed, ["app-dev/p1", "app-dev/p2", "app/p1", "app/p2"])
+
+    def test_relist_skips_only_yielded_objects(self):
+        list_fn = FakeEtcdList(pods("a/p1", "a/p2", "a/p3", "b/p1", "b/p2"), expire={"2", "4"})
+        listed = [item_key(item) for item in iter_list(list_fn, page_size=2)]
+        self.assertEqual(listed, ["a/p1", "a/p2", "a/p3", "b/p1", "b/p2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
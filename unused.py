@@ -1,22 +1,33 @@
-from kubernetes import client, config
-from datetime import datetime, timedelta
+import argparse
+from datetime import datetime, timedelta, timezone
 import pandas as pd
-
-# Load Kubernetes config (read-only ServiceAccount recommended for production)
-config.load_kube_config()
-
-# Initialize API clients
-core_v1 = client.CoreV1Api()
-apps_v1 = client.AppsV1Api()
-custom_objects_api = client.CustomObjectsApi()
-
-# Define a time threshold (last 30 days)
-THIRTY_DAYS_AGO = datetime.now() - timedelta(days=30)
-
-# Helper: Check if resource is older than 30 days
+from k8s_istio import DESTINATION_RULES, GATEWAYS, SERVICE_ENTRIES, VIRTUAL_SERVICES, build_istio_index
+from k8s_records import parse_time
+from k8s_state import StateStore, findings_from_report, save_deltas_to_excel
+from k8s_refs import CONFIGMAPS, PERSISTENTVOLUMECLAIMS, SECRETS, SERVICEACCOUNTS, build_reference_graph
+from k8s_utils import KubeContext, iter_list
+
+# Kubernetes clients, built on first use (read-only ServiceAccount recommended for production).
+# The scan functions also accept their own KubeContext.
+KUBE = KubeContext()
+
+# Define a time threshold (last 30 days); API timestamps are UTC-aware
+THIRTY_DAYS_AGO = datetime.now(timezone.utc) - timedelta(days=30)
+
+# Report keys of the Istio kinds
+ISTIO_REPORT_KEYS = {
+    "istio_gateways": GATEWAYS,
+    "istio_virtual_services": VIRTUAL_SERVICES,
+    "istio_destination_rules": DESTINATION_RULES,
+    "istio_service_entries": SERVICE_ENTRIES,
+}
+
+# Helper: Check if resource is older than 30 days (model datetimes or raw RFC 3339 strings)
 def is_older_than_30_days(timestamp):
     if not timestamp:
         return False
+    if isinstance(timestamp, str):
+        timestamp = parse_time(timestamp)
     return timestamp < THIRTY_DAYS_AGO
 
 # Helper: Load namespaces from input file
@@ -24,34 +35,14 @@ def load_namespaces(file_path):
     with open(file_path, "r") as file:
         return [line.strip() for line in file if line.strip()]
 
-# Step 1: Get all resources linked to Pods in specific namespaces
-def get_pod_resources(namespaces):
-    resources = {
-        "config_maps": set(),
-        "secrets": set(),
-        "persistent_volume_claims": set(),
-        "service_accounts": set(),
-    }
+# Step 1: Reference graph of all pods and workload templates in specific namespaces
+# (ConfigMaps, Secrets, PVCs and ServiceAccounts they use, per namespace; see k8s_refs.py)
+def get_references(namespaces, kube=KUBE):
+    return build_reference_graph(kube, namespaces, timeout_seconds=30)
 
-    for namespace in namespaces:
-        pods = core_v1.list_namespaced_pod(namespace, timeout_seconds=30).items
-        for pod in pods:
-            # Collect ConfigMaps, Secrets, PVCs, and ServiceAccounts
-            for volume in pod.spec.volumes or []:
-                if volume.config_map:
-                    resources["config_maps"].add(volume.config_map.name)
-                if volume.secret:
-                    resources["secrets"].add(volume.secret.secret_name)
-                if volume.persistent_volume_claim:
-                    resources["persistent_volume_claims"].add(volume.persistent_volume_claim.claim_name)
-
-            if pod.spec.service_account_name:
-                resources["service_accounts"].add(pod.spec.service_account_name)
-
-    return resources
-
-# Step 2: Identify unused resources (including Istio CRDs)
-def get_unused_resources(namespaces, pod_resources):
+# Step 2: Identify unused resources (including Istio objects; istio: a prebuilt k8s_istio.IstioIndex)
+def get_unused_resources(namespaces, references, kube=KUBE, istio=None):
+    core_v1 = kube.core_v1
     unused = {
         "config_maps": [],
         "secrets": [],
@@ -65,39 +56,32 @@ def get_unused_resources(namespaces, pod_resources):
 
     for namespace in namespaces:
         # ConfigMaps
-        for cm in core_v1.list_namespaced_config_map(namespace, timeout_seconds=30).items:
-            if cm.metadata.name not in pod_resources["config_maps"] and is_older_than_30_days(cm.metadata.creation_timestamp):
+        for cm in iter_list(core_v1.list_namespaced_config_map, namespace, timeout_seconds=30):
+            if not references.is_referenced(namespace, CONFIGMAPS, cm.metadata.name) and is_older_than_30_days(cm.metadata.creation_timestamp):
                 unused["config_maps"].append(f"{namespace}/{cm.metadata.name}")
 
         # Secrets
-        for secret in core_v1.list_namespaced_secret(namespace, timeout_seconds=30).items:
-            if secret.metadata.name not in pod_resources["secrets"] and is_older_than_30_days(secret.metadata.creation_timestamp):
+        for secret in iter_list(core_v1.list_namespaced_secret, namespace, timeout_seconds=30):
+            if not references.is_referenced(namespace, SECRETS, secret.metadata.name) and is_older_than_30_days(secret.metadata.creation_timestamp):
                 unused["secrets"].append(f"{namespace}/{secret.metadata.name}")
 
         # PVCs
-        for pvc in core_v1.list_namespaced_persistent_volume_claim(namespace, timeout_seconds=30).items:
-            if pvc.metadata.name not in pod_resources["persistent_volume_claims"] and is_older_than_30_days(pvc.metadata.creation_timestamp):
+        for pvc in iter_list(core_v1.list_namespaced_persistent_volume_claim, namespace, timeout_seconds=30):
+            if not references.is_referenced(namespace, PERSISTENTVOLUMECLAIMS, pvc.metadata.name) and is_older_than_30_days(pvc.metadata.creation_timestamp):
                 unused["persistent_volume_claims"].append(f"{namespace}/{pvc.metadata.name}")
 
         # ServiceAccounts
-        for sa in core_v1.list_namespaced_service_account(namespace, timeout_seconds=30).items:
-            if sa.metadata.name not in pod_resources["service_accounts"] and is_older_than_30_days(sa.metadata.creation_timestamp):
+        for sa in iter_list(core_v1.list_namespaced_service_account, namespace, timeout_seconds=30):
+            if not references.is_referenced(namespace, SERVICEACCOUNTS, sa.metadata.name) and is_older_than_30_days(sa.metadata.creation_timestamp):
                 unused["service_accounts"].append(f"{namespace}/{sa.metadata.name}")
 
-        # Istio CRDs
-        for resource, plural in [
-            ("istio_gateways", "gateways"),
-            ("istio_virtual_services", "virtualservices"),
-            ("istio_destination_rules", "destinationrules"),
-            ("istio_service_entries", "serviceentries"),
-        ]:
-            istio_resources = custom_objects_api.list_namespaced_custom_object(
-                group="networking.istio.io", version="v1beta1", namespace=namespace, plural=plural, timeout_seconds=30
-            )["items"]
-
-            for res in istio_resources:
-                if is_older_than_30_days(res["metadata"]["creationTimestamp"]):
-                    unused[resource].append(f"{namespace}/{res['metadata']['name']}")
+    # Istio: every kind listed cluster-wide once; unused = unreferenced (see k8s_istio.py)
+    istio = istio if istio is not None else build_istio_index(kube, timeout_seconds=30)
+    if istio is not None:
+        for resource, plural in ISTIO_REPORT_KEYS.items():
+            for res in istio.unused(plural, namespaces):
+                if is_older_than_30_days(res["metadata"].get("creationTimestamp")):
+                    unused[resource].append(f"{res['metadata']['namespace']}/{res['metadata']['name']}")
 
     return unused
 
@@ -108,8 +92,20 @@ def generate_report(unused_resources):
     df.to_excel(file_name, index=False)
     print(f"Report generated: {file_name}")
 
+# Step 4: Record verdicts in the run-over-run state store and write the delta views
+def record_state(state_db, cluster, namespaces, unused_resources, unused_days=30):
+    with StateStore(state_db) as store:
+        store.record_run(cluster, findings_from_report(unused_resources), unused_resources, namespaces)
+        return save_deltas_to_excel(store, cluster, unused_days)
+
 # Main function
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find unused Kubernetes and Istio resources.")
+    parser.add_argument("--state-db", metavar="FILE", help="SQLite state store for run-over-run deltas (k8s_state.py)")
+    parser.add_argument("--cluster", help="Cluster name in the state store (default: kubeconfig context name)")
+    parser.add_argument("--unused-days", type=int, default=30, help="State store: threshold of the 'Unused > N Days' view")
+    args = parser.parse_args()
+
     # Input file containing namespaces
     input_file = "namespaces.txt"
 
@@ -117,15 +113,19 @@ if __name__ == "__main__":
         print("Loading namespaces from file...")
         namespaces = load_namespaces(input_file)
 
-        print("Fetching pod-related resources...")
-        pod_resources = get_pod_resources(namespaces)
+        print("Building reference graph from pods and workloads...")
+        references = get_references(namespaces)
 
         print("Identifying unused resources...")
-        unused_resources = get_unused_resources(namespaces, pod_resources)
+        unused_resources = get_unused_resources(namespaces, references)
 
         print("Generating report...")
         generate_report(unused_resources)
 
+        if args.state_db:
+            print("Recording state...")
+            print(f"Deltas written: {record_state(args.state_db, args.cluster or KUBE.context_name, namespaces, unused_resources, args.unused_days)}")
+
         print("Script execution completed successfully.")
     except Exception as e:
         print(f"An error occurred: {e}")